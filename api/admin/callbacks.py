@@ -0,0 +1,60 @@
+"""
+Admin API: Callback delivery log and dead-letter replay
+"""
+from flask import Blueprint, jsonify, request
+import os
+import logging
+
+from services.callbacks import get_callback_dispatcher
+
+logger = logging.getLogger("levqor.callbacks_admin")
+bp = Blueprint("callbacks_admin", __name__)
+
+
+def _is_authorized(req):
+    """Check if request has valid admin token"""
+    token = (req.headers.get("Authorization") or "").replace("Bearer ", "")
+    admin_token = os.getenv("ADMIN_TOKEN", "")
+    return token and token == admin_token
+
+
+@bp.get("/api/admin/callbacks")
+def list_callbacks():
+    """
+    GET /api/admin/callbacks?status=dead&limit=100
+    
+    Requires: Authorization: Bearer <ADMIN_TOKEN>
+    
+    Returns the callback delivery log, newest first
+    """
+    if not _is_authorized(request):
+        return jsonify({"error": "unauthorized"}), 401
+    
+    status = request.args.get("status")
+    limit = max(1, min(request.args.get("limit", type=int, default=100), 1000))
+    deliveries = get_callback_dispatcher().deliveries(status, limit)
+    return jsonify({"deliveries": deliveries, "count": len(deliveries)})
+
+
+@bp.post("/api/admin/callbacks/replay")
+def replay_callbacks():
+    """
+    POST /api/admin/callbacks/replay
+    
+    Requires: Authorization: Bearer <ADMIN_TOKEN>
+    
+    Body: {"ids": [1, 2, 3]}  (optional; omit to replay every dead delivery)
+    
+    Moves dead deliveries back to pending with a fresh attempt budget
+    """
+    if not _is_authorized(request):
+        return jsonify({"error": "unauthorized"}), 401
+    
+    data = request.get_json(silent=True) or {}
+    ids = data.get("ids")
+    if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+        return jsonify({"error": "bad_request", "message": "ids must be a list of integers"}), 400
+    
+    replayed = get_callback_dispatcher().replay_dead(ids)
+    logger.info(f"Replayed {replayed} dead callback deliveries")
+    return jsonify({"ok": True, "replayed": replayed})
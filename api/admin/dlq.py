@@ -0,0 +1,82 @@
+"""
+Admin API: Dead-letter queue inspection and bulk replay
+"""
+from flask import Blueprint, jsonify, request
+import os
+import logging
+
+from services.job_store import get_job_store
+
+logger = logging.getLogger("levqor.dlq_admin")
+bp = Blueprint("dlq_admin", __name__)
+
+
+def _is_authorized(req):
+    """Check if request has valid admin token"""
+    token = (req.headers.get("Authorization") or "").replace("Bearer ", "")
+    admin_token = os.getenv("ADMIN_TOKEN", "")
+    return token and token == admin_token
+
+
+def _filters(source):
+    """workflow / error_class / since / until filters from a dict-like source"""
+    since = source.get("since")
+    until = source.get("until")
+    return {
+        "workflow": source.get("workflow") or None,
+        "error_class": source.get("error_class") or None,
+        "since": float(since) if since not in (None, "") else None,
+        "until": float(until) if until not in (None, "") else None,
+    }
+
+
+@bp.get("/api/admin/dlq")
+def list_dead_letters():
+    """
+    GET /api/admin/dlq?workflow=&error_class=&since=&until=&limit=100
+    
+    Requires: Authorization: Bearer <ADMIN_TOKEN>
+    
+    Returns dead-lettered jobs (newest first) and the total matching count
+    """
+    if not _is_authorized(request):
+        return jsonify({"error": "unauthorized"}), 401
+    
+    try:
+        filters = _filters(request.args)
+    except ValueError:
+        return jsonify({"error": "bad_request", "message": "since/until must be unix timestamps"}), 400
+    limit = max(1, min(request.args.get("limit", type=int, default=100), 1000))
+    
+    store = get_job_store()
+    return jsonify({
+        "jobs": store.dead_letters(limit=limit, **filters),
+        "total": store.dead_letter_count(**filters)
+    })
+
+
+@bp.post("/api/admin/dlq/replay")
+def replay_dead_letters():
+    """
+    POST /api/admin/dlq/replay
+    
+    Requires: Authorization: Bearer <ADMIN_TOKEN>
+    
+    Body: {"workflow": "...", "error_class": "...", "since": 0, "until": 0, "limit": 1000}
+    (all optional; no filters replays the whole DLQ)
+    
+    Re-queues matching jobs with a fresh attempt budget in chunked transactions
+    """
+    if not _is_authorized(request):
+        return jsonify({"error": "unauthorized"}), 401
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        filters = _filters(data)
+        limit = int(data["limit"]) if data.get("limit") is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "bad_request", "message": "since/until/limit must be numbers"}), 400
+    
+    replayed = get_job_store().replay_dead_letters(max_jobs=limit, **filters)
+    logger.info(f"DLQ replay: {replayed} jobs re-queued (filters={filters})")
+    return jsonify({"ok": True, "replayed": replayed})
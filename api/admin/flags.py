@@ -2,11 +2,12 @@
 Admin API: Database-backed feature flags
 """
 from flask import Blueprint, jsonify, request
-import sqlite3
 import os
 import logging
 from datetime import datetime
 
+from services.db import get_conn
+
 logger = logging.getLogger("levqor.flags")
 bp = Blueprint("flags_admin", __name__)
 
@@ -31,8 +32,7 @@ def get_flags():
         return jsonify({"error": "unauthorized"}), 401
     
     try:
-        conn = sqlite3.connect("levqor.db")
-        cursor = conn.cursor()
+        cursor = get_conn().cursor()
         cursor.execute("SELECT key, value, updated_at FROM feature_flags ORDER BY key")
         
         flags = {
@@ -43,8 +43,6 @@ def get_flags():
             for row in cursor.fetchall()
         }
         
-        conn.close()
-        
         return jsonify(flags)
     
     except Exception as e:
@@ -74,19 +72,15 @@ def set_flag():
         if not key:
             return jsonify({"error": "bad_request", "message": "key required"}), 400
         
-        conn = sqlite3.connect("levqor.db")
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO feature_flags (key, value, updated_at)
-            VALUES (?, ?, CURRENT_TIMESTAMP)
-            ON CONFLICT(key) DO UPDATE SET
-                value = excluded.value,
-                updated_at = CURRENT_TIMESTAMP
-        """, (key, str(value)))
-        
-        conn.commit()
-        conn.close()
+        conn = get_conn()
+        with conn:
+            conn.execute("""
+                INSERT INTO feature_flags (key, value, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(key) DO UPDATE SET
+                    value = excluded.value,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (key, str(value)))
         
         logger.info(f"Feature flag updated: {key}={value}")
         
@@ -109,11 +103,7 @@ def get_flag(key, default="false"):
         bool: True if flag value is "true" (case-insensitive)
     """
     try:
-        conn = sqlite3.connect("levqor.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT value FROM feature_flags WHERE key=?", (key,))
-        row = cursor.fetchone()
-        conn.close()
+        row = get_conn().execute("SELECT value FROM feature_flags WHERE key=?", (key,)).fetchone()
         
         value = row[0] if row else default
         return value.lower() == "true"
@@ -3,10 +3,11 @@ Growth intelligence API - funnel analytics and referral ROI tracking.
 """
 from flask import Blueprint, request, jsonify
 import os
-import sqlite3
 import time
 import logging
 
+from services.db import get_conn
+
 logger = logging.getLogger("levqor.growth_admin")
 bp = Blueprint("growth_admin", __name__)
 
@@ -34,8 +35,7 @@ def growth_analytics():
         return jsonify({"error": "unauthorized"}), 401
     
     try:
-        conn = sqlite3.connect("levqor.db")
-        c = conn.cursor()
+        c = get_conn().cursor()
         
         # 30-day window for funnel analysis
         window_start = int(time.time()) - (30 * 86400)
@@ -68,8 +68,6 @@ def growth_analytics():
         revenue_raw = c.fetchall()
         revenue = {k: int(v or 0) for k, v in revenue_raw}
         
-        conn.close()
-        
         # Build funnel analysis
         all_sources = set(list(visits.keys()) + list(signups.keys()) + list(revenue.keys()))
         funnel = []
@@ -0,0 +1,86 @@
+"""
+Admin API: Plan tier (and so request budget) of each API key
+"""
+from flask import Blueprint, jsonify, request
+import os
+import logging
+
+from services.job_store import get_job_store
+from services.key_plans import key_tag, plan_for_price, PLAN_RATE_LIMITS, API_KEY_PLAN_DEFAULT
+
+logger = logging.getLogger("levqor.key_plans_admin")
+bp = Blueprint("key_plans_admin", __name__)
+
+
+def _is_authorized(req):
+    """Check if request has valid admin token"""
+    token = (req.headers.get("Authorization") or "").replace("Bearer ", "")
+    admin_token = os.getenv("ADMIN_TOKEN", "")
+    return token and token == admin_token
+
+
+@bp.get("/api/admin/key_plans")
+def list_key_plans():
+    """
+    GET /api/admin/key_plans
+
+    Requires: Authorization: Bearer <ADMIN_TOKEN>
+
+    Returns plan tiers with their budgets and every key assigned to one
+    """
+    if not _is_authorized(request):
+        return jsonify({"error": "unauthorized"}), 401
+
+    return jsonify({
+        "plans": PLAN_RATE_LIMITS,
+        "default_plan": API_KEY_PLAN_DEFAULT,
+        "keys": get_job_store().key_plans.all()
+    })
+
+
+@bp.put("/api/admin/key_plans")
+def set_key_plan():
+    """
+    PUT /api/admin/key_plans
+
+    Requires: Authorization: Bearer <ADMIN_TOKEN>
+
+    Body: {"api_key": "...", "plan": "pro"} or {"key_tag": "...", "price_id": "price_..."}
+    (key_tag is the owner tag shown on jobs; price_id is a Stripe price from
+    scripts/create_stripe_prices.py)
+    """
+    if not _is_authorized(request):
+        return jsonify({"error": "unauthorized"}), 401
+
+    data = request.get_json(silent=True) or {}
+    api_key, tag = data.get("api_key"), data.get("key_tag")
+    if not isinstance(api_key, str) and not isinstance(tag, str):
+        return jsonify({"error": "bad_request", "message": "api_key or key_tag is required"}), 400
+
+    plan = data.get("plan")
+    if plan is None and data.get("price_id") is not None:
+        plan = plan_for_price(data.get("price_id"))
+    if plan not in PLAN_RATE_LIMITS:
+        return jsonify({"error": "bad_request", "message": "plan or price_id must name one of the plans",
+                        "plans": sorted(PLAN_RATE_LIMITS)}), 400
+
+    assignment = get_job_store().key_plans.set_plan(key_tag(api_key) if isinstance(api_key, str) else tag, plan)
+    return jsonify({"ok": True, "key_plan": assignment})
+
+
+@bp.delete("/api/admin/key_plans/<tag>")
+def delete_key_plan(tag):
+    """
+    DELETE /api/admin/key_plans/<key_tag>
+
+    Requires: Authorization: Bearer <ADMIN_TOKEN>
+
+    Puts the key back on the configured or default plan
+    """
+    if not _is_authorized(request):
+        return jsonify({"error": "unauthorized"}), 401
+
+    if not get_job_store().key_plans.remove(tag):
+        return jsonify({"error": "not_found", "key_tag": tag}), 404
+    logger.info(f"Removed plan assignment for API key {tag}")
+    return jsonify({"ok": True})
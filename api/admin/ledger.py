@@ -7,6 +7,8 @@ import sqlite3
 import os
 import logging
 
+from services.db import get_conn
+
 logger = logging.getLogger("levqor.ledger")
 bp = Blueprint("ledger", __name__)
 
@@ -36,8 +38,7 @@ def get_ledger():
         return jsonify({"error": "unauthorized"}), 401
     
     try:
-        conn = sqlite3.connect("levqor.db")
-        cursor = conn.cursor()
+        cursor = get_conn().cursor()
         
         # Get partner conversions (if table exists)
         try:
@@ -66,8 +67,6 @@ def get_ledger():
         total_costs = openai_cost + infra_cost + pending_partner
         net = round(stripe_revenue - total_costs, 2)
         
-        conn.close()
-        
         return jsonify({
             "revenue_30d": stripe_revenue,
             "openai_cost_30d": openai_cost,
@@ -0,0 +1,88 @@
+"""
+Admin API: Per-workflow concurrency caps and submission rates
+"""
+from flask import Blueprint, jsonify, request
+import os
+import logging
+
+from services.job_store import get_job_store
+
+logger = logging.getLogger("levqor.workflow_limits_admin")
+bp = Blueprint("workflow_limits_admin", __name__)
+
+
+def _is_authorized(req):
+    """Check if request has valid admin token"""
+    token = (req.headers.get("Authorization") or "").replace("Bearer ", "")
+    admin_token = os.getenv("ADMIN_TOKEN", "")
+    return token and token == admin_token
+
+
+def _positive(value, cast):
+    """None stays None (no limit); anything else must be a positive number"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError
+    value = cast(value)
+    if value <= 0:
+        raise ValueError
+    return value
+
+
+@bp.get("/api/admin/workflow_limits")
+def list_workflow_limits():
+    """
+    GET /api/admin/workflow_limits
+    
+    Requires: Authorization: Bearer <ADMIN_TOKEN>
+    
+    Returns configured limits with running counts and token bucket levels
+    """
+    if not _is_authorized(request):
+        return jsonify({"error": "unauthorized"}), 401
+    
+    return jsonify({"limits": get_job_store().limit_state()})
+
+
+@bp.put("/api/admin/workflow_limits/<workflow>")
+def set_workflow_limit(workflow):
+    """
+    PUT /api/admin/workflow_limits/<workflow>
+    
+    Requires: Authorization: Bearer <ADMIN_TOKEN>
+    
+    Body: {"max_concurrency": 4, "rate_per_min": 600, "burst": 100}
+    (omitted or null fields mean unlimited; burst defaults to one minute of rate)
+    """
+    if not _is_authorized(request):
+        return jsonify({"error": "unauthorized"}), 401
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        max_concurrency = _positive(data.get("max_concurrency"), int)
+        rate_per_min = _positive(data.get("rate_per_min"), float)
+        burst = _positive(data.get("burst"), int)
+    except (TypeError, ValueError):
+        return jsonify({"error": "bad_request", "message": "limits must be positive numbers or null"}), 400
+    
+    limit = get_job_store().limits.set_limit(workflow, max_concurrency, rate_per_min, burst)
+    return jsonify({"ok": True, "limit": limit})
+
+
+@bp.delete("/api/admin/workflow_limits/<workflow>")
+def delete_workflow_limit(workflow):
+    """
+    DELETE /api/admin/workflow_limits/<workflow>
+    
+    Requires: Authorization: Bearer <ADMIN_TOKEN>
+    
+    Removes every limit for the workflow
+    """
+    if not _is_authorized(request):
+        return jsonify({"error": "unauthorized"}), 401
+    
+    if not get_job_store().limits.remove(workflow):
+        return jsonify({"error": "not_found", "workflow": workflow}), 404
+    logger.info(f"Removed workflow limits for {workflow}")
+    return jsonify({"ok": True})
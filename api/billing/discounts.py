@@ -4,12 +4,13 @@ Flag-gated by PRICING_AUTO_APPLY.
 """
 from flask import Blueprint, request, jsonify
 import os
-import sqlite3
 import time
 import random
 import string
 import logging
 
+from services.db import get_conn
+
 logger = logging.getLogger("levqor.discounts")
 bp = Blueprint("discounts", __name__)
 
@@ -23,11 +24,7 @@ def _check_admin(req):
 def _get_flag(key: str, default: str = "false") -> str:
     """Get feature flag value from database"""
     try:
-        conn = sqlite3.connect("levqor.db")
-        c = conn.cursor()
-        c.execute("SELECT value FROM feature_flags WHERE key = ?", [key])
-        row = c.fetchone()
-        conn.close()
+        row = get_conn().execute("SELECT value FROM feature_flags WHERE key = ?", [key]).fetchone()
         return row[0] if row else default
     except:
         return default
@@ -49,8 +46,7 @@ def preview_discount():
     - reason: Why this discount is suggested
     """
     try:
-        conn = sqlite3.connect("levqor.db")
-        c = conn.cursor()
+        c = get_conn().cursor()
         
         # Check signups in last 7 days
         week_ago = int(time.time()) - (7 * 86400)
@@ -67,8 +63,6 @@ def preview_discount():
         """, [week_ago])
         recent_conversions = c.fetchone()[0]
         
-        conn.close()
-        
         # Suggest discount based on activity
         if recent_signups < 5:
             suggestion = {
@@ -142,14 +136,13 @@ def create_discount():
         expires_ts = int(time.time() + (days * 86400))
         
         # Store in database
-        conn = sqlite3.connect("levqor.db")
-        conn.execute("""
-            INSERT OR REPLACE INTO discounts 
-            (code, kind, pct, expires_ts, reason, active) 
-            VALUES (?, ?, ?, ?, ?, 1)
-        """, [code, "percent", pct, expires_ts, reason])
-        conn.commit()
-        conn.close()
+        conn = get_conn()
+        with conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO discounts 
+                (code, kind, pct, expires_ts, reason, active) 
+                VALUES (?, ?, ?, ?, ?, 1)
+            """, [code, "percent", pct, expires_ts, reason])
         
         logger.info(f"Created discount code: {code} ({pct}% off, {days} days)")
         
@@ -187,8 +180,7 @@ def active_discounts():
     }
     """
     try:
-        conn = sqlite3.connect("levqor.db")
-        c = conn.cursor()
+        c = get_conn().cursor()
         
         now = int(time.time())
         c.execute("""
@@ -208,8 +200,6 @@ def active_discounts():
                 "reason": row[4]
             })
         
-        conn.close()
-        
         return jsonify({
             "codes": codes,
             "count": len(codes)
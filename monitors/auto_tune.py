@@ -2,22 +2,26 @@
 Auto-tuning engine for SLO and performance targets.
 Analyzes historical metrics and suggests parameter adjustments.
 """
+import os
 import time
-import sqlite3
 import logging
 from typing import Dict, Any
 
+from services.db import get_conn
+
 logger = logging.getLogger("levqor.auto_tune")
 
+# Used until the KV store has queue observations (fresh installs)
+DEFAULT_QUEUE_MAX_DEPTH = int(os.environ.get("QUEUE_MAX_DEPTH", 10000))
+DEFAULT_QUEUE_MAX_AGE = float(os.environ.get("QUEUE_MAX_AGE_SECONDS", 300))
+
 def get_recent_metrics() -> Dict[str, float]:
     """Fetch last 7 days of performance metrics from KV store"""
-    conn = sqlite3.connect("levqor.db")
-    c = conn.cursor()
+    c = get_conn().cursor()
     
     # Get stored metrics
     c.execute("SELECT key, value FROM kv WHERE key LIKE '%_p95%' OR key LIKE '%queue%'")
     metrics = {k: float(v) for k, v in c.fetchall()}
-    conn.close()
     
     return metrics
 
@@ -38,16 +42,42 @@ def compute_targets(observed_p95: float, observed_queue: int) -> Dict[str, int]:
         "queue_max_depth": queue_max
     }
 
+def queue_limits() -> Dict[str, float]:
+    """
+    Queue depth/age ceilings used by intake admission control.
+    
+    An applied `queue_max_depth` / `queue_max_age_seconds` in the KV store
+    wins; otherwise queue_max_depth is derived from the observed p95 queue
+    depth exactly as suggest_tuning() does. Without observations the
+    QUEUE_MAX_DEPTH / QUEUE_MAX_AGE_SECONDS defaults apply.
+    """
+    try:
+        metrics = get_recent_metrics()
+    except Exception as e:
+        logger.debug(f"Queue limits: no KV metrics ({e})")
+        metrics = {}
+    
+    if "queue_max_depth" in metrics:
+        max_depth = int(metrics["queue_max_depth"])
+    elif "queue_depth_p95" in metrics:
+        max_depth = compute_targets(metrics.get("observed_p95", 100), metrics["queue_depth_p95"])["queue_max_depth"]
+    else:
+        max_depth = DEFAULT_QUEUE_MAX_DEPTH
+    
+    return {
+        "queue_max_depth": max_depth,
+        "queue_max_age_seconds": metrics.get("queue_max_age_seconds", DEFAULT_QUEUE_MAX_AGE)
+    }
+
 def log_tuning_change(param: str, old_val: str, new_val: str, note: str, actor: str = "auto_tune"):
     """Record tuning change to audit log"""
-    conn = sqlite3.connect("levqor.db")
+    conn = get_conn()
     ts = int(time.time())
-    conn.execute(
-        "INSERT INTO tuning_audit(ts, actor, param, old_val, new_val, note) VALUES(?,?,?,?,?,?)",
-        [ts, actor, param, old_val, new_val, note]
-    )
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(
+            "INSERT INTO tuning_audit(ts, actor, param, old_val, new_val, note) VALUES(?,?,?,?,?,?)",
+            [ts, actor, param, old_val, new_val, note]
+        )
     logger.info(f"Tuning audit: {param} {old_val} → {new_val}")
 
 def suggest_tuning(current_p95: float = 80, current_queue: int = 1) -> Dict[str, Any]:
@@ -4,11 +4,12 @@ Autoscale Controller - SLO-based worker scaling with cost guardrails
 import os
 import json
 import logging
-import sqlite3
 from datetime import datetime, timedelta
 from collections import deque
 from typing import Dict, Any, Literal
 
+from services.db import get_conn, SQLITE_PATH
+
 log = logging.getLogger("levqor.autoscale")
 
 ACTION = Literal["scale_up", "scale_down", "freeze", "hold"]
@@ -24,11 +25,7 @@ class AutoscaleController:
     def _get_flag(self, key: str, default: str = "false") -> bool:
         """Read feature flag from database"""
         try:
-            conn = sqlite3.connect("levqor.db")
-            cursor = conn.cursor()
-            cursor.execute("SELECT value FROM feature_flags WHERE key=?", (key,))
-            row = cursor.fetchone()
-            conn.close()
+            row = get_conn().execute("SELECT value FROM feature_flags WHERE key=?", (key,)).fetchone()
             value = row[0] if row else default
             return value.lower() == "true"
         except Exception:
@@ -73,8 +70,7 @@ class AutoscaleController:
         Returns margin percentage (0-100).
         """
         try:
-            conn = sqlite3.connect("levqor.db")
-            c = conn.cursor()
+            c = get_conn().cursor()
             
             # Get revenue and costs from KV
             c.execute("SELECT value FROM kv WHERE key='stripe_revenue_30d'")
@@ -89,8 +85,6 @@ class AutoscaleController:
             infra_row = c.fetchone()
             infra_cost = float(infra_row[0]) if infra_row else 0.0
             
-            conn.close()
-            
             total_cost = openai_cost + infra_cost
             if revenue == 0:
                 return 0.0
@@ -105,13 +99,10 @@ class AutoscaleController:
     def get_spend_last_24h(self) -> float:
         """Estimate spend from last 24h (placeholder - integrate with billing)"""
         try:
-            import sqlite3
-            db_path = os.environ.get("SQLITE_PATH", "levqor.db")
-            if not os.path.exists(db_path):
+            if not os.path.exists(SQLITE_PATH):
                 return 0.0
             
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
+            cursor = get_conn().cursor()
             
             cutoff = (datetime.utcnow() - timedelta(hours=24)).isoformat()
             cursor.execute(
@@ -119,7 +110,6 @@ class AutoscaleController:
                 (cutoff,)
             )
             new_users = cursor.fetchone()[0]
-            conn.close()
             
             return new_users * 0.1
         except Exception as e:
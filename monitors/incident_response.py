@@ -8,11 +8,15 @@ import requests
 from datetime import datetime
 from typing import Dict, Any, Optional
 
+from services.job_store import get_job_store
+
 log = logging.getLogger("levqor.incident")
 
+INCIDENTS_LOG = os.environ.get("INCIDENTS_LOG", os.path.join("logs", "incidents.log"))
+
 class IncidentResponder:
     def __init__(self):
-        self.incidents_log = "logs/incidents.log"
+        self.incidents_log = INCIDENTS_LOG
         self.telegram_token = os.environ.get("TELEGRAM_BOT_TOKEN")
         self.telegram_chat_id = os.environ.get("TELEGRAM_CHAT_ID")
         
@@ -83,8 +87,13 @@ class IncidentResponder:
             self.log_incident(incident)
             return {"ok": True, "recovered": False, "message": "System healthy"}
         
+        dlq_flushed = 0
         if dry_run:
-            actions_taken.append("DRY-RUN: Would flush DLQ to retry queue")
+            try:
+                pending = get_job_store().dead_letter_count()
+                actions_taken.append(f"DRY-RUN: Would flush {pending} DLQ jobs to retry queue")
+            except Exception as e:
+                actions_taken.append(f"DRY-RUN: Could not read DLQ: {e}")
             actions_taken.append("DRY-RUN: Would restart queue workers")
             
             config_path = "config/flags.json"
@@ -95,7 +104,8 @@ class IncidentResponder:
                         actions_taken.append("DRY-RUN: Would rotate app process")
         else:
             try:
-                actions_taken.append("Flushed DLQ to retry queue")
+                dlq_flushed = get_job_store().replay_dead_letters()
+                actions_taken.append(f"Flushed {dlq_flushed} DLQ jobs to retry queue")
             except Exception as e:
                 actions_taken.append(f"Failed to flush DLQ: {e}")
             
@@ -132,6 +142,7 @@ class IncidentResponder:
             "recovered": not dry_run,
             "dry_run": dry_run,
             "actions": actions_taken,
+            "dlq_flushed": dlq_flushed,
             "timestamp": timestamp
         }
 
@@ -2,6 +2,7 @@
 Automated Task Scheduler - APScheduler integration for periodic jobs
 """
 import os
+import time
 import logging
 import subprocess
 from datetime import datetime
@@ -78,21 +79,19 @@ def run_cost_prediction():
 
 def update_kv_costs():
     """Persist cost metrics to KV store (hourly)"""
-    import sqlite3
+    from services.db import get_conn
     log.debug("Updating KV cost metrics...")
     
     def _kv_upsert(key, val):
-        conn = sqlite3.connect('levqor.db')
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO kv (key, value, updated_at) 
-            VALUES (?, ?, CURRENT_TIMESTAMP)
-            ON CONFLICT(key) DO UPDATE SET 
-                value = excluded.value,
-                updated_at = CURRENT_TIMESTAMP
-        """, (key, str(val)))
-        conn.commit()
-        conn.close()
+        conn = get_conn()
+        with conn:
+            conn.execute("""
+                INSERT INTO kv (key, value, updated_at) 
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(key) DO UPDATE SET 
+                    value = excluded.value,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (key, str(val)))
     
     try:
         from scripts.cost_predict import load_cached_forecast
@@ -141,6 +140,73 @@ def run_governance_report():
     except Exception as e:
         log.error(f"Governance report error: {e}")
 
+def run_job_archival():
+    """Archive finished jobs past JOB_RETENTION_SECONDS in small chunks"""
+    from services.job_store import get_job_store
+    
+    retention = float(os.environ.get("JOB_RETENTION_SECONDS", 7 * 86400))
+    chunk_size = int(os.environ.get("JOB_ARCHIVE_CHUNK", 500))
+    try:
+        store = get_job_store()
+        cutoff = time.time() - retention
+        total = 0
+        while True:
+            archived = store.archive_expired(cutoff, chunk_size)
+            total += archived
+            if archived < chunk_size:
+                break
+            time.sleep(0.05)  # let request threads take the write lock between chunks
+        store.prune_rates()
+        store.purge_idempotency_keys(time.time() - float(os.environ.get("IDEMPOTENCY_TTL", 86400)))
+        store.results.prune()
+        if total:
+            log.info(f"✅ Archived {total} finished jobs")
+    except Exception as e:
+        log.error(f"Job archival error: {e}")
+
+def run_job_schedules():
+    """Promote due delayed jobs and fire due recurring schedules"""
+    from services.job_store import get_job_store
+    from services.recurring import get_recurring_schedules, SCHEDULE_FIRE_BATCH
+    
+    try:
+        promoted = get_job_store().promote_due()
+        fired = 0
+        while True:
+            batch = get_recurring_schedules().fire_due()
+            fired += batch
+            if batch < SCHEDULE_FIRE_BATCH:
+                break
+        if promoted or fired:
+            log.debug(f"Job schedules: {promoted} delayed jobs queued, {fired} recurring jobs submitted")
+    except Exception as e:
+        log.error(f"Job schedule tick error: {e}")
+
+def run_rate_limiter_eviction(limiter):
+    """Drop rate-limiter keys that are back at full capacity"""
+    try:
+        evicted = limiter.evict_idle()
+        if evicted:
+            log.debug(f"Rate limiter: evicted {evicted} idle keys, {len(limiter)} left")
+    except Exception as e:
+        log.error(f"Rate limiter eviction error: {e}")
+
+def schedule_rate_limiter_eviction(scheduler, limiter):
+    """Sweep `limiter` every RATE_LIMIT_EVICT_SECONDS on an initialized scheduler"""
+    if scheduler is None:
+        return
+    scheduler.add_job(
+        run_rate_limiter_eviction,
+        'interval',
+        seconds=float(os.environ.get("RATE_LIMIT_EVICT_SECONDS", 60)),
+        args=[limiter],
+        id='rate_limit_eviction',
+        name='Rate limiter idle-key eviction',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True
+    )
+
 def init_scheduler():
     """Initialize and start APScheduler"""
     try:
@@ -207,8 +273,28 @@ def init_scheduler():
             replace_existing=True
         )
         
+        scheduler.add_job(
+            run_job_archival,
+            'interval',
+            minutes=5,
+            id='job_archival',
+            name='Finished job archival',
+            replace_existing=True
+        )
+        
+        scheduler.add_job(
+            run_job_schedules,
+            'interval',
+            seconds=float(os.environ.get("SCHEDULE_TICK_SECONDS", 5)),
+            id='job_schedules',
+            name='Delayed and recurring job submission',
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+        
         scheduler.start()
-        log.info("✅ APScheduler initialized with 7 jobs")
+        log.info("✅ APScheduler initialized with 9 jobs")
         return scheduler
         
     except ImportError:
@@ -1,15 +1,31 @@
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from jsonschema import validate, ValidationError, FormatChecker
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
 from time import time
 from uuid import uuid4
-from collections import defaultdict, deque
-import sqlite3
+from collections import Counter, defaultdict
+import hmac
+import math
 import json
 import os
 import logging
 import sys
 import jwt
 from datetime import datetime, timedelta
+from services.job_store import get_job_store, DuplicateIdempotencyKey, CANCELLABLE_STATUSES
+from services.workflow_limits import WorkflowBurstExceeded
+from services.idempotency import get_idempotency_index, MAX_KEY_LENGTH as MAX_IDEMPOTENCY_KEY_LENGTH
+from services.job_events import get_status_broker, TooManyStreams
+from services.admission import get_admission_controller
+from services.result_cache import memo_key, RESULT_CACHE_MAX_TTL
+from services.recurring import get_recurring_schedules, cron_trigger, ScheduleLimitExceeded
+from services.rate_limiter import GCRALimiter, SharedGCRALimiter
+from services.key_plans import key_tag
+from services.db import get_conn, SQLITE_PATH
+from services.intake_body import read_body, parse_body, BodyTooLarge, PAYLOAD_MAX_BYTES, INTAKE_MAX_BYTES
+from services.callbacks import get_callback_dispatcher, blocked_url
+from services.worker_pool import get_worker_pool, configured_worker_count, VISIBILITY_TIMEOUT
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 log = logging.getLogger("levqor")
@@ -47,73 +63,77 @@ app = Flask(__name__,
 
 app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_CONTENT_LENGTH", 512 * 1024))
 
-DB_PATH = os.environ.get("SQLITE_PATH", os.path.join(os.getcwd(), "levqor.db"))
-_db_connection = None
+DB_PATH = SQLITE_PATH
+_db_schema_ready = False
 
 API_KEYS = set((os.environ.get("API_KEYS") or "").split(",")) - {""}
 API_KEYS_NEXT = set((os.environ.get("API_KEYS_NEXT") or "").split(",")) - {""}
 ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+# Credential of external workers (/api/v1/worker/*); customer API keys can't lease jobs
+WORKER_TOKEN = os.environ.get("WORKER_TOKEN", "")
 JWT_SECRET = os.environ.get("JWT_SECRET", "dev-secret-change-in-prod")
 
 RATE_BURST = int(os.environ.get("RATE_BURST", 20))
 RATE_GLOBAL = int(os.environ.get("RATE_GLOBAL", 200))
+PROTECTED_PATH_RATE = int(os.environ.get("PROTECTED_PATH_RATE", 60))
+RATE_LIMIT_SHARED = os.environ.get("RATE_LIMIT_SHARED", "true").lower() == "true"
 WINDOW = 60
 
-_IP_HITS = defaultdict(deque)
-_ALL_HITS = deque()
-_PROTECTED_PATH_HITS = defaultdict(deque)
+# Per-IP ("ip:<addr>", "protected:<addr>"), per-API-key ("key:<tag>", sized by
+# the key's plan, see services/key_plans.py) and service-wide ("global") budgets,
+# shared by all worker processes through the database unless RATE_LIMIT_SHARED=false
+if RATE_LIMIT_SHARED:
+    RATE_LIMITER = SharedGCRALimiter(DB_PATH, RATE_BURST, WINDOW)
+else:
+    RATE_LIMITER = GCRALimiter(RATE_BURST, WINDOW)
 
 def get_db():
-    global _db_connection
-    if _db_connection is None:
-        db_dir = os.path.dirname(DB_PATH)
-        if db_dir and not os.path.exists(db_dir):
-            os.makedirs(db_dir, exist_ok=True)
-        _db_connection = sqlite3.connect(DB_PATH, check_same_thread=False)
-        _db_connection.execute("""
-          CREATE TABLE IF NOT EXISTS users(
-            id TEXT PRIMARY KEY,
-            email TEXT UNIQUE NOT NULL,
-            name TEXT,
-            locale TEXT,
-            currency TEXT,
-            meta TEXT,
-            created_at REAL,
-            updated_at REAL
-          )
-        """)
-        _db_connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users(email)")
+    """This thread's pooled connection to DB_PATH; the app tables are created on first use"""
+    global _db_schema_ready
+    conn = get_conn(DB_PATH)
+    if not _db_schema_ready:
+        with conn:
+            conn.execute("""
+              CREATE TABLE IF NOT EXISTS users(
+                id TEXT PRIMARY KEY,
+                email TEXT UNIQUE NOT NULL,
+                name TEXT,
+                locale TEXT,
+                currency TEXT,
+                meta TEXT,
+                created_at REAL,
+                updated_at REAL
+              )
+            """)
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users(email)")
         
-        _db_connection.execute("""
-          CREATE TABLE IF NOT EXISTS referrals(
-            id TEXT PRIMARY KEY,
-            user_id TEXT,
-            email TEXT,
-            source TEXT NOT NULL,
-            campaign TEXT,
-            medium TEXT,
-            created_at REAL,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-          )
-        """)
-        _db_connection.execute("CREATE INDEX IF NOT EXISTS idx_referrals_user_id ON referrals(user_id)")
-        _db_connection.execute("CREATE INDEX IF NOT EXISTS idx_referrals_source ON referrals(source)")
-        _db_connection.execute("CREATE INDEX IF NOT EXISTS idx_referrals_created_at ON referrals(created_at)")
+            conn.execute("""
+              CREATE TABLE IF NOT EXISTS referrals(
+                id TEXT PRIMARY KEY,
+                user_id TEXT,
+                email TEXT,
+                source TEXT NOT NULL,
+                campaign TEXT,
+                medium TEXT,
+                created_at REAL,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+              )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_referrals_user_id ON referrals(user_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_referrals_source ON referrals(source)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_referrals_created_at ON referrals(created_at)")
         
-        _db_connection.execute("""
-          CREATE TABLE IF NOT EXISTS analytics_aggregates(
-            day DATE PRIMARY KEY,
-            dau INTEGER NOT NULL DEFAULT 0,
-            wau INTEGER NOT NULL DEFAULT 0,
-            mau INTEGER NOT NULL DEFAULT 0,
-            computed_at TEXT NOT NULL
-          )
-        """)
-        
-        _db_connection.execute("PRAGMA journal_mode=WAL")
-        _db_connection.execute("PRAGMA synchronous=NORMAL")
-        _db_connection.commit()
-    return _db_connection
+            conn.execute("""
+              CREATE TABLE IF NOT EXISTS analytics_aggregates(
+                day DATE PRIMARY KEY,
+                dau INTEGER NOT NULL DEFAULT 0,
+                wau INTEGER NOT NULL DEFAULT 0,
+                mau INTEGER NOT NULL DEFAULT 0,
+                computed_at TEXT NOT NULL
+              )
+            """)
+        _db_schema_ready = True
+    return conn
 
 def require_key():
     key = request.headers.get("X-Api-Key")
@@ -121,27 +141,57 @@ def require_key():
         return None
     return jsonify({"error": "forbidden"}), 403
 
-def throttle():
-    now = time()
+def require_worker():
+    """Worker endpoints see every tenant's jobs: only WORKER_TOKEN (or ADMIN_TOKEN) may call them"""
+    token = request.headers.get("X-Worker-Token") or ""
+    if any(secret and hmac.compare_digest(token, secret) for secret in (WORKER_TOKEN, ADMIN_TOKEN)):
+        return None
+    return jsonify({"error": "forbidden"}), 403
+
+def key_owner():
+    """Stable, non-reversible owner tag for the caller's API key"""
+    return key_tag(request.headers.get("X-Api-Key"))
+
+def set_rate_limit_headers(resp, decision):
+    resp.headers["X-RateLimit-Limit"] = str(decision.limit)
+    resp.headers["X-RateLimit-Remaining"] = str(decision.remaining)
+    resp.headers["X-RateLimit-Reset"] = str(math.ceil(decision.reset_at))
+
+def rate_limited(decision):
+    resp = jsonify({"error": "rate_limited"})
+    resp.status_code = 429
+    resp.headers["Retry-After"] = str(max(1, math.ceil(decision.retry_after)))
+    set_rate_limit_headers(resp, decision)
+    return resp
+
+def rate_bucket():
+    """(limiter key, capacity) the caller's requests are charged to"""
+    key = request.headers.get("X-Api-Key")
+    if key and (key in API_KEYS or key in API_KEYS_NEXT):
+        # Issued keys spend their plan's budget wherever they connect from
+        owner = key_owner()
+        return f"key:{owner}", JOB_STORE.key_plans.rate_limit(owner)
     ip = request.headers.get("X-Forwarded-For", request.remote_addr) or "unknown"
-    
-    while _ALL_HITS and now - _ALL_HITS[0] > WINDOW:
-        _ALL_HITS.popleft()
-    dq = _IP_HITS[ip]
-    while dq and now - dq[0] > WINDOW:
-        dq.popleft()
-    
-    if len(dq) >= RATE_BURST or len(_ALL_HITS) >= RATE_GLOBAL:
-        resp = jsonify({"error": "rate_limited"})
-        resp.status_code = 429
-        resp.headers["Retry-After"] = "60"
-        resp.headers["X-RateLimit-Limit"] = str(RATE_BURST)
-        resp.headers["X-RateLimit-Remaining"] = "0"
-        resp.headers["X-RateLimit-Reset"] = str(int(now) + WINDOW)
-        return resp
-    
-    dq.append(now)
-    _ALL_HITS.append(now)
+    return f"ip:{ip}", RATE_BURST
+
+def max_throttle_cost():
+    """Largest cost throttle() can ever admit for this caller; anything above it would 429 forever"""
+    return min(rate_bucket()[1], RATE_GLOBAL)
+
+def throttle(cost=1):
+    now = time()
+    bucket, limit = rate_bucket()
+    
+    decision = RATE_LIMITER.hit(bucket, cost, now, limit=limit)
+    if decision.allowed:
+        overall = RATE_LIMITER.hit("global", cost, now, limit=RATE_GLOBAL)
+        if not overall.allowed:
+            RATE_LIMITER.refund(bucket, cost, limit=limit)
+            decision = overall
+    if not decision.allowed:
+        return rate_limited(decision)
+    # Reported on the response by add_headers()
+    g.rate_limit = decision
     return None
 
 def protected_path_throttle():
@@ -149,21 +199,10 @@ def protected_path_throttle():
     if not any(request.path.startswith(prefix) for prefix in protected_prefixes):
         return None
     
-    now = time()
     ip = request.headers.get("X-Forwarded-For", request.remote_addr) or "unknown"
-    key = f"protected:{ip}"
-    
-    dq = _PROTECTED_PATH_HITS[key]
-    while dq and now - dq[0] > WINDOW:
-        dq.popleft()
-    
-    if len(dq) >= 60:
-        resp = jsonify({"error": "rate_limited"})
-        resp.status_code = 429
-        resp.headers["Retry-After"] = "60"
-        return resp
-    
-    dq.append(now)
+    decision = RATE_LIMITER.hit(f"protected:{ip}", limit=PROTECTED_PATH_RATE)
+    if not decision.allowed:
+        return rate_limited(decision)
     return None
 
 @app.before_request
@@ -180,7 +219,7 @@ def _log_in():
 def add_headers(r):
     r.headers["Access-Control-Allow-Origin"] = "https://levqor.ai"
     r.headers["Access-Control-Allow-Methods"] = "GET,POST,OPTIONS,PATCH"
-    r.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Api-Key"
+    r.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Api-Key, Idempotency-Key"
     r.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains; preload"
     r.headers["Content-Security-Policy"] = "default-src 'none'; connect-src https://levqor.ai https://api.levqor.ai; img-src 'self' data:; style-src 'self' 'unsafe-inline'; script-src 'self'; frame-ancestors 'none'; base-uri 'none'; form-action 'self'"
     r.headers["Cross-Origin-Opener-Policy"] = "same-origin"
@@ -189,6 +228,9 @@ def add_headers(r):
     r.headers["X-Frame-Options"] = "DENY"
     r.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
     r.headers["Permissions-Policy"] = "geolocation=(), microphone=()"
+    decision = g.get("rate_limit")
+    if decision is not None and "X-RateLimit-Limit" not in r.headers:
+        set_rate_limit_headers(r, decision)
     return r
 
 @app.errorhandler(Exception)
@@ -287,7 +329,10 @@ def admin_impersonate():
     
     return jsonify({"token": token}), 200
 
-JOBS = {}
+JOB_STORE = get_job_store(DB_PATH)
+IDEMPOTENCY = get_idempotency_index()
+SCHEDULES = get_recurring_schedules()
+ADMISSION = get_admission_controller()
 
 INTAKE_SCHEMA = {
     "type": "object",
@@ -296,15 +341,72 @@ INTAKE_SCHEMA = {
         "payload": {"type": "object"},
         "callback_url": {"type": "string", "minLength": 1, "maxLength": 1024},
         "priority": {"type": "string", "enum": ["low", "normal", "high"]},
+        "memoize": {"type": "boolean"},
+        "memoize_ttl": {"type": "integer", "minimum": 1, "maximum": RESULT_CACHE_MAX_TTL},
+        "run_at": {"type": "number", "minimum": 0},
+        "cron": {"type": "string", "minLength": 9, "maxLength": 128},
+        "timezone": {"type": "string", "minLength": 1, "maxLength": 64},
     },
     "required": ["workflow", "payload"],
     "additionalProperties": False,
 }
 
+INTAKE_VALIDATOR = validator_for(INTAKE_SCHEMA)(INTAKE_SCHEMA, format_checker=FormatChecker())
+# Furthest ahead a run_at may be; later jobs would sit in 'scheduled' indefinitely
+RUN_AT_MAX_DAYS = float(os.environ.get("RUN_AT_MAX_DAYS", 365))
+DAG_MAX_STEPS = int(os.environ.get("DAG_MAX_STEPS", 50))
+
+DAG_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "steps": {
+            "type": "array",
+            "minItems": 1,
+            "maxItems": DAG_MAX_STEPS,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string", "pattern": "^[A-Za-z0-9_-]{1,64}$"},
+                    "workflow": {"type": "string", "minLength": 1, "maxLength": 128},
+                    "payload": {"type": "object"},
+                    "callback_url": {"type": "string", "minLength": 1, "maxLength": 1024},
+                    "priority": {"type": "string", "enum": ["low", "normal", "high"]},
+                    "depends_on": {"type": "array", "items": {"type": "string"}, "uniqueItems": True},
+                },
+                "required": ["id", "workflow", "payload"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["steps"],
+    "additionalProperties": False,
+}
+
+DAG_VALIDATOR = validator_for(DAG_SCHEMA)(DAG_SCHEMA)
+
+# Fields of the /api/v1/worker/* bodies the server reads; anything else
+# (result, error, ...) passes through to the job store as before
+WORKER_BODY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "worker_id": {"type": "string", "minLength": 1},
+        "limit": {"type": "integer"},
+        "visibility_timeout": {"type": "number"},
+        "workflows": {"type": "array", "items": {"type": "string"}},
+        "error_class": {"type": ["string", "null"]},
+    },
+    "required": ["worker_id"],
+}
+
+WORKER_BODY_VALIDATOR = validator_for(WORKER_BODY_SCHEMA)(WORKER_BODY_SCHEMA)
+INTAKE_BATCH_MAX = int(os.environ.get("INTAKE_BATCH_MAX", 1000))
+STATUS_BULK_MAX = int(os.environ.get("STATUS_BULK_MAX", 5000))
+SSE_RETRY_AFTER = int(os.environ.get("SSE_RETRY_AFTER", 5))
+
 STATUS_SCHEMA = {
     "type": "object",
     "properties": {
-        "status": {"type": "string", "enum": ["queued","running","succeeded","failed"]},
+        "status": {"type": "string", "enum": ["scheduled","waiting","queued","running","succeeded","failed","cancelled"]},
         "created_at": {"type": "number"},
         "result": {},
         "error": {},
@@ -340,6 +442,97 @@ USER_PATCH_SCHEMA = {
 def bad_request(message, details=None):
     return jsonify({"error": message, "details": details}), 400
 
+def check_intake_item(data, payload_size=None):
+    """
+    Validate one intake object; returns (message, details) on failure, else
+    None. `payload_size` is the payload's size as received, when known.
+    """
+    error = best_match(INTAKE_VALIDATOR.iter_errors(data))
+    if error is not None:
+        return ("Invalid request body", error.message)
+    
+    if payload_size is None:
+        payload_size = len(json.dumps(data["payload"]))
+    if payload_size > PAYLOAD_MAX_BYTES:
+        return ("payload too large", None)
+    
+    if "run_at" in data:
+        # The JSON parser turns 1e400 into inf and accepts NaN literals
+        if not math.isfinite(data["run_at"]):
+            return ("run_at must be a finite Unix timestamp", None)
+        if data["run_at"] > time() + RUN_AT_MAX_DAYS * 86400:
+            return ("run_at is too far in the future", {"max_days_ahead": RUN_AT_MAX_DAYS})
+    
+    if "callback_url" in data:
+        error = check_callback_url(data["callback_url"])
+        if error:
+            return error
+    
+    if "cron" in data:
+        try:
+            cron_trigger(data["cron"], data.get("timezone", "UTC"))
+        except ValueError as e:
+            return ("Invalid cron expression", str(e))
+    elif "timezone" in data:
+        return ("timezone is only valid with cron", None)
+    return None
+
+def check_callback_url(url):
+    """(message, details) if callbacks may not be sent to `url`, else None"""
+    if not url.startswith(("http://", "https://")):
+        return ("callback_url must be a valid HTTP(S) URL", None)
+    # URL-only check: DNS happens at delivery, off the request thread
+    reason = blocked_url(url)
+    if reason:
+        return ("callback_url not allowed", reason)
+    return None
+
+def check_dag(data, steps_size=None):
+    """
+    Validate a DAG submission; returns (message, details) on failure, else
+    None. Steps must have unique ids, known parents and no cycles.
+    """
+    error = best_match(DAG_VALIDATOR.iter_errors(data))
+    if error is not None:
+        return ("Invalid request body", error.message)
+    
+    steps = data["steps"]
+    ids = [step["id"] for step in steps]
+    if len(set(ids)) != len(ids):
+        return ("step ids must be unique", None)
+    known = set(ids)
+    for step in steps:
+        for parent in step.get("depends_on", []):
+            if parent not in known or parent == step["id"]:
+                return ("depends_on must name other steps of this DAG", f"{step['id']} -> {parent}")
+        if "callback_url" in step:
+            error = check_callback_url(step["callback_url"])
+            if error:
+                return (error[0], {"step": step["id"], "reason": error[1]})
+    if steps_size is None:
+        steps_size = len(json.dumps(steps))
+    if steps_size > PAYLOAD_MAX_BYTES:
+        return ("payload too large", None)
+    
+    # Kahn's algorithm: every step must become ready
+    remaining = {step["id"]: len(step.get("depends_on", [])) for step in steps}
+    children = defaultdict(list)
+    for step in steps:
+        for parent in step.get("depends_on", []):
+            children[parent].append(step["id"])
+    ready = [sid for sid, n in remaining.items() if n == 0]
+    seen = 0
+    while ready:
+        sid = ready.pop()
+        seen += 1
+        for child in children[sid]:
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                ready.append(child)
+    if seen != len(steps):
+        return ("steps contain a dependency cycle", None)
+    return None
+
 def row_to_user(row):
     if not row:
         return None
@@ -372,41 +565,290 @@ def intake():
     if rate_check:
         return rate_check
     
+    owner = key_owner()
+    idem_key = request.headers.get("Idempotency-Key")
+    if idem_key is not None:
+        if not idem_key or len(idem_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            return bad_request("Idempotency-Key must be 1-255 characters")
+        replay = idempotent_replay(owner, idem_key)
+        if replay:
+            return replay
+    
     if not request.is_json:
         return bad_request("Content-Type must be application/json")
-    data = request.get_json(silent=True)
-    if data is None:
+    try:
+        body = parse_body(read_body(request.stream, request.content_length))
+    except BodyTooLarge:
+        return jsonify({"error": "payload too large", "max_bytes": INTAKE_MAX_BYTES}), 413
+    if body is None:
         return bad_request("Invalid JSON")
+    data = body.data
+    if isinstance(data, dict) and "steps" in data:
+        if idem_key is not None:
+            return bad_request("Idempotency-Key is not supported for DAG submissions")
+        return create_dag(owner, data, body.value_size("steps"))
+    error = check_intake_item(data, body.value_size("payload"))
+    if error:
+        return bad_request(*error)
+    if "cron" in data:
+        if idem_key is not None:
+            return bad_request("Idempotency-Key is not supported for cron submissions")
+        return create_schedule(owner, data)
+    
+    job_id = uuid4().hex
+    delayed = data.get("run_at", 0) > time()
+    cached = memoized_results([(job_id, data)], owner)
+    if cached:
+        response, status_code = {"job_id": job_id, "status": "succeeded", "cached": True}, 200
+    else:
+        # Delayed jobs don't load the queue until they fall due
+        retry_after = None if delayed else ADMISSION.check(data.get("priority", "normal"))
+        if retry_after is not None:
+            return overloaded(retry_after)
+        denied = workflow_admission({data["workflow"]: 1})
+        if denied:
+            return denied
+        response, status_code = {"job_id": job_id, "status": "scheduled" if delayed else "queued"}, 202
+    
+    if idem_key is None:
+        JOB_STORE.create(job_id, data, owner=owner, results=cached, payload=body.value_json("payload"))
+        return jsonify(response), status_code
+    
     try:
-        validate(instance=data, schema=INTAKE_SCHEMA, format_checker=FormatChecker())
-    except ValidationError as e:
-        return bad_request("Invalid request body", e.message)
+        JOB_STORE.create(job_id, data, owner=owner, results=cached, payload=body.value_json("payload"),
+                         idempotency=(idem_key, response, status_code, IDEMPOTENCY.ttl))
+    except DuplicateIdempotencyKey:
+        # A concurrent request with the same key won the insert
+        return idempotent_replay(owner, idem_key) or (jsonify({"error": "conflict"}), 409)
+    IDEMPOTENCY.remember(owner, idem_key, response, status_code)
+    return jsonify(response), status_code
+
+def create_dag(owner, data, steps_size=None):
+    """Queue the root steps of a DAG; the rest start as their parents succeed"""
+    error = check_dag(data, steps_size)
+    if error:
+        return bad_request(*error)
+    
+    steps = data["steps"]
+    roots = Counter(step.get("priority", "normal") for step in steps if not step.get("depends_on"))
+    for priority in roots:
+        retry_after = ADMISSION.check(priority, roots[priority])
+        if retry_after is not None:
+            return overloaded(retry_after)
+    denied = workflow_admission(Counter(step["workflow"] for step in steps))
+    if denied:
+        return denied
+    
+    dag_id = uuid4().hex
+    job_ids = {step["id"]: uuid4().hex for step in steps}
+    JOB_STORE.create_dag(dag_id, [
+        (job_ids[step["id"]], step["id"],
+         {k: v for k, v in step.items() if k not in ("id", "depends_on")},
+         [job_ids[parent] for parent in step.get("depends_on", [])])
+        for step in steps
+    ], owner=owner)
+    return jsonify({"dag_id": dag_id, "jobs": job_ids, "status": "queued"}), 202
+
+def create_schedule(owner, data):
+    try:
+        schedule = SCHEDULES.create(owner, data)
+    except ValueError as e:
+        return bad_request("Invalid cron expression", str(e))
+    except ScheduleLimitExceeded:
+        return jsonify({"error": "schedule_limit_exceeded"}), 409
+    return jsonify(schedule), 201
+
+def memoized_results(items, owner):
+    """{job_id: cached result} for memoize-enabled items with a live cache entry"""
+    results = {}
+    for job_id, data in items:
+        if data.get("memoize"):
+            hit, result = JOB_STORE.results.lookup(memo_key(owner, data["workflow"], data["payload"]))
+            if hit:
+                results[job_id] = result
+    return results
+
+def overloaded(retry_after):
+    resp = jsonify({"error": "overloaded", "retry_after": retry_after})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(retry_after)
+    return resp
+
+def workflow_limited(body, retry_after):
+    resp = jsonify(body)
+    resp.status_code = 429
+    resp.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return resp
+
+def workflow_admission(counts):
+    """
+    429 response if any workflow in `counts` is over its submission rate,
+    400 if a workflow has more jobs than its burst could ever admit
+    """
+    try:
+        denied = JOB_STORE.limits.admit(counts)
+    except WorkflowBurstExceeded as e:
+        return bad_request(f"too many {e.workflow} jobs in one request (burst {e.burst})",
+                           {"workflow": e.workflow, "burst": e.burst})
+    if denied is None:
+        return None
+    workflow, retry_after = denied
+    return workflow_limited({"error": "workflow_rate_limited", "workflow": workflow}, retry_after)
+
+def workflow_rejections(counts):
+    """{workflow: per-item error} for each workflow in `counts` its limits don't admit"""
+    rejected = {}
+    for workflow, n in counts.items():
+        try:
+            denied = JOB_STORE.limits.admit({workflow: n})
+        except WorkflowBurstExceeded as e:
+            rejected[workflow] = {"error": "workflow_batch_too_large", "workflow": workflow, "burst": e.burst}
+            continue
+        if denied is not None:
+            rejected[workflow] = {"error": "workflow_rate_limited", "workflow": workflow,
+                                  "retry_after": round(denied[1], 3)}
+    return rejected
+
+def idempotent_replay(owner, idem_key):
+    """The original response to this Idempotency-Key, with its status code"""
+    entry = IDEMPOTENCY.lookup(owner, idem_key)
+    if entry is None:
+        return None
+    response, status_code = entry
+    resp = jsonify(response)
+    resp.status_code = status_code
+    resp.headers["Idempotent-Replayed"] = "true"
+    return resp
+
+@app.post("/api/v1/intake/batch")
+def intake_batch():
+    """Submit many jobs in one request; each item gets a job_id or an error"""
+    guard = require_key()
+    if guard:
+        return guard
     
-    if len(json.dumps(data["payload"])) > 200 * 1024:
-        return bad_request("payload too large")
+    if not request.is_json:
+        return bad_request("Content-Type must be application/json")
+    items = request.get_json(silent=True)
+    if not isinstance(items, list) or not items:
+        return bad_request("Body must be a non-empty JSON array of intake objects")
+    # Each item costs one request of the caller's budget, so a batch bigger than the
+    # whole bucket could never be admitted: refuse it outright rather than 429
+    max_items = min(INTAKE_BATCH_MAX, max_throttle_cost())
+    if len(items) > max_items:
+        return bad_request(f"batch too large (max {max_items} items)", {"max_items": max_items})
+    
+    rate_check = throttle(cost=len(items))
+    if rate_check:
+        return rate_check
     
-    if "callback_url" in data:
-        url = data["callback_url"]
-        if not url.startswith(("http://", "https://")):
-            return bad_request("callback_url must be a valid HTTP(S) URL")
-
-    job_id = uuid4().hex
-    JOBS[job_id] = {
-        "status": "queued",
-        "created_at": time(),
-        "input": data,
-        "result": None,
-        "error": None,
-    }
+    owner = key_owner()
+    now = time()
+    checked = []
+    for item in items:
+        error = check_intake_item(item)
+        if error is None and "cron" in item:
+            error = ("cron schedules must be created through /api/v1/intake", None)
+        checked.append((item, error))
+    valid = [(uuid4().hex, item) for item, error in checked if not error]
+    cached = memoized_results(valid, owner)
+    # Admission is decided once per priority class of the jobs that need a worker now
+    priorities = Counter(item.get("priority", "normal") for job_id, item in valid
+                         if job_id not in cached and item.get("run_at", 0) <= now)
+    shed = {p: ADMISSION.check(p, n) for p, n in priorities.items()}
+    retry_after = None
+    
+    results = []
+    accepted = []
+    valid_iter = iter(valid)
+    for item, error in checked:
+        if error:
+            message, details = error
+            results.append({"error": message, "details": details})
+            continue
+        job_id, _ = next(valid_iter)
+        if job_id in cached:
+            accepted.append((job_id, item))
+            results.append({"job_id": job_id, "status": "succeeded", "cached": True})
+            continue
+        delayed = item.get("run_at", 0) > now
+        wait = None if delayed else shed[item.get("priority", "normal")]
+        if wait is not None:
+            retry_after = max(retry_after or 0, wait)
+            results.append({"error": "overloaded", "retry_after": wait})
+        else:
+            accepted.append((job_id, item))
+            results.append({"job_id": job_id, "status": "scheduled" if delayed else "queued"})
+    
+    if not accepted and retry_after is not None:
+        return overloaded(retry_after)
+    # Each workflow is admitted on its own: one over its limit only rejects its own items
+    rejected = workflow_rejections(Counter(item["workflow"] for job_id, item in accepted if job_id not in cached))
+    if rejected:
+        denied = {job_id: rejected[item["workflow"]] for job_id, item in accepted
+                  if job_id not in cached and item["workflow"] in rejected}
+        accepted = [(job_id, item) for job_id, item in accepted if job_id not in denied]
+        results = [denied.get(r.get("job_id"), r) for r in results]
+    if accepted:
+        JOB_STORE.create_many(accepted, owner=owner, results=cached)
+    elif rejected:
+        waits = [r["retry_after"] for r in rejected.values() if "retry_after" in r]
+        if waits:
+            return workflow_limited({"error": "workflow_rate_limited", "accepted": 0,
+                                     "rejected": len(items), "results": results}, max(waits))
+    
+    return jsonify({
+        "accepted": len(accepted),
+        "rejected": len(items) - len(accepted),
+        "results": results
+    }), 202
+
+@app.get("/api/v1/dags/<dag_id>")
+def dag_status(dag_id):
+    """Per-step status of a DAG submitted with this API key"""
+    guard = require_key()
+    if guard:
+        return guard
+    steps = JOB_STORE.dag_status(dag_id, owner=key_owner())
+    if not steps:
+        return jsonify({"error": "not_found", "dag_id": dag_id}), 404
+    statuses = {step["status"] for step in steps}
+    if statuses <= {"succeeded"}:
+        overall = "succeeded"
+    elif statuses & {"failed", "cancelled"} and not statuses & {"waiting", "queued", "running"}:
+        overall = "failed"
+    else:
+        overall = "running"
+    return jsonify({
+        "dag_id": dag_id,
+        "status": overall,
+        "steps": [
+            {"step_id": st["step_id"], "job_id": st["job_id"], "status": st["status"],
+             "result": st["result"], "error": st["error"]}
+            for st in steps
+        ]
+    }), 200
 
-    return jsonify({"job_id": job_id, "status": "queued"}), 202
+@app.get("/api/v1/schedules")
+def list_schedules():
+    """Recurring (cron) schedules created with this API key"""
+    guard = require_key()
+    if guard:
+        return guard
+    limit = max(1, min(request.args.get("limit", type=int, default=100), 1000))
+    schedules = SCHEDULES.list(key_owner(), limit)
+    return jsonify({"schedules": schedules, "count": len(schedules)}), 200
 
-@app.get("/api/v1/status/<job_id>")
-def status(job_id):
-    job = JOBS.get(job_id)
-    if not job:
-        return jsonify({"error": "not_found", "job_id": job_id}), 404
+@app.delete("/api/v1/schedules/<schedule_id>")
+def delete_schedule(schedule_id):
+    guard = require_key()
+    if guard:
+        return guard
+    if not SCHEDULES.delete(key_owner(), schedule_id):
+        return jsonify({"error": "not_found", "schedule_id": schedule_id}), 404
+    return jsonify({"ok": True, "schedule_id": schedule_id}), 200
 
+def job_public_view(job):
     public_view = {
         "status": job["status"],
         "created_at": job["created_at"],
@@ -417,8 +859,113 @@ def status(job_id):
         validate(instance=public_view, schema=STATUS_SCHEMA)
     except ValidationError:
         pass
+    return public_view
+
+@app.get("/api/v1/status/<job_id>")
+def status(job_id):
+    job = JOB_STORE.get(job_id)
+    if not job:
+        return jsonify({"error": "not_found", "job_id": job_id}), 404
+
+    return jsonify({"job_id": job_id, **job_public_view(job)}), 200
 
-    return jsonify({"job_id": job_id, **public_view}), 200
+@app.post("/api/v1/status/bulk")
+def status_bulk():
+    """
+    Status for many jobs in one request.
+
+    Body: {"job_ids": [...], "cursor": <optional seq>}
+    With a cursor, only jobs changed after it are returned. The response
+    cursor can be passed back on the next poll.
+    """
+    guard = require_key()
+    if guard:
+        return guard
+    
+    body = request.get_json(silent=True) or {}
+    job_ids = body.get("job_ids")
+    if not isinstance(job_ids, list) or not all(isinstance(j, str) for j in job_ids):
+        return bad_request("job_ids must be an array of strings")
+    if len(job_ids) > STATUS_BULK_MAX:
+        return bad_request(f"too many job_ids (max {STATUS_BULK_MAX})")
+    since = body.get("cursor")
+    if since is not None and not isinstance(since, int):
+        return bad_request("cursor must be an integer")
+    
+    cursor = JOB_STORE.current_seq()
+    jobs = JOB_STORE.status_many(list(dict.fromkeys(job_ids)), since)
+    response = {"jobs": jobs, "cursor": cursor}
+    if since is None:
+        found = {j["job_id"] for j in jobs}
+        response["missing"] = [j for j in job_ids if j not in found]
+    return jsonify(response), 200
+
+@app.get("/api/v1/status/changes")
+def status_changes():
+    """Jobs submitted with the caller's API key that changed after ?cursor="""
+    guard = require_key()
+    if guard:
+        return guard
+    
+    cursor = request.args.get("cursor", type=int, default=0)
+    limit = max(1, min(request.args.get("limit", type=int, default=1000), STATUS_BULK_MAX))
+    jobs = JOB_STORE.changes_since(key_owner(), cursor, limit + 1)
+    has_more = len(jobs) > limit
+    jobs = jobs[:limit]
+    next_cursor = jobs[-1]["seq"] if jobs else max(cursor, 0)
+    return jsonify({"jobs": jobs, "cursor": next_cursor, "has_more": has_more}), 200
+
+@app.get("/api/v1/status/stream")
+def status_stream():
+    """
+    Server-sent events for job status transitions.
+
+    ?job_ids=a,b,c watches specific jobs (the stream ends once all are
+    terminal); without it every job of the caller's API key is streamed.
+    Reconnecting clients resume from the Last-Event-ID header; a client that
+    falls SSE_SUBSCRIBER_BUFFER transitions behind gets an "overflow" event
+    carrying its resume cursor, then the stream ends. Each process serves at
+    most SSE_MAX_STREAMS streams; beyond that the answer is 503.
+    """
+    guard = require_key()
+    if guard:
+        return guard
+    
+    owner = key_owner()
+    job_ids = [j for j in request.args.get("job_ids", "").split(",") if j]
+    if len(job_ids) > STATUS_BULK_MAX:
+        return bad_request(f"too many job_ids (max {STATUS_BULK_MAX})")
+    last_event_id = request.headers.get("Last-Event-ID", type=int)
+    
+    broker = get_status_broker()
+    job_ids = list(dict.fromkeys(job_ids))
+    try:
+        # Subscribe before reading current state, so a transition in between is
+        # delivered by the broker instead of falling between the two
+        sub = broker.subscribe(owner, job_ids or None, last_event_id)
+    except TooManyStreams as e:
+        resp = jsonify({"error": "too_many_streams", "max_streams": e.args[0]})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = str(SSE_RETRY_AFTER)
+        return resp
+    if job_ids:
+        snapshot = JOB_STORE.status_many(job_ids)
+        if not snapshot:
+            broker.unsubscribe(sub)
+            return jsonify({"error": "not_found"}), 404
+        sub.settle(snapshot)
+        backlog = [j for j in snapshot if last_event_id is None or j["seq"] > last_event_id]
+    else:
+        backlog = broker.changes_since(owner, last_event_id) if last_event_id is not None else []
+    
+    resp = Response(
+        stream_with_context(broker.stream(sub, backlog)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # The stream's own cleanup never runs if the client leaves before the first frame
+    resp.call_on_close(lambda: broker.unsubscribe(sub))
+    return resp
 
 @app.post("/api/v1/_dev/complete/<job_id>")
 def dev_complete(job_id):
@@ -429,14 +976,123 @@ def dev_complete(job_id):
     if rate_check:
         return rate_check
     
-    job = JOBS.get(job_id)
-    if not job:
-        return jsonify({"error": "not_found"}), 404
     body = request.get_json(silent=True) or {}
-    job["status"] = "succeeded"
-    job["result"] = body.get("result", {"ok": True})
+    if not JOB_STORE.complete(job_id, body.get("result", {"ok": True})):
+        return jsonify({"error": "not_found"}), 404
     return jsonify({"ok": True})
 
+@app.post("/api/v1/jobs/<job_id>/cancel")
+def cancel_job(job_id):
+    """
+    Cancel a scheduled, queued or running job submitted with this API key.
+    Running jobs are signalled cooperatively: in-process handlers see
+    job["cancelled"] set, external workers get 409 "cancelled" on their next
+    heartbeat. Either way the job stops counting against capacity at once.
+    """
+    guard = require_key()
+    if guard:
+        return guard
+    rate_check = throttle()
+    if rate_check:
+        return rate_check
+    
+    body = request.get_json(silent=True) or {}
+    reason = body.get("reason")
+    if reason is not None and (not isinstance(reason, str) or len(reason) > 500):
+        return bad_request("reason must be a string of at most 500 characters")
+    
+    previous = JOB_STORE.cancel(job_id, owner=key_owner(), reason=reason)
+    if previous is None:
+        return jsonify({"error": "not_found", "job_id": job_id}), 404
+    if previous not in CANCELLABLE_STATUSES:
+        return jsonify({"error": "not_cancellable", "job_id": job_id, "status": previous}), 409
+    if previous == "running":
+        get_worker_pool().cancel(job_id)
+    return jsonify({"job_id": job_id, "status": "cancelled", "previous_status": previous}), 200
+
+def _worker_body():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        body = {}
+    worker_id = body.get("worker_id")
+    if not worker_id or not isinstance(worker_id, str):
+        return None, bad_request("worker_id required")
+    error = best_match(WORKER_BODY_VALIDATOR.iter_errors(body))
+    if error is not None:
+        return None, bad_request("Invalid request body", error.message)
+    return body, None
+
+@app.post("/api/v1/worker/claim")
+def worker_claim():
+    """Lease queued jobs to an external worker"""
+    guard = require_worker()
+    if guard:
+        return guard
+    
+    body, err = _worker_body()
+    if err:
+        return err
+    worker_count = configured_worker_count()
+    limit = max(1, min(int(body.get("limit", 1)), 100))
+    visibility_timeout = max(5.0, min(float(body.get("visibility_timeout", VISIBILITY_TIMEOUT)), 3600.0))
+    workflows = body.get("workflows")
+    
+    jobs = JOB_STORE.claim(body["worker_id"], limit, visibility_timeout, workflows)
+    return jsonify({
+        "jobs": [
+            {"job_id": j["id"], "workflow": j["workflow"], "input": j["input"],
+             "attempts": j["attempts"], "lease_expires_at": j["lease_expires_at"]}
+            for j in jobs
+        ],
+        "worker_count": worker_count
+    }), 200
+
+@app.post("/api/v1/worker/heartbeat/<job_id>")
+def worker_heartbeat(job_id):
+    guard = require_worker()
+    if guard:
+        return guard
+    
+    body, err = _worker_body()
+    if err:
+        return err
+    visibility_timeout = max(5.0, min(float(body.get("visibility_timeout", VISIBILITY_TIMEOUT)), 3600.0))
+    if not JOB_STORE.heartbeat(job_id, body["worker_id"], visibility_timeout):
+        current = JOB_STORE.status_many([job_id])
+        if current and current[0]["status"] == "cancelled":
+            # Cooperative cancel signal: the worker should stop and drop the job
+            return jsonify({"error": "cancelled", "job_id": job_id}), 409
+        return jsonify({"error": "lease_lost", "job_id": job_id}), 409
+    return jsonify({"ok": True}), 200
+
+@app.post("/api/v1/worker/complete/<job_id>")
+def worker_complete(job_id):
+    guard = require_worker()
+    if guard:
+        return guard
+    
+    body, err = _worker_body()
+    if err:
+        return err
+    if not JOB_STORE.complete(job_id, body.get("result"), worker_id=body["worker_id"]):
+        return jsonify({"error": "lease_lost", "job_id": job_id}), 409
+    return jsonify({"ok": True}), 200
+
+@app.post("/api/v1/worker/fail/<job_id>")
+def worker_fail(job_id):
+    guard = require_worker()
+    if guard:
+        return guard
+    
+    body, err = _worker_body()
+    if err:
+        return err
+    outcome = JOB_STORE.fail(job_id, body.get("error", "worker_failed"), worker_id=body["worker_id"],
+                             error_class=body.get("error_class"), retry=body.get("retry", True) is not False)
+    if outcome is None:
+        return jsonify({"error": "lease_lost", "job_id": job_id}), 409
+    return jsonify({"ok": True, "status": outcome}), 200
+
 @app.post("/api/v1/users/upsert")
 def users_upsert():
     guard = require_key()
@@ -463,19 +1119,19 @@ def users_upsert():
 
     existing = fetch_user_by_email(email)
     if existing:
-        get_db().execute(
-            "UPDATE users SET name=?, locale=?, currency=?, meta=?, updated_at=? WHERE email=?",
-            (name, locale, currency, meta, now, email)
-        )
-        get_db().commit()
+        with get_db() as db:
+            db.execute(
+                "UPDATE users SET name=?, locale=?, currency=?, meta=?, updated_at=? WHERE email=?",
+                (name, locale, currency, meta, now, email)
+            )
         return jsonify({"updated": True, "user": fetch_user_by_email(email)}), 200
     else:
         uid = uuid4().hex
-        get_db().execute(
-            "INSERT INTO users(id,email,name,locale,currency,meta,created_at,updated_at) VALUES (?,?,?,?,?,?,?,?)",
-            (uid, email, name, locale, currency, meta, now, now)
-        )
-        get_db().commit()
+        with get_db() as db:
+            db.execute(
+                "INSERT INTO users(id,email,name,locale,currency,meta,created_at,updated_at) VALUES (?,?,?,?,?,?,?,?)",
+                (uid, email, name, locale, currency, meta, now, now)
+            )
         return jsonify({"created": True, "user": fetch_user_by_id(uid)}), 201
 
 @app.patch("/api/v1/users/<user_id>")
@@ -504,11 +1160,11 @@ def users_patch(user_id):
     currency = body.get("currency", u["currency"])
     meta = u["meta"].copy()
     meta.update(body.get("meta", {}))
-    get_db().execute(
-        "UPDATE users SET name=?, locale=?, currency=?, meta=?, updated_at=? WHERE id=?",
-        (name, locale, currency, json.dumps(meta), time(), user_id)
-    )
-    get_db().commit()
+    with get_db() as db:
+        db.execute(
+            "UPDATE users SET name=?, locale=?, currency=?, meta=?, updated_at=? WHERE id=?",
+            (name, locale, currency, json.dumps(meta), time(), user_id)
+        )
     return jsonify({"updated": True, "user": fetch_user_by_id(user_id)}), 200
 
 @app.get("/api/v1/users/<user_id>")
@@ -543,11 +1199,11 @@ def track_referral():
     referral_id = uuid4().hex
     now = time()
     
-    get_db().execute(
-        "INSERT INTO referrals(id, user_id, email, source, campaign, medium, created_at) VALUES (?,?,?,?,?,?,?)",
-        (referral_id, user_id, email, source, campaign, medium, now)
-    )
-    get_db().commit()
+    with get_db() as db:
+        db.execute(
+            "INSERT INTO referrals(id, user_id, email, source, campaign, medium, created_at) VALUES (?,?,?,?,?,?,?)",
+            (referral_id, user_id, email, source, campaign, medium, now)
+        )
     
     return jsonify({"ok": True, "referral_id": referral_id}), 201
 
@@ -639,21 +1295,30 @@ def ops_uptime():
 @app.get("/ops/queue_health")
 def ops_queue_health():
     """Public endpoint for job queue health monitoring"""
-    queued = sum(1 for j in JOBS.values() if j["status"] == "queued")
-    running = sum(1 for j in JOBS.values() if j["status"] == "running")
-    completed = sum(1 for j in JOBS.values() if j["status"] == "succeeded")
-    failed = sum(1 for j in JOBS.values() if j["status"] == "failed")
-    total = len(JOBS)
+    stats = JOB_STORE.queue_stats()
+    counts = stats["counts"]
     
     return jsonify({
         "healthy": True,
         "queue_stats": {
-            "queued": queued,
-            "running": running,
-            "completed": completed,
-            "failed": failed,
-            "total": total
+            "scheduled": counts["scheduled"],
+            "next_scheduled_at": JOB_STORE.next_scheduled_at(),
+            "waiting": counts["waiting"],
+            "queued": counts["queued"],
+            "running": counts["running"],
+            "completed": counts["succeeded"],
+            "failed": counts["failed"],
+            "cancelled": counts["cancelled"],
+            "total": sum(counts.values()),
+            "oldest_queued_age_seconds": stats["oldest_queued_age_seconds"],
+            "enqueued_per_min": stats["enqueued_per_min"],
+            "dequeued_per_min": stats["dequeued_per_min"]
         },
+        "queue_wait_ms": JOB_STORE.scheduler.wait_stats(),
+        "workflow_limits": JOB_STORE.limit_state(),
+        "admission": ADMISSION.state(),
+        "recurring_schedules": SCHEDULES.stats(),
+        "result_cache": JOB_STORE.results.stats(),
         "timestamp": int(time())
     }), 200
 
@@ -788,8 +1453,16 @@ OPENAPI = {
     "openapi": "3.0.0",
     "info": {"title": "Levqor API", "version": VERSION},
     "paths": {
-        "/api/v1/intake": {"post": {"summary": "Submit job", "responses": {"202": {"description": "Queued"}}}},
+        "/api/v1/intake": {"post": {"summary": "Submit job", "responses": {"200": {"description": "Completed from result cache (memoize)"}, "201": {"description": "Recurring schedule created (cron)"}, "202": {"description": "Queued or scheduled (run_at)"}, "413": {"description": "Body over INTAKE_MAX_BYTES"}, "429": {"description": "Workflow rate limited"}, "503": {"description": "Queue overloaded, see Retry-After"}}}},
+        "/api/v1/intake/batch": {"post": {"summary": "Submit many jobs", "responses": {"202": {"description": "Per-item job_id or error"}, "429": {"description": "Every item rate limited by its workflow, see Retry-After"}}}},
         "/api/v1/status/{job_id}": {"get": {"summary": "Get status", "responses": {"200": {"description": "OK"}}}},
+        "/api/v1/status/bulk": {"post": {"summary": "Get status for many jobs", "responses": {"200": {"description": "OK"}}}},
+        "/api/v1/status/changes": {"get": {"summary": "Jobs changed since cursor", "responses": {"200": {"description": "OK"}}}},
+        "/api/v1/status/stream": {"get": {"summary": "Stream status transitions (SSE)", "responses": {"200": {"description": "text/event-stream"}, "503": {"description": "Too many open streams, see Retry-After"}}}},
+        "/api/v1/jobs/{job_id}/cancel": {"post": {"summary": "Cancel a scheduled, queued or running job", "responses": {"200": {"description": "Cancelled"}, "409": {"description": "Already finished"}}}},
+        "/api/v1/dags/{dag_id}": {"get": {"summary": "Per-step status of a DAG submission", "responses": {"200": {"description": "OK"}}}},
+        "/api/v1/schedules": {"get": {"summary": "List recurring schedules", "responses": {"200": {"description": "OK"}}}},
+        "/api/v1/schedules/{schedule_id}": {"delete": {"summary": "Delete a recurring schedule", "responses": {"200": {"description": "OK"}}}},
         "/api/v1/users/upsert": {"post": {"summary": "Create or update user", "responses": {"201": {"description": "Created"}}}},
         "/api/v1/users/{user_id}": {"get": {"summary": "Get user by ID", "responses": {"200": {"description": "OK"}}}},
         "/api/v1/users": {"get": {"summary": "Lookup user by email", "responses": {"200": {"description": "OK"}}}}
@@ -808,6 +1481,10 @@ from api.billing.discounts import bp as discounts_bp
 from api.admin.insights import bp as admin_insights_bp
 from api.admin.runbooks import bp as admin_runbooks_bp
 from api.admin.postmortem import bp as admin_postmortem_bp
+from api.admin.callbacks import bp as admin_callbacks_bp
+from api.admin.dlq import bp as admin_dlq_bp
+from api.admin.workflow_limits import bp as admin_workflow_limits_bp
+from api.admin.key_plans import bp as admin_key_plans_bp
 from ops.admin.insights import bp as ops_insights_bp
 from ops.admin.runbooks import bp as ops_runbooks_bp
 from ops.admin.postmortem import bp as ops_postmortem_bp
@@ -821,6 +1498,10 @@ app.register_blueprint(discounts_bp)
 app.register_blueprint(admin_insights_bp)
 app.register_blueprint(admin_runbooks_bp)
 app.register_blueprint(admin_postmortem_bp)
+app.register_blueprint(admin_callbacks_bp)
+app.register_blueprint(admin_dlq_bp)
+app.register_blueprint(admin_workflow_limits_bp)
+app.register_blueprint(admin_key_plans_bp)
 app.register_blueprint(ops_insights_bp)
 app.register_blueprint(ops_runbooks_bp)
 app.register_blueprint(ops_postmortem_bp)
@@ -832,8 +1513,15 @@ def auto_tune_endpoint():
     suggestions = suggest_tuning(current_p95, current_queue)
     return jsonify({"status": "ok", "suggestions": suggestions}), 200
 
-from monitors.scheduler import init_scheduler
-init_scheduler()
+from monitors.scheduler import init_scheduler, schedule_rate_limiter_eviction
+# hit() only trims a few idle keys per call; the scheduled sweep clears the rest
+schedule_rate_limiter_eviction(init_scheduler(), RATE_LIMITER)
+
+if os.environ.get("WORKER_POOL_ENABLED", "false").lower() == "true":
+    get_worker_pool().start()
+
+if os.environ.get("CALLBACKS_ENABLED", "true").lower() == "true":
+    get_callback_dispatcher().start()
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000)
@@ -2,6 +2,7 @@
 Aggregate growth retention metrics by source and cohort.
 Builds referral_retention table from growth_events.
 """
+import os
 import sqlite3
 import time
 import datetime as dt
@@ -11,6 +12,8 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("levqor.growth_retention")
 
+DB_PATH = os.getenv("SQLITE_PATH", "levqor.db")
+
 def aggregate_growth_retention():
     """
     Aggregate daily retention metrics by source from growth_events.
@@ -24,7 +27,7 @@ def aggregate_growth_retention():
     Analyzes last 30 days.
     """
     try:
-        conn = sqlite3.connect("levqor.db")
+        conn = sqlite3.connect(DB_PATH)
         c = conn.cursor()
         
         today = dt.date.today()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Claim latency vs queue depth - the claim path must not grow with the backlog
+
+Fills throwaway job stores to each depth, then times limit-N claims and DAG
+step releases. Exits non-zero when the deepest queue costs more than
+--max-ratio times the shallowest, so it can gate a change to the claim SQL.
+
+    python3 scripts/bench_claim_depth.py --depths 5000,20000,80000
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+from time import perf_counter, time
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.job_store import JobStore
+
+
+def fill(store: JobStore, depth: int, batch: int = 1000):
+    now = time()
+    for start in range(0, depth, batch):
+        items = [(uuid4().hex, {"workflow": f"wf{i % 20}", "payload": {"i": i}})
+                 for i in range(start, min(start + batch, depth))]
+        store.create_many(items, now, owner="bench")
+
+
+def claim_us(store: JobStore, limit: int, rounds: int) -> float:
+    claimed = 0
+    start = perf_counter()
+    for _ in range(rounds):
+        claimed += len(store.claim("bench-worker", limit=limit, visibility_timeout=300))
+    return (perf_counter() - start) / max(claimed, 1) * 1e6
+
+
+def add_dag(store: JobStore, parent_workflow: str, child_workflow: str):
+    parent, child = uuid4().hex, uuid4().hex
+    store.create_dag(uuid4().hex, [
+        (parent, "a", {"workflow": parent_workflow, "payload": {}}, []),
+        (child, "b", {"workflow": child_workflow, "payload": {}}, [parent]),
+    ], owner="bench")
+
+
+def release_us(store: JobStore, dags: int) -> float:
+    """Time completing a parent step whose child then becomes queued"""
+    for _ in range(dags):
+        add_dag(store, "dag-a", "dag-b")
+    parents = store.claim("bench-worker", limit=dags, visibility_timeout=300, workflows=["dag-a"])
+    start = perf_counter()
+    for job in parents:
+        store.complete(job["id"], {"ok": True}, worker_id="bench-worker")
+    return (perf_counter() - start) / max(len(parents), 1) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check claim cost stays flat as queue depth grows")
+    parser.add_argument("--depths", default="5000,20000,80000")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--dags", type=int, default=50)
+    parser.add_argument("--max-ratio", type=float, default=2.0,
+                        help="fail if the deepest queue costs more than this times the shallowest")
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for depth in (int(d) for d in args.depths.split(",")):
+            store = JobStore(os.path.join(tmp, f"depth{depth}.db"))
+            fill(store, depth)
+            # Waiting DAG steps are what the release trigger used to scan
+            for _ in range(depth // 10):
+                add_dag(store, "idle-a", "idle-b")
+            rows.append({"depth": depth,
+                         "claim_us_per_job": round(claim_us(store, args.limit, args.rounds), 1),
+                         "dag_release_us": round(release_us(store, args.dags), 1)})
+
+    first, last = rows[0], rows[-1]
+    ratios = {k: round(last[k] / first[k], 2) for k in ("claim_us_per_job", "dag_release_us")}
+    ok = all(r <= args.max_ratio for r in ratios.values())
+    print(json.dumps({"runs": rows, "deepest_vs_shallowest": ratios, "max_ratio": args.max_ratio, "ok": ok}, indent=2))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Job record benchmark - bytes per job in the hot jobs table and hot-path latency
+
+Fills a throwaway job store with N jobs carrying P-byte payloads, then reports
+per-object storage (from SQLite's dbstat) and status/claim latency with a small
+page cache, i.e. how much of each job has to be resident for the queue to stay fast.
+
+    python3 scripts/bench_job_records.py --jobs 200000 --payload-bytes 2048
+    python3 scripts/bench_job_records.py --jobs 50000 --payload-bytes 65536 --producers 20
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+from time import perf_counter, time
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.job_store import JobStore
+
+
+def make_payload(producer: int, payload_bytes: int):
+    """Order-like JSON of roughly payload_bytes"""
+    rows, size = [], 0
+    while size < payload_bytes:
+        row = {"sku": f"SKU-{random.randrange(10 ** 6):06d}", "qty": random.randrange(1, 50),
+               "price": round(random.uniform(1, 500), 2), "ref": uuid4().hex[:12]}
+        rows.append(row)
+        size += len(json.dumps(row))
+    return {"producer": f"p{producer}", "rows": rows}
+
+
+def fill(store: JobStore, jobs: int, payload_bytes: int, producers: int = 0, batch: int = 1000):
+    """Insert jobs; with `producers`, payloads repeat across that many distinct bodies"""
+    ids = []
+    now = time()
+    shared = [make_payload(p, payload_bytes) for p in range(producers)]
+    for start in range(0, jobs, batch):
+        items = []
+        for i in range(start, min(start + batch, jobs)):
+            job_id = uuid4().hex
+            payload = shared[i % producers] if producers else make_payload(i % 50, payload_bytes)
+            items.append((job_id, {"workflow": f"wf{i % 20}", "payload": payload,
+                                   "priority": random.choice(("low", "normal", "high"))}))
+            ids.append(job_id)
+        store.create_many(items, now + start / 1000.0, owner="bench")
+    return ids
+
+
+def storage(store: JobStore, jobs: int):
+    rows = store.conn().execute(
+        "SELECT name, SUM(pgsize), SUM(payload) FROM dbstat GROUP BY name ORDER BY SUM(pgsize) DESC"
+    ).fetchall()
+    # Fixed-size tables (one page each) don't scale with the job count
+    objects = {name: {"bytes": size, "payload_bytes": payload, "bytes_per_job": round(size / jobs, 1)}
+               for name, size, payload in rows if size / jobs >= 1}
+    total = sum(size for _, size, _ in rows)
+    return objects, total
+
+
+def timed(fn, repeat: int):
+    start = perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure job record size and hot-path latency")
+    parser.add_argument("--jobs", type=int, default=100000)
+    parser.add_argument("--payload-bytes", type=int, default=2048)
+    parser.add_argument("--producers", type=int, default=0,
+                        help="distinct payloads shared across all jobs (0: every payload unique)")
+    parser.add_argument("--cache-kib", type=int, default=4096, help="SQLite page cache for the timing runs")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = JobStore(os.path.join(tmp, "bench.db"))
+        started = perf_counter()
+        ids = fill(store, args.jobs, args.payload_bytes, args.producers)
+        fill_s = perf_counter() - started
+
+        objects, total = storage(store, args.jobs)
+        conn = store.conn()
+        conn.execute(f"PRAGMA cache_size=-{args.cache_kib}")
+
+        sample = random.sample(ids, min(len(ids), 20000))
+        status_us = timed(lambda: store.status_many(random.sample(sample, 100)), 200) / 100
+        get_us = timed(lambda: store.get(random.choice(sample)), 2000)
+        claim_us = timed(lambda: store.claim("bench-worker", limit=10, visibility_timeout=300), 200) / 10
+
+        report = {
+            "jobs": args.jobs,
+            "payload_bytes": args.payload_bytes,
+            "producers": args.producers,
+            "fill_seconds": round(fill_s, 2),
+            "db_bytes_per_job": round(total / args.jobs, 1),
+            "jobs_table_bytes_per_job": objects.get("jobs", {}).get("bytes_per_job"),
+            "objects": objects,
+            "cache_kib": args.cache_kib,
+            "status_lookup_us": round(status_us, 1),
+            "get_us": round(get_us, 1),
+            "claim_us_per_job": round(claim_us, 1),
+        }
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
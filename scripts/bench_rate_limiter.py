@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Rate limiter benchmark - memory and cost per check under a randomized-IP flood
+
+Replays a flood of requests from random client IPs (plus a few heavy hitters)
+on a simulated clock against the GCRA limiter, its SQLite-shared variant and
+the per-IP deque limiter they replaced, sampling live keys and traced memory
+(Python objects only, not SQLite's page cache) as time advances.
+
+    python3 scripts/bench_rate_limiter.py --rps 5000 --seconds 300
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import tracemalloc
+from collections import defaultdict, deque
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.rate_limiter import GCRALimiter, SharedGCRALimiter
+
+WINDOW = 60
+
+
+class DequeLimiter:
+    """The previous throttle(): one deque of hit timestamps per IP, never evicted"""
+
+    def __init__(self, limit: int, window: float = WINDOW):
+        self.limit = limit
+        self.window = window
+        self._hits = defaultdict(deque)
+
+    def hit(self, key, cost=1, now=None):
+        dq = self._hits[key]
+        while dq and now - dq[0] > self.window:
+            dq.popleft()
+        if len(dq) + cost > self.limit:
+            return False
+        dq.extend([now] * cost)
+        return True
+
+    def __len__(self):
+        return len(self._hits)
+
+
+def flood(limiter, rps: int, seconds: int, heavy: int, sample_every: int, trace: bool):
+    rng = random.Random(42)
+    heavy_ips = [f"ip:10.0.0.{i}" for i in range(heavy)]
+    samples = []
+    allowed = 0
+    start = perf_counter()
+    for second in range(seconds):
+        for i in range(rps):
+            now = second + i / rps
+            if heavy and i % 10 == 0:
+                key = rng.choice(heavy_ips)
+            else:
+                key = f"ip:{rng.getrandbits(32)}"
+            decision = limiter.hit(key, 1, now)
+            if decision is True or getattr(decision, "allowed", False):
+                allowed += 1
+        if trace and (second + 1) % sample_every == 0:
+            samples.append({"t": second + 1, "keys": len(limiter),
+                            "traced_mb": round(tracemalloc.get_traced_memory()[0] / 2 ** 20, 1)})
+    elapsed = perf_counter() - start
+    return samples, allowed, elapsed
+
+
+def run(name: str, make, args):
+    tracemalloc.start()
+    samples, _, _ = flood(make(), args.rps, args.seconds, args.heavy, args.sample_every, trace=True)
+    tracemalloc.stop()
+    _, allowed, elapsed = flood(make(), args.rps, min(args.seconds, 60), args.heavy, args.sample_every, trace=False)
+    checks = args.rps * min(args.seconds, 60)
+    return {"limiter": name, "samples": samples, "ns_per_check": round(elapsed / checks * 1e9),
+            "allowed_first_60s": allowed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare rate limiter memory under an IP flood")
+    parser.add_argument("--rps", type=int, default=2000)
+    parser.add_argument("--seconds", type=int, default=300)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--heavy", type=int, default=5, help="heavy-hitter IPs taking 10%% of traffic")
+    parser.add_argument("--sample-every", type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A fresh database per run, so the timed run doesn't start from the traced run's budgets
+        db_paths = (os.path.join(tmp, f"limits{i}.db") for i in range(2))
+        report = [
+            run("deque", lambda: DequeLimiter(args.limit), args),
+            run("gcra", lambda: GCRALimiter(args.limit, WINDOW), args),
+            run("gcra-shared", lambda: SharedGCRALimiter(next(db_paths), args.limit, WINDOW), args),
+        ]
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
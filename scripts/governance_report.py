@@ -15,10 +15,11 @@ logger = logging.getLogger("levqor.governance")
 
 RESEND_API_KEY = os.getenv("RESEND_API_KEY")
 RECEIVING_EMAIL = os.getenv("RECEIVING_EMAIL", "ops@levqor.ai")
+DB_PATH = os.getenv("SQLITE_PATH", "levqor.db")
 
 def get_week_summary() -> dict:
     """Gather all metrics for the weekly report"""
-    conn = sqlite3.connect("levqor.db")
+    conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
     
     week_ago = datetime.now() - timedelta(days=7)
@@ -0,0 +1,124 @@
+"""
+Intake admission control - shed load before the queue turns into latency.
+
+Queue load is the larger of depth / queue_max_depth and oldest-job age /
+queue_max_age_seconds (age counted from when the job was last queued, not
+from its submission), with both ceilings taken from
+monitors.auto_tune.queue_limits() (the same source as auto-tune's
+queue_max_depth). Each priority is admitted up to its own load level, so
+as the queue fills low-priority submissions are refused first, then
+normal, and high-priority ones only at the hard ceiling:
+
+    low <= ADMISSION_SHED_LOW (0.7), normal <= ADMISSION_SHED_NORMAL (0.9),
+    high <= ADMISSION_SHED_HIGH (1.0)
+
+A request for `count` jobs is admitted only if the depth with all of them
+added stays within its priority's level, so one batch can't carry the queue
+past the ceiling. Jobs admitted since the last sample count towards the
+depth too. Refusals carry a Retry-After estimated from the current dequeue rate. Queue
+stats are sampled at most every ADMISSION_SAMPLE_INTERVAL seconds and the
+ceilings re-read every ADMISSION_LIMITS_REFRESH seconds, so the check costs
+nothing per request.
+"""
+import os
+import math
+import threading
+import logging
+from time import time
+from typing import Dict, Any, Optional
+
+from monitors.auto_tune import queue_limits
+from services.job_store import JobStore, get_job_store
+
+log = logging.getLogger("levqor.admission")
+
+SHED_AT = {
+    "low": float(os.environ.get("ADMISSION_SHED_LOW", 0.7)),
+    "normal": float(os.environ.get("ADMISSION_SHED_NORMAL", 0.9)),
+    "high": float(os.environ.get("ADMISSION_SHED_HIGH", 1.0)),
+}
+SAMPLE_INTERVAL = float(os.environ.get("ADMISSION_SAMPLE_INTERVAL", 1.0))
+LIMITS_REFRESH = float(os.environ.get("ADMISSION_LIMITS_REFRESH", 30))
+
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 300
+
+
+class AdmissionController:
+    def __init__(self, store: JobStore):
+        self.store = store
+        self._limits = None
+        self._limits_at = 0.0
+        self._sample = None
+        self._sample_at = 0.0
+        self._admitted = 0
+        self._rejected = {p: 0 for p in SHED_AT}
+        self._lock = threading.Lock()
+
+    def limits(self) -> Dict[str, float]:
+        now = time()
+        if self._limits is None or now - self._limits_at >= LIMITS_REFRESH:
+            self._limits = queue_limits()
+            self._limits_at = now
+        return self._limits
+
+    def _queue(self) -> Dict[str, Any]:
+        now = time()
+        if self._sample is None or now - self._sample_at >= SAMPLE_INTERVAL:
+            self._sample = self.store.queue_stats(now)
+            self._sample_at = now
+            self._admitted = 0
+        return self._sample
+
+    def _depth(self) -> int:
+        """Queued jobs at the last sample plus those admitted since"""
+        return self._queue()["counts"]["queued"] + self._admitted
+
+    def load(self, count: int = 0) -> float:
+        """Queue load as a fraction of the tightest ceiling (1.0 = full), with `count` more jobs queued"""
+        limits = self.limits()
+        depth = (self._depth() + count) / max(1, limits["queue_max_depth"])
+        age = self._queue()["oldest_queued_age_seconds"] / max(1.0, limits["queue_max_age_seconds"])
+        return max(depth, age)
+
+    def check(self, priority: str = "normal", count: int = 1) -> Optional[int]:
+        """None if `count` jobs at `priority` may be enqueued, else Retry-After seconds"""
+        with self._lock:
+            shed_at = SHED_AT.get(priority, SHED_AT["normal"])
+            if self.load(count) <= shed_at:
+                self._admitted += count
+                return None
+            self._rejected[priority] = self._rejected.get(priority, 0) + count
+            return self._retry_after(shed_at, count)
+
+    def _retry_after(self, shed_at: float, count: int) -> int:
+        """Time for the queue to drain far enough to take `count` more at this priority"""
+        stats, limits = self._sample, self._limits
+        age_wait = stats["oldest_queued_age_seconds"] - shed_at * limits["queue_max_age_seconds"]
+        excess = self._depth() + count - shed_at * limits["queue_max_depth"]
+        drain_per_sec = stats["dequeued_per_min"] / 60.0
+        depth_wait = excess / drain_per_sec if drain_per_sec > 0 else MAX_RETRY_AFTER / 10
+        wait = max(age_wait, depth_wait)
+        return int(min(MAX_RETRY_AFTER, max(MIN_RETRY_AFTER, math.ceil(wait))))
+
+    def state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "load": round(self.load(), 3),
+                "shed_at": SHED_AT,
+                "rejected": dict(self._rejected),
+                **self.limits(),
+            }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+def get_admission_controller() -> AdmissionController:
+    """Singleton admission controller"""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(get_job_store())
+    return _controller
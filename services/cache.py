@@ -0,0 +1,108 @@
+"""
+Bounded in-memory LRU cache with optional per-entry TTL, and a lock-striped
+variant for caches on the request path.
+"""
+import os
+import threading
+from collections import OrderedDict
+from time import time
+from typing import Any, Dict, Hashable, Optional
+
+CACHE_STRIPES = int(os.environ.get("CACHE_STRIPES", 16))
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 10000, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class StripedLRUCache:
+    """
+    LRUCache split into shards by key hash, each with its own lock, so
+    request threads looking up different keys don't queue on one lock.
+    Recency and capacity are per shard (maxsize / stripes entries each).
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: Optional[float] = None, stripes: int = CACHE_STRIPES):
+        stripes = max(1, min(stripes, maxsize))
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._shards = [LRUCache(max(1, maxsize // stripes), ttl) for _ in range(stripes)]
+
+    def _shard(self, key: Hashable) -> LRUCache:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self._shard(key).get(key, default)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self._shard(key).set(key, value, ttl)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        return self._shard(key).pop(key, default)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def stats(self) -> Dict[str, Any]:
+        hits = sum(shard.hits for shard in self._shards)
+        misses = sum(shard.misses for shard in self._shards)
+        total = hits + misses
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "stripes": len(self._shards),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
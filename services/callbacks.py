@@ -0,0 +1,381 @@
+"""
+Callback dispatcher - delivers completion webhooks for jobs with a callback_url.
+
+Deliveries are enqueued by a jobs-table trigger (see CALLBACK_SCHEMA in
+services/job_store.py) in the same transaction as the terminal status change,
+then leased and sent from background threads, never from a request thread:
+
+- one pooled keep-alive requests.Session shared by all senders
+- at most CALLBACK_PER_HOST concurrent requests per destination host; the
+  cap is per process, so with N gunicorn workers a host can see up to
+  N x CALLBACK_PER_HOST requests at once
+- exponential backoff with jitter between attempts
+- after CALLBACK_MAX_ATTEMPTS failures a delivery moves to status 'dead'
+- polls that find nothing due never take the database write lock
+
+Callback URLs are caller-supplied, so any address that isn't globally
+routable (loopback, RFC 1918, link-local such as 169.254.169.254, shared,
+reserved, multicast) is refused. Intake only checks the URL itself (scheme,
+port, literal IPs) and never does DNS on the request thread; each delivery
+resolves the host once, checks every address, and connects to the checked
+address (PinnedAdapter), so a name that re-resolves elsewhere between check
+and connect (DNS rebinding) can't redirect the request. Hosts or networks
+listed in CALLBACK_ALLOWED_HOSTS (comma-separated names or CIDRs) are exempt,
+for internal receivers.
+"""
+import os
+import json
+import random
+import socket
+import ipaddress
+import threading
+import logging
+from time import time, sleep
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.job_store import JobStore, get_job_store
+
+log = logging.getLogger("levqor.callbacks")
+
+CALLBACK_WORKERS = int(os.environ.get("CALLBACK_WORKERS", 8))
+CALLBACK_PER_HOST = int(os.environ.get("CALLBACK_PER_HOST", 2))
+CALLBACK_TIMEOUT = float(os.environ.get("CALLBACK_TIMEOUT", 10))
+CALLBACK_MAX_ATTEMPTS = int(os.environ.get("CALLBACK_MAX_ATTEMPTS", 8))
+CALLBACK_BACKOFF_BASE = float(os.environ.get("CALLBACK_BACKOFF_BASE", 2))
+CALLBACK_BACKOFF_CAP = float(os.environ.get("CALLBACK_BACKOFF_CAP", 3600))
+CALLBACK_POLL_INTERVAL = float(os.environ.get("CALLBACK_POLL_INTERVAL", 1.0))
+
+
+def parse_allowlist(value: str) -> Tuple[frozenset, tuple]:
+    """(host names, ip networks) from a comma-separated CALLBACK_ALLOWED_HOSTS value"""
+    names, networks = set(), []
+    for entry in (e.strip() for e in value.split(",")):
+        if not entry:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            names.add(entry.lower())
+    return frozenset(names), tuple(networks)
+
+
+CALLBACK_ALLOWED_HOSTS = parse_allowlist(os.environ.get("CALLBACK_ALLOWED_HOSTS", ""))
+
+# How long a claimed delivery stays leased before another process may retry it
+_LEASE_SECONDS = CALLBACK_TIMEOUT + 30
+# Saturated hosts are skipped for this long instead of burning an attempt
+_HOST_BUSY_DELAY = 0.2
+
+_DELIVERY_COLUMNS = "id, job_id, url, attempts"
+
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with equal jitter: half fixed, half random"""
+    ceiling = min(CALLBACK_BACKOFF_CAP, CALLBACK_BACKOFF_BASE * (2 ** max(0, attempts - 1)))
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+def _target(url: str) -> Tuple[str, int]:
+    """(lower-cased host, port) of a callback URL; ValueError if it is unusable"""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        raise ValueError("not an HTTP(S) URL")
+    try:
+        return host, parts.port or (443 if parts.scheme == "https" else 80)
+    except ValueError:
+        raise ValueError("invalid port") from None
+
+
+def _non_public(ip, networks) -> bool:
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    if any(ip in net for net in networks):
+        return False
+    return not ip.is_global or ip.is_multicast
+
+
+def blocked_url(url: str) -> Optional[str]:
+    """
+    Why `url` may not receive callbacks, judged from the URL alone (bad
+    scheme or port, literal non-public IP), or None. No DNS lookup; names
+    are checked by resolve_callback() at delivery.
+    """
+    try:
+        host, _ = _target(url)
+    except ValueError as e:
+        return str(e)
+    names, networks = CALLBACK_ALLOWED_HOSTS
+    if host in names:
+        return None
+    try:
+        ip = ipaddress.ip_address(host)
+    except ValueError:
+        return None
+    if _non_public(ip, networks):
+        return f"non-public address {ip}"
+    return None
+
+
+def resolve_callback(url: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Resolve `url`'s host once: (reason, None) if it may not receive
+    callbacks, else (None, address to connect to). Every address must be
+    public or allowlisted. Raises OSError if the host doesn't resolve.
+    """
+    try:
+        host, port = _target(url)
+    except ValueError as e:
+        return str(e), None
+    names, networks = CALLBACK_ALLOWED_HOSTS
+    try:
+        addresses = socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)
+    except UnicodeError:
+        return "invalid host name", None
+    ips = [ipaddress.ip_address(sockaddr[0].split("%")[0]) for *_, sockaddr in addresses]
+    if host not in names:
+        for ip in ips:
+            if _non_public(ip, networks):
+                return f"{host} resolves to non-public address {ip}", None
+    return None, str(ips[0])
+
+
+class PinnedAdapter(HTTPAdapter):
+    """
+    Connects to `request.pinned_address`, when set, instead of resolving
+    the URL's host again. TLS still sends SNI for, and verifies the
+    certificate against, the URL's host name.
+    """
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        address = getattr(request, "pinned_address", None)
+        if address:
+            if host_params["scheme"] == "https":
+                pool_kwargs["server_hostname"] = host_params["host"]
+                pool_kwargs["assert_hostname"] = host_params["host"]
+            host_params["host"] = address
+        return host_params, pool_kwargs
+
+
+def build_session(pool_size: int = CALLBACK_WORKERS) -> requests.Session:
+    session = requests.Session()
+    adapter = PinnedAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": "levqor-callbacks/1.0", "Content-Type": "application/json"})
+    return session
+
+
+class CallbackDispatcher:
+    def __init__(self, store: JobStore, session: requests.Session = None,
+                 workers: int = CALLBACK_WORKERS, per_host: int = CALLBACK_PER_HOST):
+        self.store = store
+        self.session = session or build_session(workers)
+        self.workers = workers
+        self.per_host = per_host
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="callback")
+        self._inflight = 0
+        self._host_inflight: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._feed, name="callback-feeder", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _feed(self):
+        while not self._stop.is_set():
+            try:
+                if not self.run_once(wait=False):
+                    sleep(CALLBACK_POLL_INTERVAL)
+            except Exception as e:
+                log.error(f"Callback feeder error: {e}")
+                sleep(CALLBACK_POLL_INTERVAL)
+
+    def run_once(self, wait: bool = True) -> int:
+        """
+        Claim due deliveries up to free capacity and send them.
+        With wait=True, block until they finish (handy for tests).
+        """
+        with self._lock:
+            free = self.workers - self._inflight
+        if free <= 0:
+            return 0
+        futures = []
+        for delivery in self._claim(free):
+            host = urlsplit(delivery["url"]).netloc.lower()
+            with self._lock:
+                if self._host_inflight[host] >= self.per_host:
+                    busy = True
+                else:
+                    busy = False
+                    self._host_inflight[host] += 1
+                    self._inflight += 1
+            if busy:
+                self._release(delivery["id"], time() + _HOST_BUSY_DELAY)
+                continue
+            futures.append(self._executor.submit(self._deliver, delivery, host))
+        if wait:
+            for f in futures:
+                f.result()
+        return len(futures)
+
+    def _claim(self, limit: int) -> List[Dict[str, Any]]:
+        now = time()
+        conn = self.store.conn()
+        # Idle polls stay read-only: only take the write lock when something is due
+        due = conn.execute(
+            "SELECT 1 FROM callback_deliveries WHERE status IN ('pending', 'sending') AND next_attempt_at <= ? LIMIT 1",
+            (now,)
+        ).fetchone()
+        if due is None:
+            return []
+        with conn:
+            cur = conn.execute(
+                f"""
+                UPDATE callback_deliveries SET status='sending', next_attempt_at=?, updated_at=?
+                WHERE id IN (
+                    SELECT id FROM callback_deliveries
+                    WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?
+                    ORDER BY next_attempt_at LIMIT ?
+                )
+                RETURNING {_DELIVERY_COLUMNS}
+                """,
+                (now + _LEASE_SECONDS, now, now, limit)
+            )
+            rows = cur.fetchall()
+        return [dict(zip(("id", "job_id", "url", "attempts"), r)) for r in rows]
+
+    def _release(self, delivery_id: int, next_attempt_at: float):
+        conn = self.store.conn()
+        with conn:
+            conn.execute(
+                "UPDATE callback_deliveries SET status='pending', next_attempt_at=?, updated_at=? WHERE id=?",
+                (next_attempt_at, time(), delivery_id)
+            )
+
+    def _payload(self, job_id: str) -> Optional[bytes]:
+        jobs = self.store.status_many([job_id])
+        if not jobs:
+            return None
+        job = jobs[0]
+        return json.dumps({
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "created_at": job["created_at"],
+            "result": job["result"],
+            "error": job["error"],
+        }, separators=(",", ":")).encode()
+
+    def _deliver(self, delivery: Dict[str, Any], host: str):
+        status_code = None
+        error = None
+        final = False
+        try:
+            body = self._payload(delivery["job_id"])
+            blocked, address = (None, None) if body is None else resolve_callback(delivery["url"])
+            if body is None:
+                error, final = "job_not_found", True
+            elif blocked:
+                error, final = f"blocked: {blocked}", True
+            else:
+                resp = self._post(delivery, body, address)
+                status_code = resp.status_code
+                resp.content  # drain the body so the keep-alive connection returns to the pool
+                if not 200 <= status_code < 300:
+                    error = f"HTTP {status_code}"
+        except (requests.RequestException, OSError) as e:
+            error = f"{type(e).__name__}: {e}"[:500]
+        except Exception as e:
+            log.exception("Callback delivery crashed")
+            error = f"{type(e).__name__}: {e}"[:500]
+        finally:
+            with self._lock:
+                self._inflight -= 1
+                self._host_inflight[host] -= 1
+                if self._host_inflight[host] <= 0:
+                    del self._host_inflight[host]
+        self._record(delivery, status_code, error, final)
+
+    def _post(self, delivery: Dict[str, Any], body: bytes, address: str) -> requests.Response:
+        """POST to the address resolve_callback() checked, naming the URL's host in Host and SNI"""
+        request = self.session.prepare_request(requests.Request(
+            "POST", delivery["url"], data=body, headers={"X-Levqor-Delivery": str(delivery["id"])}
+        ))
+        request.headers["Host"] = urlsplit(delivery["url"]).netloc.rpartition("@")[2]
+        request.pinned_address = address
+        return self.session.send(request, timeout=CALLBACK_TIMEOUT, allow_redirects=False)
+
+    def _record(self, delivery: Dict[str, Any], status_code: Optional[int], error: Optional[str],
+                final: bool = False):
+        attempts = delivery["attempts"] + 1
+        now = time()
+        if error is None:
+            status, next_at = "delivered", now
+        elif attempts >= CALLBACK_MAX_ATTEMPTS or final:
+            status, next_at = "dead", now
+            log.warning(f"Callback {delivery['id']} for job {delivery['job_id']} dead after {attempts} attempts: {error}")
+        else:
+            status, next_at = "pending", now + backoff_delay(attempts)
+        conn = self.store.conn()
+        with conn:
+            conn.execute(
+                """
+                UPDATE callback_deliveries
+                SET status=?, attempts=?, next_attempt_at=?, last_status_code=?, last_error=?, updated_at=?
+                WHERE id=?
+                """,
+                (status, attempts, next_at, status_code, error, now, delivery["id"])
+            )
+
+    def deliveries(self, status: str = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Delivery log, newest first"""
+        sql = ("SELECT id, job_id, url, status, attempts, next_attempt_at, last_status_code, "
+               "last_error, created_at, updated_at FROM callback_deliveries")
+        params = []
+        if status:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        cols = ("id", "job_id", "url", "status", "attempts", "next_attempt_at",
+                "last_status_code", "last_error", "created_at", "updated_at")
+        return [dict(zip(cols, r)) for r in self.store.conn().execute(sql, params).fetchall()]
+
+    def replay_dead(self, ids: List[int] = None) -> int:
+        """Move dead deliveries (all, or the given ids) back to pending"""
+        now = time()
+        sql = "UPDATE callback_deliveries SET status='pending', attempts=0, next_attempt_at=?, updated_at=? WHERE status='dead'"
+        params = [now, now]
+        if ids:
+            sql += f" AND id IN ({','.join('?' * len(ids))})"
+            params.extend(ids)
+        conn = self.store.conn()
+        with conn:
+            cur = conn.execute(sql, params)
+        return cur.rowcount
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_callback_dispatcher() -> CallbackDispatcher:
+    """Singleton dispatcher instance"""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = CallbackDispatcher(get_job_store())
+    return _dispatcher
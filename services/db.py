@@ -0,0 +1,84 @@
+"""
+Shared SQLite access - one pooled connection per thread per database.
+
+Every module that reads or writes the application database goes through
+get_conn() instead of opening its own connection. The pool keeps one
+connection per (thread, database file), so a request thread pays for
+sqlite3.connect() and the pragmas once rather than on every call, and no
+connection is ever shared between threads (SQLite connections are not safe
+to use concurrently).
+
+Each connection is opened with:
+- journal_mode=WAL, synchronous=NORMAL: readers don't block the writer
+- busy_timeout: writers wait for the lock instead of failing at once
+- mmap_size / cache_size: hot pages are read from memory
+- SQLITE_STATEMENT_CACHE prepared statements kept per connection
+
+The database is SQLITE_PATH (levqor.db in the working directory by default).
+Pooled connections are never closed by callers; they go away with their thread.
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+SQLITE_PATH = os.environ.get("SQLITE_PATH", os.path.join(os.getcwd(), "levqor.db"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 30000))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_CACHE_KIB = int(os.environ.get("SQLITE_CACHE_KIB", 16384))
+SQLITE_STATEMENT_CACHE = int(os.environ.get("SQLITE_STATEMENT_CACHE", 256))
+
+
+class ConnectionPool:
+    """Per-thread connections to one database file"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+                               cached_statements=SQLITE_STATEMENT_CACHE)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KIB}")
+        return conn
+
+    def conn(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def close(self):
+        """Close this thread's connection; the next conn() opens a new one"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            conn.close()
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path: Optional[str] = None) -> ConnectionPool:
+    """Pool for a database file (SQLITE_PATH by default), one per process"""
+    path = os.path.abspath(db_path or SQLITE_PATH)
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = _pools[path] = ConnectionPool(path)
+    return pool
+
+
+def get_conn(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """This thread's pooled connection to db_path (SQLITE_PATH by default)"""
+    return get_pool(db_path).conn()
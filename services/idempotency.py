@@ -0,0 +1,55 @@
+"""
+Idempotency-Key support for job intake.
+
+Retried submissions are answered from a bounded in-memory LRU first and the
+persistent idempotency_keys table second, without schema validation or an
+insert, with the status code of the original response. Keys are scoped to
+the submitting API key and live for IDEMPOTENCY_TTL seconds from the first
+submission; an entry loaded from the table is cached only for what is left
+of that window.
+"""
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from services.cache import StripedLRUCache
+from services.job_store import JobStore, get_job_store
+
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", 86400))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", 10000))
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyIndex:
+    def __init__(self, store: JobStore, ttl: float = IDEMPOTENCY_TTL,
+                 cache_size: int = IDEMPOTENCY_CACHE_SIZE):
+        self.store = store
+        self.ttl = ttl
+        self.cache = StripedLRUCache(cache_size, ttl)
+
+    def lookup(self, owner: str, key: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        """(response, status code) of the original submission, if the key is live"""
+        entry = self.cache.get((owner, key))
+        if entry is None:
+            stored = self.store.idempotent_response(owner, key, self.ttl)
+            if stored is not None:
+                response, status_code, remaining = stored
+                entry = (response, status_code)
+                self.cache.set((owner, key), entry, remaining)
+        return entry
+
+    def remember(self, owner: str, key: str, response: Dict[str, Any], status_code: int):
+        self.cache.set((owner, key), (response, status_code))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_idempotency_index() -> IdempotencyIndex:
+    """Singleton index instance"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = IdempotencyIndex(get_job_store())
+    return _index
@@ -0,0 +1,121 @@
+"""
+Streaming intake bodies.
+
+The body is read from the request stream in chunks under INTAKE_MAX_BYTES: a
+declared Content-Length over the limit is refused before anything is read, and
+a chunked body is cut off as soon as it crosses it. The bytes are then parsed
+once. Top-level members are decoded with the stdlib JSON scanner, which reports
+where each value ends, so the payload's size is known and its raw JSON can go
+straight to payload storage (services/payload_blobs.py) without re-serialising
+the parsed object.
+"""
+import os
+import json
+from json.decoder import WHITESPACE, scanstring
+from typing import Any, Dict, Optional, Tuple
+
+from werkzeug.exceptions import RequestEntityTooLarge
+
+PAYLOAD_MAX_BYTES = int(os.environ.get("PAYLOAD_MAX_BYTES", 200 * 1024))
+# Room for workflow, callback_url and the other intake fields around the payload
+INTAKE_MAX_BYTES = int(os.environ.get("INTAKE_MAX_BYTES", PAYLOAD_MAX_BYTES + 16 * 1024))
+
+_READ_CHUNK = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_ws = WHITESPACE.match
+
+
+class BodyTooLarge(Exception):
+    """Request body exceeds the intake limit"""
+
+
+def read_body(stream, content_length: Optional[int], limit: int = INTAKE_MAX_BYTES) -> bytearray:
+    """Read a request body, refusing it as soon as it is known to exceed `limit`"""
+    if content_length is not None and content_length > limit:
+        raise BodyTooLarge(limit)
+    buf = bytearray()
+    try:
+        while True:
+            chunk = stream.read(min(_READ_CHUNK, limit + 1 - len(buf)))
+            if not chunk:
+                return buf
+            buf += chunk
+            if len(buf) > limit:
+                raise BodyTooLarge(limit)
+    except RequestEntityTooLarge:
+        raise BodyTooLarge(limit)
+
+
+class IntakeBody:
+    """A JSON body parsed once, remembering where each top-level value lies"""
+
+    def __init__(self, raw: bytearray):
+        self.raw = raw
+        self.text = raw.decode("utf-8")
+        # Character offsets are byte offsets in pure-ASCII bodies
+        self._ascii = raw.isascii()
+        self.spans: Dict[str, Tuple[int, int]] = {}
+        self.data = self._parse()
+
+    def _parse(self) -> Any:
+        text = self.text
+        idx = _ws(text, 0).end()
+        if not text.startswith("{", idx):
+            return _decoder.decode(text)
+        data = {}
+        idx = _ws(text, idx + 1).end()
+        if text.startswith("}", idx):
+            idx += 1
+        else:
+            while True:
+                if not text.startswith('"', idx):
+                    raise ValueError(f"expecting property name at {idx}")
+                key, idx = scanstring(text, idx + 1)
+                idx = _ws(text, idx).end()
+                if not text.startswith(":", idx):
+                    raise ValueError(f"expecting ':' at {idx}")
+                start = _ws(text, idx + 1).end()
+                try:
+                    data[key], idx = _decoder.scan_once(text, start)
+                except StopIteration as e:
+                    raise ValueError(f"expecting value at {e.value}") from None
+                self.spans[key] = (start, idx)
+                idx = _ws(text, idx).end()
+                if text.startswith(",", idx):
+                    idx = _ws(text, idx + 1).end()
+                elif text.startswith("}", idx):
+                    idx += 1
+                    break
+                else:
+                    raise ValueError(f"expecting ',' or '}}' at {idx}")
+        if _ws(text, idx).end() != len(text):
+            raise ValueError(f"extra data at {idx}")
+        return data
+
+    def value_json(self, key: str):
+        """Raw JSON of a top-level value as sent (bytes-like), None if absent"""
+        span = self.spans.get(key)
+        if span is None:
+            return None
+        start, end = span
+        if self._ascii:
+            return memoryview(self.raw)[start:end]
+        return self.text[start:end].encode()
+
+    def value_size(self, key: str) -> Optional[int]:
+        """Size in bytes of a top-level value as sent"""
+        span = self.spans.get(key)
+        if span is None:
+            return None
+        if self._ascii:
+            return span[1] - span[0]
+        return len(self.text[span[0]:span[1]].encode())
+
+
+def parse_body(raw: bytearray) -> Optional[IntakeBody]:
+    """IntakeBody for valid UTF-8 JSON, else None"""
+    try:
+        return IntakeBody(raw)
+    except (UnicodeDecodeError, ValueError, RecursionError):
+        return None
@@ -0,0 +1,240 @@
+"""
+Job status fan-out for server-sent events.
+
+A single poller thread per process reads the job change feed (the seq
+cursor maintained by the jobs table triggers) once per tick, encodes each
+transition into an SSE frame exactly once, and hands the same bytes to every
+matching subscriber. Because the feed lives in SQLite, transitions made by
+other gunicorn workers are delivered too. Transitions of one job between two
+polls coalesce into its latest state. The poller only runs while there is at
+least one subscriber.
+
+Each open stream occupies a server thread for its whole life (gunicorn's
+gthread worker), so a process serves at most SSE_MAX_STREAMS streams and
+further subscribers get TooManyStreams. By default the cap is GUNICORN_THREADS
+minus SSE_RESERVED_THREADS (at least 1), so idle streams can never take the
+threads the rest of the API needs.
+
+Replayed state (the snapshot of watched jobs, or an owner's changes after
+Last-Event-ID, read a page of SUBSCRIBER_BUFFER at a time) is written
+straight to the stream. Only live transitions go through the subscriber's
+bounded buffer; a client too slow to keep up gets an "overflow" event whose
+id is the last transition it was sent, and the stream ends so it can
+reconnect from there.
+"""
+import os
+import json
+import queue
+import threading
+import logging
+from time import sleep
+from collections import defaultdict
+from typing import Dict, Any, Iterable, Optional, Set
+
+from services.job_store import JobStore, TERMINAL_STATUSES, get_job_store
+
+log = logging.getLogger("levqor.job_events")
+
+POLL_INTERVAL = float(os.environ.get("SSE_POLL_INTERVAL", 0.5))
+KEEPALIVE_SECONDS = float(os.environ.get("SSE_KEEPALIVE_SECONDS", 15))
+SUBSCRIBER_BUFFER = int(os.environ.get("SSE_SUBSCRIBER_BUFFER", 1000))
+GUNICORN_THREADS = int(os.environ.get("GUNICORN_THREADS", 4))
+# Request threads per process kept free of streams for the rest of the API
+SSE_RESERVED_THREADS = int(os.environ.get("SSE_RESERVED_THREADS", 2))
+
+
+def stream_cap(threads: int, reserved: int = SSE_RESERVED_THREADS) -> int:
+    """Streams a process with `threads` request threads may hold open"""
+    return max(1, threads - reserved)
+
+
+SSE_MAX_STREAMS = int(os.environ.get("SSE_MAX_STREAMS", stream_cap(GUNICORN_THREADS)))
+
+if SSE_MAX_STREAMS >= GUNICORN_THREADS:
+    log.warning(f"SSE_MAX_STREAMS={SSE_MAX_STREAMS} leaves none of GUNICORN_THREADS={GUNICORN_THREADS} "
+                "for other requests once every stream slot is taken")
+
+KEEPALIVE_FRAME = b": keepalive\n\n"
+
+
+def encode_event(job: Dict[str, Any]) -> bytes:
+    data = json.dumps({
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "result": job["result"],
+        "error": job["error"],
+    }, separators=(",", ":"))
+    return f"id: {job['seq']}\nevent: status\ndata: {data}\n\n".encode()
+
+
+def encode_overflow(cursor: Optional[int]) -> bytes:
+    """Last frame of a stream whose buffer overflowed; `cursor` is where to resume"""
+    data = json.dumps({"error": "overflow", "cursor": cursor}, separators=(",", ":"))
+    event_id = "" if cursor is None else f"id: {cursor}\n"
+    return f"{event_id}event: overflow\ndata: {data}\n\n".encode()
+
+
+class TooManyStreams(Exception):
+    """This process already serves its maximum number of streams"""
+
+
+class Subscription:
+    def __init__(self, owner: str, job_ids: Optional[Set[str]] = None, cursor: Optional[int] = None):
+        self.owner = owner
+        self.job_ids = job_ids
+        self.pending = set(job_ids) if job_ids else None
+        self.frames = queue.Queue(maxsize=SUBSCRIBER_BUFFER)
+        self.overflowed = False
+        self.closed = False
+        # Seq of the last live transition buffered for this subscriber (or the
+        # Last-Event-ID it connected with); resuming there repeats at most
+        # some backlog frames, never skips a transition
+        self.cursor = cursor
+
+    def push(self, frame: bytes, job_id: str, status: str, seq: int):
+        if self.overflowed:
+            return
+        try:
+            self.frames.put_nowait(frame)
+        except queue.Full:
+            # Nothing after the overflow is buffered, so `cursor` stays a
+            # point the client can resume from without a gap
+            self.overflowed = True
+            return
+        self.cursor = seq
+        if self.pending is not None and status in TERMINAL_STATUSES:
+            self.pending.discard(job_id)
+
+    def settle(self, snapshot: Iterable[Dict[str, Any]]):
+        """
+        Stop waiting for watched jobs that the snapshot, taken after
+        subscribing, shows as terminal or doesn't contain at all
+        """
+        if self.pending is None:
+            return
+        found = set()
+        for job in snapshot:
+            found.add(job["job_id"])
+            if job["status"] in TERMINAL_STATUSES:
+                self.pending.discard(job["job_id"])
+        self.pending.intersection_update(found)
+
+    @property
+    def done(self) -> bool:
+        """True once every watched job has reached a terminal status"""
+        return self.overflowed or (self.pending is not None and not self.pending)
+
+
+class StatusBroker:
+    def __init__(self, store: JobStore, max_streams: int = SSE_MAX_STREAMS):
+        self.store = store
+        self.max_streams = max_streams
+        self._by_job: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._by_owner: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._count = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._cursor = 0
+
+    def subscribe(self, owner: str, job_ids: Iterable[str] = None, cursor: int = None) -> Subscription:
+        sub = Subscription(owner, set(job_ids) if job_ids else None, cursor)
+        with self._lock:
+            if self._count >= self.max_streams:
+                raise TooManyStreams(self.max_streams)
+            if sub.job_ids:
+                for job_id in sub.job_ids:
+                    self._by_job[job_id].add(sub)
+            else:
+                self._by_owner[owner].add(sub)
+            self._count += 1
+            if self._thread is None:
+                self._cursor = self.store.current_seq()
+                self._thread = threading.Thread(target=self._poll, name="sse-poller", daemon=True)
+                self._thread.start()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        """Drop a subscription; safe to call more than once"""
+        with self._lock:
+            if sub.closed:
+                return
+            sub.closed = True
+            if sub.job_ids:
+                for job_id in sub.job_ids:
+                    subs = self._by_job.get(job_id)
+                    if subs:
+                        subs.discard(sub)
+                        if not subs:
+                            del self._by_job[job_id]
+            else:
+                subs = self._by_owner.get(sub.owner)
+                if subs:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._by_owner[sub.owner]
+            self._count -= 1
+
+    def _poll(self):
+        while True:
+            with self._lock:
+                if self._count == 0:
+                    self._thread = None
+                    return
+            try:
+                self._dispatch(self.store.change_feed(self._cursor, limit=5000))
+            except Exception as e:
+                log.warning(f"Status feed poll failed: {e}")
+            sleep(POLL_INTERVAL)
+
+    def _dispatch(self, changes):
+        for job in changes:
+            self._cursor = job["seq"]
+            with self._lock:
+                targets = self._by_job.get(job["job_id"], set()) | self._by_owner.get(job["owner"], set())
+            if not targets:
+                continue
+            frame = encode_event(job)
+            for sub in targets:
+                sub.push(frame, job["job_id"], job["status"], job["seq"])
+
+    def changes_since(self, owner: str, cursor: int) -> Iterable[Dict[str, Any]]:
+        """An owner's changes after `cursor`, read one SUBSCRIBER_BUFFER page at a time"""
+        while True:
+            page = self.store.changes_since(owner, cursor, SUBSCRIBER_BUFFER)
+            yield from page
+            if len(page) < SUBSCRIBER_BUFFER:
+                return
+            cursor = page[-1]["seq"]
+
+    def stream(self, sub: Subscription, backlog: Iterable[Dict[str, Any]] = ()):
+        """
+        Generator of SSE frames for one subscriber; unsubscribes on exit.
+        The backlog is written directly, never through the bounded buffer.
+        """
+        try:
+            yield b"retry: 3000\n\n"
+            for job in backlog:
+                yield encode_event(job)
+            while not sub.done or not sub.frames.empty():
+                try:
+                    yield sub.frames.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield KEEPALIVE_FRAME
+            if sub.overflowed:
+                yield encode_overflow(sub.cursor)
+        finally:
+            self.unsubscribe(sub)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+def get_status_broker() -> StatusBroker:
+    """Singleton broker instance"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = StatusBroker(get_job_store())
+    return _broker
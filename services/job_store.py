@@ -0,0 +1,1401 @@
+"""
+Durable job store - SQLite-backed queue shared by every worker process.
+
+Replaces the in-memory JOBS dict: jobs survive restarts, every gunicorn
+worker sees the same queue, and status lookups stay index-bound.
+"""
+import os
+import json
+import zlib
+import sqlite3
+import threading
+import logging
+from time import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from services.job_scheduler import FairScheduler
+from services.workflow_limits import WorkflowLimits
+from services.key_plans import KeyPlans
+from services.result_cache import ResultCache, memo_key, memo_ttl
+from services.payload_blobs import split_payload, store_blobs, load_blobs
+from services.db import get_pool, SQLITE_PATH
+
+log = logging.getLogger("levqor.jobs")
+
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+
+PRIORITIES = {"low": 0, "normal": 1, "high": 2}
+PRIORITY_NAMES = {v: k for k, v in PRIORITIES.items()}
+
+JOB_STATUSES = ("scheduled", "waiting", "queued", "running", "succeeded", "failed", "cancelled")
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+CANCELLABLE_STATUSES = ("scheduled", "waiting", "queued", "running")
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS jobs(
+      id TEXT PRIMARY KEY,
+      workflow TEXT NOT NULL,
+      status TEXT NOT NULL,
+      priority INTEGER NOT NULL DEFAULT 1,
+      input TEXT NOT NULL,
+      callback_url TEXT,
+      result TEXT,
+      error TEXT,
+      created_at REAL NOT NULL,
+      updated_at REAL NOT NULL
+    )
+    """,
+]
+
+# Columns added after the initial jobs table; applied with ALTER TABLE on startup
+COLUMN_MIGRATIONS = [
+    ("lease_owner", "TEXT"),
+    ("lease_expires_at", "REAL"),
+    ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+    ("owner", "TEXT"),
+    ("seq", "INTEGER"),
+    ("archived_at", "REAL"),
+    ("cache_key", "TEXT"),
+    ("cache_ttl", "REAL"),
+    ("run_at", "REAL"),
+    ("dag_id", "TEXT"),
+    ("step_id", "TEXT"),
+    ("pending_deps", "INTEGER NOT NULL DEFAULT 0"),
+    ("queued_at", "REAL"),
+]
+
+INDEXES = [
+    "DROP INDEX IF EXISTS idx_jobs_status_priority",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(status, priority, workflow, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs(status, lease_expires_at)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_seq ON jobs(seq)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_owner_seq ON jobs(owner, seq)",
+    # Superseded by idx_jobs_finished once 'cancelled' became a terminal status
+    "DROP INDEX IF EXISTS idx_jobs_archivable",
+    """
+    CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(updated_at)
+    WHERE archived_at IS NULL AND status IN ('succeeded', 'failed', 'cancelled')
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_jobs_scheduled ON jobs(run_at) WHERE status = 'scheduled'",
+]
+
+# Every insert and status/result change stamps the row with the next value of
+# a global change sequence, which backs cursor-based delta polling.
+TRIGGERS = [
+    "CREATE TABLE IF NOT EXISTS job_seq(id INTEGER PRIMARY KEY CHECK (id = 1), value INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO job_seq(id, value) VALUES (1, 0)",
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_seq_insert AFTER INSERT ON jobs
+    BEGIN
+      UPDATE job_seq SET value = value + 1 WHERE id = 1;
+      UPDATE jobs SET seq = (SELECT value FROM job_seq WHERE id = 1) WHERE rowid = NEW.rowid;
+    END
+    """,
+    # Archival rewrites result/input of finished jobs; that is not a status change
+    "DROP TRIGGER IF EXISTS trg_jobs_seq_update",
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_seq_change AFTER UPDATE OF status, result, error ON jobs
+    WHEN NEW.archived_at IS NULL
+    BEGIN
+      UPDATE job_seq SET value = value + 1 WHERE id = 1;
+      UPDATE jobs SET seq = (SELECT value FROM job_seq WHERE id = 1) WHERE rowid = NEW.rowid;
+    END
+    """,
+]
+
+# Callback outbox: a terminal transition of a job with a callback_url enqueues
+# one delivery in the same transaction; services/callbacks.py drains it.
+CALLBACK_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS callback_deliveries(
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      job_id TEXT NOT NULL,
+      url TEXT NOT NULL,
+      status TEXT NOT NULL DEFAULT 'pending',
+      attempts INTEGER NOT NULL DEFAULT 0,
+      next_attempt_at REAL NOT NULL,
+      last_status_code INTEGER,
+      last_error TEXT,
+      created_at REAL NOT NULL,
+      updated_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_callbacks_due ON callback_deliveries(status, next_attempt_at)",
+    "CREATE INDEX IF NOT EXISTS idx_callbacks_job ON callback_deliveries(job_id)",
+    "DROP TRIGGER IF EXISTS trg_jobs_callback",
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_callback_terminal AFTER UPDATE OF status ON jobs
+    WHEN NEW.callback_url IS NOT NULL AND NEW.status IN ('succeeded', 'failed', 'cancelled')
+         AND OLD.status NOT IN ('succeeded', 'failed', 'cancelled')
+    BEGIN
+      INSERT INTO callback_deliveries(job_id, url, next_attempt_at, created_at, updated_at)
+      VALUES (NEW.id, NEW.callback_url, NEW.updated_at, NEW.updated_at, NEW.updated_at);
+    END
+    """,
+]
+
+# Status counters and per-minute enqueue/dequeue totals, maintained by
+# triggers in the same transaction as every transition so /ops/queue_health
+# never scans the jobs table.
+COUNTER_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS job_counters(status TEXT PRIMARY KEY, count INTEGER NOT NULL)",
+    """
+    CREATE TABLE IF NOT EXISTS job_rates(
+      minute INTEGER PRIMARY KEY,
+      enqueued INTEGER NOT NULL DEFAULT 0,
+      dequeued INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at)",
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_count_insert AFTER INSERT ON jobs
+    BEGIN
+      INSERT INTO job_counters(status, count) VALUES (NEW.status, 1)
+        ON CONFLICT(status) DO UPDATE SET count = count + 1;
+      INSERT INTO job_rates(minute, enqueued) VALUES (CAST(NEW.created_at / 60 AS INTEGER), 1)
+        ON CONFLICT(minute) DO UPDATE SET enqueued = enqueued + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_count_update AFTER UPDATE OF status ON jobs
+    WHEN OLD.status IS NOT NEW.status
+    BEGIN
+      UPDATE job_counters SET count = count - 1 WHERE status = OLD.status;
+      INSERT INTO job_counters(status, count) VALUES (NEW.status, 1)
+        ON CONFLICT(status) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_count_dequeue AFTER UPDATE OF status ON jobs
+    WHEN OLD.status = 'queued' AND NEW.status = 'running'
+    BEGIN
+      INSERT INTO job_rates(minute, dequeued) VALUES (CAST(NEW.updated_at / 60 AS INTEGER), 1)
+        ON CONFLICT(minute) DO UPDATE SET dequeued = dequeued + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_count_delete AFTER DELETE ON jobs
+    BEGIN
+      UPDATE job_counters SET count = count - 1 WHERE status = OLD.status;
+    END
+    """,
+]
+
+# Running jobs per workflow, kept by triggers like job_counters: the claim
+# path checks max_concurrency headroom and /ops/queue_health reports it with
+# one primary-key read per capped workflow instead of counting running rows.
+WORKFLOW_RUNNING_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS workflow_running(workflow TEXT PRIMARY KEY, count INTEGER NOT NULL)",
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_running_start AFTER UPDATE OF status ON jobs
+    WHEN NEW.status = 'running' AND OLD.status IS NOT 'running'
+    BEGIN
+      INSERT INTO workflow_running(workflow, count) VALUES (NEW.workflow, 1)
+        ON CONFLICT(workflow) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_running_stop AFTER UPDATE OF status ON jobs
+    WHEN OLD.status = 'running' AND NEW.status IS NOT 'running'
+    BEGIN
+      UPDATE workflow_running SET count = count - 1 WHERE workflow = OLD.workflow;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_running_delete AFTER DELETE ON jobs
+    WHEN OLD.status = 'running'
+    BEGIN
+      UPDATE workflow_running SET count = count - 1 WHERE workflow = OLD.workflow;
+    END
+    """,
+]
+
+# queued_at is when a job last entered 'queued': set on insert, and by the
+# trigger on every later transition (run_at falling due, DAG parents done,
+# retry, lease expiry, dead-letter replay). Queue age is measured from it, so
+# a job that waited elsewhere first doesn't look as old as its created_at.
+QUEUED_AT_SCHEMA = [
+    "CREATE INDEX IF NOT EXISTS idx_jobs_queued_at ON jobs(queued_at) WHERE status = 'queued'",
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_queued_at AFTER UPDATE OF status ON jobs
+    WHEN NEW.status = 'queued' AND OLD.status IS NOT 'queued'
+    BEGIN
+      UPDATE jobs SET queued_at = NEW.updated_at WHERE rowid = NEW.rowid;
+    END
+    """,
+    # Jobs queued before the column existed
+    "UPDATE jobs SET queued_at = MAX(created_at, COALESCE(run_at, 0)) WHERE status = 'queued' AND queued_at IS NULL",
+]
+
+# Intake bodies are stored out of line: the jobs row keeps a 'null' input
+# placeholder, so it stays a compact record of ids, status, priority and
+# timestamps. Status transitions rewrite the whole row (twice, with the seq
+# trigger), and index-bound lookups read whole rows, so multi-KB inputs there
+# made every queue operation pay for payload bytes it never looks at.
+INPUT_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS job_inputs(
+      job_id TEXT PRIMARY KEY,
+      body TEXT NOT NULL
+    )
+    """,
+]
+
+# Finished jobs past retention keep a hot stub in `jobs`; their compressed
+# input and result live here.
+ARCHIVE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS jobs_archive(
+      id TEXT PRIMARY KEY,
+      input BLOB,
+      result BLOB,
+      archived_at REAL NOT NULL
+    )
+    """,
+]
+
+# Columns added to job_inputs / jobs_archive after they were introduced
+INPUT_COLUMN_MIGRATIONS = [
+    ("payload_hash", "TEXT"),
+]
+
+# Large payloads (services/payload_blobs.py), shared by every job input and
+# archive entry with the same content; `refs` is kept by the triggers below
+PAYLOAD_BLOB_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS payload_blobs(
+      hash TEXT PRIMARY KEY,
+      codec TEXT NOT NULL,
+      size INTEGER NOT NULL,
+      refs INTEGER NOT NULL DEFAULT 0,
+      created_at REAL NOT NULL,
+      data BLOB NOT NULL
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_job_inputs_blob_ref AFTER INSERT ON job_inputs
+    WHEN NEW.payload_hash IS NOT NULL
+    BEGIN
+      UPDATE payload_blobs SET refs = refs + 1 WHERE hash = NEW.payload_hash;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_job_inputs_blob_unref AFTER DELETE ON job_inputs
+    WHEN OLD.payload_hash IS NOT NULL
+    BEGIN
+      UPDATE payload_blobs SET refs = refs - 1 WHERE hash = OLD.payload_hash;
+      DELETE FROM payload_blobs WHERE hash = OLD.payload_hash AND refs <= 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_archive_blob_ref AFTER INSERT ON jobs_archive
+    WHEN NEW.payload_hash IS NOT NULL
+    BEGIN
+      UPDATE payload_blobs SET refs = refs + 1 WHERE hash = NEW.payload_hash;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_archive_blob_unref AFTER DELETE ON jobs_archive
+    WHEN OLD.payload_hash IS NOT NULL
+    BEGIN
+      UPDATE payload_blobs SET refs = refs - 1 WHERE hash = OLD.payload_hash;
+      DELETE FROM payload_blobs WHERE hash = OLD.payload_hash AND refs <= 0;
+    END
+    """,
+]
+
+# Idempotency-Key -> original intake response and status code, scoped per API key owner
+IDEMPOTENCY_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS idempotency_keys(
+      owner TEXT NOT NULL,
+      key TEXT NOT NULL,
+      job_id TEXT NOT NULL,
+      response TEXT NOT NULL,
+      created_at REAL NOT NULL,
+      status_code INTEGER NOT NULL DEFAULT 202,
+      PRIMARY KEY (owner, key)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_idempotency_created_at ON idempotency_keys(created_at)",
+]
+
+IDEMPOTENCY_COLUMN_MIGRATIONS = [
+    ("status_code", "INTEGER NOT NULL DEFAULT 202"),
+]
+
+
+# Jobs that exhausted JOB_MAX_ATTEMPTS; the job row stays 'failed' until replayed
+DEAD_LETTER_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS dead_letters(
+      job_id TEXT PRIMARY KEY,
+      workflow TEXT NOT NULL,
+      reason TEXT NOT NULL,
+      error_class TEXT,
+      attempts INTEGER NOT NULL,
+      last_error TEXT,
+      failed_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_dead_letters_failed_at ON dead_letters(failed_at)",
+    "CREATE INDEX IF NOT EXISTS idx_dead_letters_workflow ON dead_letters(workflow, failed_at)",
+    "CREATE INDEX IF NOT EXISTS idx_dead_letters_error_class ON dead_letters(error_class, failed_at)",
+]
+
+# Per-workflow concurrency caps and submission rates (services/workflow_limits.py)
+WORKFLOW_LIMITS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS workflow_limits(
+      workflow TEXT PRIMARY KEY,
+      max_concurrency INTEGER,
+      rate_per_min REAL,
+      burst INTEGER,
+      updated_at REAL NOT NULL
+    )
+    """,
+]
+
+# Plan tier of each API key, by key tag (services/key_plans.py)
+API_KEY_PLANS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS api_key_plans(
+      key_tag TEXT PRIMARY KEY,
+      plan TEXT NOT NULL,
+      updated_at REAL NOT NULL
+    )
+    """,
+]
+
+# Results of memoized jobs (services/result_cache.py), written by trigger when
+# a job carrying a cache_key succeeds
+RESULT_CACHE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS result_cache(
+      key TEXT PRIMARY KEY,
+      workflow TEXT NOT NULL,
+      result TEXT,
+      created_at REAL NOT NULL,
+      expires_at REAL NOT NULL,
+      used_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_result_cache_expires ON result_cache(expires_at)",
+    "CREATE INDEX IF NOT EXISTS idx_result_cache_used ON result_cache(used_at)",
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_memoize AFTER UPDATE OF status ON jobs
+    WHEN NEW.status = 'succeeded' AND OLD.status IS NOT 'succeeded' AND NEW.cache_key IS NOT NULL
+    BEGIN
+      INSERT INTO result_cache(key, workflow, result, created_at, expires_at, used_at)
+      VALUES (NEW.cache_key, NEW.workflow, NEW.result, NEW.updated_at, NEW.updated_at + NEW.cache_ttl, NEW.updated_at)
+      ON CONFLICT(key) DO UPDATE SET
+        result = excluded.result, created_at = excluded.created_at,
+        expires_at = excluded.expires_at, used_at = excluded.used_at;
+    END
+    """,
+]
+
+# Recurring (cron) submissions (services/recurring.py); due rows are found
+# through the partial next-fire index, never by scanning schedules
+JOB_SCHEDULES_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS job_schedules(
+      id TEXT PRIMARY KEY,
+      owner TEXT,
+      workflow TEXT NOT NULL,
+      cron TEXT NOT NULL,
+      timezone TEXT NOT NULL DEFAULT 'UTC',
+      template TEXT NOT NULL,
+      enabled INTEGER NOT NULL DEFAULT 1,
+      next_run_at REAL,
+      last_run_at REAL,
+      last_job_id TEXT,
+      runs INTEGER NOT NULL DEFAULT 0,
+      created_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_schedules_due ON job_schedules(next_run_at) WHERE enabled = 1",
+    "CREATE INDEX IF NOT EXISTS idx_schedules_owner ON job_schedules(owner, created_at)",
+]
+
+# Number of enabled schedules, kept by triggers so queue health reads one row
+SCHEDULE_COUNTER_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS job_schedule_count(id INTEGER PRIMARY KEY CHECK (id = 1), active INTEGER NOT NULL)",
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_schedules_count_insert AFTER INSERT ON job_schedules
+    WHEN NEW.enabled = 1
+    BEGIN
+      UPDATE job_schedule_count SET active = active + 1 WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_schedules_count_update AFTER UPDATE OF enabled ON job_schedules
+    WHEN OLD.enabled IS NOT NEW.enabled
+    BEGIN
+      UPDATE job_schedule_count SET active = active + (NEW.enabled = 1) - (OLD.enabled = 1) WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_schedules_count_delete AFTER DELETE ON job_schedules
+    WHEN OLD.enabled = 1
+    BEGIN
+      UPDATE job_schedule_count SET active = active - 1 WHERE id = 1;
+    END
+    """,
+]
+
+# DAG submissions: each step is a job; steps with parents wait in 'waiting'.
+# When a parent succeeds its result is written into each child's input under
+# parents.<step_id> and children with no pending parents are queued, all in
+# the completing transaction. A step that ends failed or cancelled cancels
+# every still-waiting step of its DAG.
+DAG_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS job_deps(
+      parent_id TEXT NOT NULL,
+      job_id TEXT NOT NULL,
+      PRIMARY KEY (parent_id, job_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_jobs_dag ON jobs(dag_id, status) WHERE dag_id IS NOT NULL",
+    # Superseded once inputs moved to job_inputs, then by the primary-key lookups below
+    "DROP TRIGGER IF EXISTS trg_jobs_dag_release",
+    "DROP TRIGGER IF EXISTS trg_jobs_dag_release_inputs",
+    # "+status" keeps the planner on the primary key: the children are a handful
+    # of ids, while idx_jobs_status_created would walk every waiting job
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_dag_release_children AFTER UPDATE OF status ON jobs
+    WHEN NEW.dag_id IS NOT NULL AND NEW.status = 'succeeded' AND OLD.status IS NOT 'succeeded'
+    BEGIN
+      UPDATE job_inputs SET body = json_set(body, '$.parents."' || NEW.step_id || '"', json(COALESCE(NEW.result, 'null')))
+      WHERE job_id IN (SELECT d.job_id FROM job_deps d JOIN jobs j ON j.id = d.job_id
+                       WHERE d.parent_id = NEW.id AND +j.status = 'waiting');
+      UPDATE jobs SET pending_deps = pending_deps - 1
+      WHERE id IN (SELECT job_id FROM job_deps WHERE parent_id = NEW.id) AND +status = 'waiting';
+      UPDATE jobs SET status = 'queued', run_at = NEW.updated_at, updated_at = NEW.updated_at
+      WHERE id IN (SELECT job_id FROM job_deps WHERE parent_id = NEW.id) AND +status = 'waiting' AND pending_deps <= 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_dag_abort AFTER UPDATE OF status ON jobs
+    WHEN NEW.dag_id IS NOT NULL AND NEW.status IN ('failed', 'cancelled') AND OLD.status NOT IN ('failed', 'cancelled')
+    BEGIN
+      UPDATE jobs SET status = 'cancelled', updated_at = NEW.updated_at,
+                      error = json_object('type', 'UpstreamFailed', 'message', 'step ' || NEW.step_id || ' ' || NEW.status)
+      WHERE dag_id = NEW.dag_id AND status = 'waiting';
+    END
+    """,
+]
+
+
+class DuplicateIdempotencyKey(Exception):
+    """Another request already claimed this Idempotency-Key within its window"""
+
+
+# SQLite host-parameter limit is 999 on older builds
+_MAX_PARAMS = 900
+
+_STATUS_COLUMNS = "id, status, created_at, result, error, seq, archived_at"
+
+_JOB_COLUMNS = ("id, workflow, status, priority, input, callback_url, result, error, "
+                "created_at, updated_at, lease_owner, lease_expires_at, attempts, archived_at, run_at")
+
+
+def _dumps(value) -> Optional[str]:
+    return None if value is None else json.dumps(value, separators=(",", ":"))
+
+
+def _loads(value):
+    return None if value is None else json.loads(value)
+
+
+def _compress(value: Optional[str]) -> Optional[bytes]:
+    return None if value is None else zlib.compress(value.encode(), 6)
+
+
+def _decompress(value: Optional[bytes]):
+    return None if value is None else json.loads(zlib.decompress(value))
+
+
+def _with_payload(job_input, payload_hash: Optional[str], payloads: Dict[str, bytes]):
+    """Put a blob-stored payload back into its intake body"""
+    if payload_hash is not None and isinstance(job_input, dict):
+        job_input["payload"] = json.loads(payloads[payload_hash])
+    return job_input
+
+
+def row_to_job(row) -> Optional[Dict[str, Any]]:
+    if not row:
+        return None
+    (id_, workflow, status, priority, input_, callback_url, result, error,
+     created_at, updated_at, lease_owner, lease_expires_at, attempts, archived_at, run_at) = row
+    return {
+        "id": id_,
+        "workflow": workflow,
+        "status": status,
+        "priority": PRIORITY_NAMES.get(priority, "normal"),
+        "input": _loads(input_),
+        "callback_url": callback_url,
+        "result": _loads(result),
+        "error": _loads(error),
+        "created_at": created_at,
+        "updated_at": updated_at,
+        "lease_owner": lease_owner,
+        "lease_expires_at": lease_expires_at,
+        "attempts": attempts,
+        "archived_at": archived_at,
+        "run_at": run_at,
+    }
+
+
+def _status_row(row) -> Dict[str, Any]:
+    (id_, status, created_at, result, error, seq, archived_at) = row
+    job = {
+        "job_id": id_,
+        "status": status,
+        "created_at": created_at,
+        "result": _loads(result),
+        "error": _loads(error),
+        "seq": seq,
+    }
+    if archived_at is not None:
+        job["archived"] = True
+    return job
+
+
+class JobStore:
+    """Job persistence on the thread's pooled SQLite connection (services/db.py)."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._pool = get_pool(db_path)
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self.scheduler = FairScheduler()
+        self.limits = WorkflowLimits(self)
+        self.results = ResultCache(self)
+        self.key_plans = KeyPlans(self)
+
+    def conn(self) -> sqlite3.Connection:
+        """Return this thread's connection, creating the schema on first use"""
+        conn = self._pool.conn()
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    with conn:
+                        conn.execute("BEGIN IMMEDIATE")
+                        for stmt in SCHEMA:
+                            conn.execute(stmt)
+                        self._migrate_columns(conn, "jobs", COLUMN_MIGRATIONS)
+                        self._ensure_inputs(conn)
+                        for stmt in (INDEXES + TRIGGERS + CALLBACK_SCHEMA + ARCHIVE_SCHEMA + IDEMPOTENCY_SCHEMA +
+                                     DEAD_LETTER_SCHEMA + WORKFLOW_LIMITS_SCHEMA + RESULT_CACHE_SCHEMA +
+                                     JOB_SCHEDULES_SCHEMA + DAG_SCHEMA + API_KEY_PLANS_SCHEMA + QUEUED_AT_SCHEMA):
+                            conn.execute(stmt)
+                        self._migrate_columns(conn, "job_inputs", INPUT_COLUMN_MIGRATIONS)
+                        self._migrate_columns(conn, "jobs_archive", INPUT_COLUMN_MIGRATIONS)
+                        self._migrate_columns(conn, "idempotency_keys", IDEMPOTENCY_COLUMN_MIGRATIONS)
+                        for stmt in PAYLOAD_BLOB_SCHEMA:
+                            conn.execute(stmt)
+                        self._ensure_seeded(
+                            conn, "job_counters", COUNTER_SCHEMA,
+                            "INSERT INTO job_counters(status, count) SELECT status, COUNT(*) FROM jobs GROUP BY status"
+                        )
+                        self._ensure_seeded(
+                            conn, "workflow_running", WORKFLOW_RUNNING_SCHEMA,
+                            "INSERT INTO workflow_running(workflow, count) "
+                            "SELECT workflow, COUNT(*) FROM jobs WHERE status='running' GROUP BY workflow"
+                        )
+                        self._ensure_seeded(
+                            conn, "job_schedule_count", SCHEDULE_COUNTER_SCHEMA,
+                            "INSERT INTO job_schedule_count(id, active) "
+                            "SELECT 1, COUNT(*) FROM job_schedules WHERE enabled = 1"
+                        )
+                    self._schema_ready = True
+        return conn
+
+    @staticmethod
+    def _migrate_columns(conn: sqlite3.Connection, table: str, columns):
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for name, decl in columns:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+    @staticmethod
+    def _insert_row(job_id: str, data: Dict[str, Any], now: float, owner: str = None,
+                    memoize: bool = True, step=None):
+        priority = PRIORITIES.get(data.get("priority", "normal"), 1)
+        run_at = data.get("run_at")
+        status = "scheduled" if run_at is not None and run_at > now else "queued"
+        dag_id, step_id, pending_deps = step or (None, None, 0)
+        if pending_deps:
+            status = "waiting"
+        cache_key = cache_ttl = None
+        if memoize and data.get("memoize"):
+            cache_key = memo_key(owner, data["workflow"], data.get("payload"))
+            cache_ttl = memo_ttl(data)
+        return (job_id, data["workflow"], status, priority, "null",
+                data.get("callback_url"), None, None, now, now, None, None, 0, None, run_at,
+                owner, cache_key, cache_ttl, dag_id, step_id, pending_deps, now if status == "queued" else None)
+
+    @staticmethod
+    def _ensure_seeded(conn: sqlite3.Connection, table: str, schema, seed: str):
+        """Create a trigger-maintained counter table, seeding it from existing rows once"""
+        seeded = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+        ).fetchone()
+        for stmt in schema:
+            conn.execute(stmt)
+        if not seeded:
+            conn.execute(seed)
+
+    @staticmethod
+    def _ensure_inputs(conn: sqlite3.Connection):
+        """Create job_inputs, moving inputs of existing live jobs out of line once"""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='job_inputs'"
+        ).fetchone()
+        for stmt in INPUT_SCHEMA:
+            conn.execute(stmt)
+        if not exists:
+            conn.execute("INSERT INTO job_inputs(job_id, body) SELECT id, input FROM jobs WHERE archived_at IS NULL")
+            conn.execute("UPDATE jobs SET input='null' WHERE archived_at IS NULL")
+
+    def create(self, job_id: str, data: Dict[str, Any], now: float = None,
+               owner: str = None, idempotency=None, results: Dict[str, Any] = None,
+               payload=None) -> Dict[str, Any]:
+        """
+        Insert a queued job from a validated intake body.
+
+        `idempotency` is an optional (key, response, status_code, window_seconds) tuple,
+        recorded in the same transaction; raises DuplicateIdempotencyKey if
+        the key is already held by a live entry. `payload` is the payload's
+        JSON as received, when intake has it, so it is stored without being
+        serialised again.
+        """
+        payloads = {job_id: payload} if payload is not None else None
+        return self.create_many([(job_id, data)], now, owner, idempotency, results, payloads)[0]
+
+    def create_many(self, items, now: float = None, owner: str = None,
+                    idempotency=None, results: Dict[str, Any] = None,
+                    payloads: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        Insert (job_id, intake body) pairs in a single transaction.
+
+        Jobs listed in `results` (memoization hits) are completed with that
+        result in the same transaction, so status, callbacks and the change
+        feed behave exactly as for a worker-completed job.
+        """
+        now = now or time()
+        conn = self.conn()
+        with conn:
+            created = self.insert_jobs(conn, items, now, owner, results, payloads=payloads)
+            if idempotency:
+                key, response, status_code, window = idempotency
+                cur = conn.execute(
+                    """
+                    INSERT INTO idempotency_keys(owner, key, job_id, response, created_at, status_code)
+                    VALUES (?,?,?,?,?,?)
+                    ON CONFLICT(owner, key) DO UPDATE SET
+                        job_id = excluded.job_id,
+                        response = excluded.response,
+                        created_at = excluded.created_at,
+                        status_code = excluded.status_code
+                    WHERE idempotency_keys.created_at < ?
+                    """,
+                    (owner or "", key, items[0][0], _dumps(response), now, status_code, now - window)
+                )
+                if cur.rowcount == 0:
+                    raise DuplicateIdempotencyKey(key)
+        return created
+
+    def insert_jobs(self, conn: sqlite3.Connection, items, now: float, owner: str = None,
+                    results: Dict[str, Any] = None, steps: Dict[str, tuple] = None,
+                    payloads: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        create_many() inside a transaction the caller already holds.
+        `steps` maps job_id -> (dag_id, step_id, parent count) for DAG steps;
+        `payloads` maps job_id -> payload JSON as received.
+        """
+        results = results or {}
+        steps = steps or {}
+        payloads = payloads or {}
+        rows = [self._insert_row(job_id, data, now, owner, memoize=job_id not in results, step=steps.get(job_id))
+                for job_id, data in items]
+        conn.executemany(
+            f"INSERT INTO jobs({_JOB_COLUMNS}, owner, cache_key, cache_ttl, dag_id, step_id, pending_deps, queued_at) "
+            "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            rows
+        )
+        inputs, blobs = [], {}
+        for job_id, data in items:
+            body, payload_hash, payload = split_payload(data, payloads.get(job_id))
+            if payload_hash:
+                blobs[payload_hash] = payload
+            inputs.append((job_id, _dumps(body), payload_hash))
+        store_blobs(conn, blobs, now)
+        conn.executemany("INSERT INTO job_inputs(job_id, body, payload_hash) VALUES (?,?,?)", inputs)
+        if results:
+            conn.executemany(
+                "UPDATE jobs SET status='succeeded', result=?, updated_at=? WHERE id=?",
+                [(_dumps(result), now, job_id) for job_id, result in results.items()]
+            )
+        return [{"id": row[0], "status": "succeeded" if row[0] in results else row[2], "created_at": now}
+                for row in rows]
+
+    def create_dag(self, dag_id: str, steps, now: float = None, owner: str = None) -> List[Dict[str, Any]]:
+        """
+        Insert a validated, acyclic DAG in one transaction. `steps` is a list
+        of (job_id, step_id, intake body, parent job_ids); steps without
+        parents are queued at once, the rest wait for their parents.
+        """
+        now = now or time()
+        conn = self.conn()
+        with conn:
+            created = self.insert_jobs(
+                conn, [(job_id, data) for job_id, _, data, _ in steps], now, owner,
+                steps={job_id: (dag_id, step_id, len(parents)) for job_id, step_id, _, parents in steps}
+            )
+            conn.executemany(
+                "INSERT INTO job_deps(parent_id, job_id) VALUES (?, ?)",
+                [(parent, job_id) for job_id, _, _, parents in steps for parent in parents]
+            )
+        return created
+
+    def dag_status(self, dag_id: str, owner: str = None) -> List[Dict[str, Any]]:
+        """Status of every step of a DAG, in submission order"""
+        cur = self.conn().execute(
+            f"""
+            SELECT step_id, {_STATUS_COLUMNS} FROM jobs
+            WHERE dag_id = ? AND owner IS ? ORDER BY rowid
+            """,
+            (dag_id, owner)
+        )
+        steps = []
+        for row in cur.fetchall():
+            step = _status_row(row[1:])
+            step["step_id"] = row[0]
+            steps.append(step)
+        return self._restore_results(steps)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        conn = self.conn()
+        job = row_to_job(conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone())
+        if job and job["archived_at"] is not None:
+            archived = self._load_archived([job_id]).get(job_id)
+            if archived:
+                job["input"], job["result"] = archived
+        elif job:
+            job["input"] = self._load_inputs(conn, [job_id]).get(job_id)
+        return job
+
+    @staticmethod
+    def _load_inputs(conn: sqlite3.Connection, job_ids: List[str]) -> Dict[str, Any]:
+        """Intake bodies of live jobs, payloads restored from their blobs"""
+        rows = []
+        for i in range(0, len(job_ids), _MAX_PARAMS):
+            chunk = job_ids[i:i + _MAX_PARAMS]
+            rows.extend(conn.execute(
+                f"SELECT job_id, body, payload_hash FROM job_inputs WHERE job_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall())
+        payloads = load_blobs(conn, [h for _, _, h in rows if h])
+        return {job_id: _with_payload(_loads(body), h, payloads) for job_id, body, h in rows}
+
+    def _load_archived(self, job_ids: List[str], inputs: bool = True) -> Dict[str, tuple]:
+        """Decompressed (input, result) for archived jobs; input is None unless `inputs`"""
+        loaded = {}
+        conn = self.conn()
+        columns = "id, input, result, payload_hash" if inputs else "id, NULL, result, NULL"
+        for i in range(0, len(job_ids), _MAX_PARAMS):
+            chunk = job_ids[i:i + _MAX_PARAMS]
+            rows = conn.execute(
+                f"SELECT {columns} FROM jobs_archive WHERE id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            payloads = load_blobs(conn, [h for _, _, _, h in rows if h])
+            for id_, input_, result, payload_hash in rows:
+                loaded[id_] = (_with_payload(_decompress(input_), payload_hash, payloads), _decompress(result))
+        return loaded
+
+    def _restore_results(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fill in results of archived jobs in a status listing"""
+        archived_ids = [j["job_id"] for j in jobs if j.pop("archived", False)]
+        if archived_ids:
+            loaded = self._load_archived(archived_ids, inputs=False)
+            for job in jobs:
+                if job["job_id"] in loaded:
+                    job["result"] = loaded[job["job_id"]][1]
+        return jobs
+
+    def idempotent_response(self, owner: str, key: str, window: float) -> Optional[Tuple[Dict[str, Any], int, float]]:
+        """
+        (response, status code, seconds left in the window) stored for a live
+        Idempotency-Key, if any
+        """
+        now = time()
+        row = self.conn().execute(
+            "SELECT response, status_code, created_at FROM idempotency_keys WHERE owner=? AND key=? AND created_at >= ?",
+            (owner or "", key, now - window)
+        ).fetchone()
+        if not row:
+            return None
+        response, status_code, created_at = row
+        return _loads(response), status_code, created_at + window - now
+
+    def purge_idempotency_keys(self, cutoff: float) -> int:
+        conn = self.conn()
+        with conn:
+            cur = conn.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (cutoff,))
+        return cur.rowcount
+
+    def archive_expired(self, cutoff: float, chunk_size: int = 500) -> int:
+        """
+        Archive one chunk of finished jobs last updated before `cutoff`.
+
+        Input (from job_inputs) and result move, zlib-compressed, to
+        jobs_archive; a blob-stored payload only has its reference moved.
+        The hot row keeps its status stub. Returns the number archived
+        (0 when done).
+        """
+        conn = self.conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                """
+                SELECT j.id, i.body, i.payload_hash, j.result
+                FROM jobs AS j INDEXED BY idx_jobs_finished LEFT JOIN job_inputs AS i ON i.job_id = j.id
+                WHERE j.archived_at IS NULL AND j.status IN ('succeeded', 'failed', 'cancelled') AND j.updated_at < ?
+                ORDER BY j.updated_at LIMIT ?
+                """,
+                (cutoff, chunk_size)
+            ).fetchall()
+            if not rows:
+                return 0
+            now = time()
+            # Archive rows are inserted before the inputs are deleted, so a
+            # moved payload reference never drops its blob's count to zero
+            conn.executemany(
+                "INSERT OR REPLACE INTO jobs_archive(id, input, result, archived_at, payload_hash) VALUES (?,?,?,?,?)",
+                [(id_, _compress(body), _compress(result), now, payload_hash)
+                 for id_, body, payload_hash, result in rows]
+            )
+            conn.executemany(
+                "UPDATE jobs SET archived_at=?, result=NULL WHERE id=?",
+                [(now, row[0]) for row in rows]
+            )
+            conn.executemany("DELETE FROM job_inputs WHERE job_id=?", [(row[0],) for row in rows])
+        return len(rows)
+
+    def status_many(self, job_ids: List[str], since: int = None) -> List[Dict[str, Any]]:
+        """
+        Public status fields for many jobs via primary-key lookups.
+        With `since`, only jobs whose change sequence is past that cursor.
+        """
+        jobs = []
+        conn = self.conn()
+        for i in range(0, len(job_ids), _MAX_PARAMS):
+            chunk = job_ids[i:i + _MAX_PARAMS]
+            sql = f"SELECT {_STATUS_COLUMNS} FROM jobs WHERE id IN ({','.join('?' * len(chunk))})"
+            params = list(chunk)
+            if since is not None:
+                sql += " AND seq > ?"
+                params.append(since)
+            jobs.extend(_status_row(r) for r in conn.execute(sql, params))
+        return self._restore_results(jobs)
+
+    def changes_since(self, owner: str, cursor: int = 0, limit: int = 1000) -> List[Dict[str, Any]]:
+        """An owner's jobs changed after `cursor`, in change order"""
+        cur = self.conn().execute(
+            f"SELECT {_STATUS_COLUMNS} FROM jobs WHERE owner IS ? AND seq > ? ORDER BY seq LIMIT ?",
+            (owner, cursor, limit)
+        )
+        return self._restore_results([_status_row(r) for r in cur.fetchall()])
+
+    def change_feed(self, cursor: int, limit: int = 1000) -> List[Dict[str, Any]]:
+        """All jobs changed after `cursor` (any owner), in change order"""
+        cur = self.conn().execute(
+            f"SELECT {_STATUS_COLUMNS}, owner FROM jobs WHERE seq > ? ORDER BY seq LIMIT ?",
+            (cursor, limit)
+        )
+        feed = []
+        for row in cur.fetchall():
+            job = _status_row(row[:-1])
+            job["owner"] = row[-1]
+            feed.append(job)
+        return self._restore_results(feed)
+
+    def current_seq(self) -> int:
+        row = self.conn().execute("SELECT value FROM job_seq WHERE id = 1").fetchone()
+        return row[0] if row else 0
+
+    def claim(self, worker_id: str, limit: int = 1, visibility_timeout: float = 30,
+              workflows=None) -> List[Dict[str, Any]]:
+        """
+        Lease up to `limit` queued jobs to `worker_id`.
+
+        Jobs are picked by the fair scheduler (priority weights, workflow
+        round-robin) under the write lock, then leased with one
+        UPDATE ... RETURNING, so concurrent claimers in any process never
+        receive the same job. Expired leases are re-queued first. Workflows
+        already running their max_concurrency are skipped.
+        """
+        if workflows is not None and not workflows:
+            return []
+        now = time()
+        self.promote_due(now)
+        self.requeue_expired(now)
+        caps = self.limits.concurrency_caps()
+
+        conn = self.conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            headroom = None
+            if caps:
+                running = self._running_by_workflow(conn, list(caps))
+                headroom = {wf: cap - running.get(wf, 0) for wf, cap in caps.items()}
+            picked = self._pick_ready(conn, limit, workflows, headroom)
+            if not picked:
+                return []
+            ids = [job_id for job_id, _, _ in picked]
+            # "+status" keeps this on the primary key rather than idx_jobs_status_created,
+            # which would make every claim walk the whole queued set
+            cur = conn.execute(
+                f"""
+                UPDATE jobs SET status='running', lease_owner=?, lease_expires_at=?,
+                                attempts=attempts+1, updated_at=?
+                WHERE id IN ({','.join('?' * len(ids))}) AND +status='queued'
+                RETURNING {_JOB_COLUMNS}, queued_at
+                """,
+                [worker_id, now + visibility_timeout, now, *ids]
+            )
+            rows = {r[0]: r for r in cur.fetchall()}
+            inputs = self._load_inputs(conn, list(rows))
+
+        jobs = []
+        for job_id, priority, _ in picked:
+            row = rows.get(job_id)
+            if row:
+                job = row_to_job(row[:-1])
+                job["input"] = inputs.get(job_id)
+                # Wait since the job last entered the queue, so retries, lease
+                # reclaims and replays don't count their earlier lifetime
+                queued_at = row[-1] if row[-1] is not None else max(job["created_at"], job["run_at"] or 0)
+                self.scheduler.record_wait(priority, now - queued_at)
+                jobs.append(job)
+        return jobs
+
+    def _pick_ready(self, conn: sqlite3.Connection, limit: int, workflows=None, headroom=None):
+        """
+        Choose up to `limit` queued jobs in fair-scheduling order.
+        `headroom` maps capped workflows to how many more may start.
+        """
+        picked = []
+        exhausted = set()
+        headroom = dict(headroom or {})
+        blocked = {wf for wf, n in headroom.items() if n <= 0}
+        wf_clause = ""
+        wf_params = []
+        if workflows is not None:
+            wf_clause = f" AND workflow IN ({','.join('?' * len(workflows))})"
+            wf_params = list(workflows)
+
+        while len(picked) < limit and len(exhausted) < len(PRIORITIES):
+            for priority in self.scheduler.class_order():
+                if priority in exhausted:
+                    continue
+                row = self._next_in_class(conn, priority, [p[0] for p in picked], wf_clause, wf_params, blocked)
+                if row is None:
+                    exhausted.add(priority)
+                    continue
+                job_id, workflow = row
+                if workflow in headroom:
+                    headroom[workflow] -= 1
+                    if headroom[workflow] <= 0:
+                        blocked.add(workflow)
+                self.scheduler.served(priority, workflow)
+                picked.append((job_id, priority, workflow))
+                break
+        return picked
+
+    def _next_in_class(self, conn, priority: str, skip_ids, wf_clause: str, wf_params, blocked=()):
+        """
+        Oldest job of the next workflow after this class's cursor (wrapping
+        around). Blocked workflows are stepped over with one index seek each
+        rather than scanning their backlog.
+        """
+        skip_clause = f" AND id NOT IN ({','.join('?' * len(skip_ids))})" if skip_ids else ""
+        sql = (
+            "SELECT id, workflow FROM jobs"
+            " WHERE status='queued' AND priority=? AND workflow > ?" + wf_clause + skip_clause +
+            " ORDER BY workflow, created_at LIMIT 1"
+        )
+        prio = PRIORITIES[priority]
+        cursor = self.scheduler.cursor(priority)
+        after, wrapped = cursor, False
+        while True:
+            row = conn.execute(sql, [prio, after, *wf_params, *skip_ids]).fetchone()
+            if row is None:
+                if wrapped or not cursor:
+                    return None
+                after, wrapped = "", True
+                continue
+            if wrapped and row[1] > cursor:
+                return None
+            if row[1] not in blocked:
+                return row
+            after = row[1]
+
+    @staticmethod
+    def _running_by_workflow(conn: sqlite3.Connection, workflows: List[str]) -> Dict[str, int]:
+        """Trigger-maintained running counts; one primary-key read per workflow"""
+        running = {}
+        for i in range(0, len(workflows), _MAX_PARAMS):
+            chunk = workflows[i:i + _MAX_PARAMS]
+            running.update(conn.execute(
+                f"SELECT workflow, count FROM workflow_running WHERE workflow IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall())
+        return running
+
+    def limit_state(self) -> List[Dict[str, Any]]:
+        """Workflow limits with current running counts, for queue health; never scans jobs"""
+        caps = self.limits.all()
+        if not caps:
+            return []
+        running = self._running_by_workflow(self.conn(), [l["workflow"] for l in caps])
+        return self.limits.snapshot(running)
+
+    def heartbeat(self, job_id: str, worker_id: str, visibility_timeout: float = 30) -> bool:
+        """Extend a lease held by `worker_id`; False if the lease was lost"""
+        now = time()
+        conn = self.conn()
+        with conn:
+            cur = conn.execute(
+                """
+                UPDATE jobs SET lease_expires_at=?, updated_at=?
+                WHERE id=? AND status='running' AND lease_owner=?
+                """,
+                (now + visibility_timeout, now, job_id, worker_id)
+            )
+        return cur.rowcount > 0
+
+    def cancel(self, job_id: str, owner: str = None, reason: str = None) -> Optional[str]:
+        """
+        Cancel a scheduled, queued or running job owned by `owner`.
+
+        A primary-key update: the row leaves the ready index (and the running
+        count of its workflow) in O(log n). A running job also loses its lease,
+        so its worker's next heartbeat, complete or fail is refused. Returns
+        the status the job had (cancelled only if in CANCELLABLE_STATUSES),
+        or None if there is no such job.
+        """
+        now = time()
+        error = _dumps({"type": "Cancelled", "message": reason or "cancelled by client"})
+        conn = self.conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT status FROM jobs WHERE id=? AND owner IS ?", (job_id, owner)).fetchone()
+            if row is None:
+                return None
+            if row[0] in CANCELLABLE_STATUSES:
+                conn.execute(
+                    """
+                    UPDATE jobs SET status='cancelled', error=?, lease_owner=NULL, lease_expires_at=NULL,
+                                    updated_at=?
+                    WHERE id=?
+                    """,
+                    (error, now, job_id)
+                )
+        return row[0]
+
+    def promote_due(self, now: float = None, limit: int = 1000) -> int:
+        """Move delayed jobs whose run_at has passed into the queue"""
+        now = now or time()
+        conn = self.conn()
+        due = "status='scheduled' AND run_at <= ?"
+        # The planner prefers idx_jobs_status_created, which would walk every scheduled job
+        if conn.execute(f"SELECT 1 FROM jobs INDEXED BY idx_jobs_scheduled WHERE {due} LIMIT 1",
+                        (now,)).fetchone() is None:
+            return 0
+        with conn:
+            cur = conn.execute(
+                f"""
+                UPDATE jobs SET status='queued', updated_at=?
+                WHERE id IN (SELECT id FROM jobs INDEXED BY idx_jobs_scheduled WHERE {due} ORDER BY run_at LIMIT ?)
+                """,
+                (now, now, limit)
+            )
+        return cur.rowcount
+
+    def next_scheduled_at(self) -> Optional[float]:
+        return self.conn().execute(
+            "SELECT MIN(run_at) FROM jobs INDEXED BY idx_jobs_scheduled WHERE status='scheduled'"
+        ).fetchone()[0]
+
+    def requeue_expired(self, now: float = None) -> int:
+        """
+        Return jobs whose lease has lapsed to the queue; jobs that already
+        used JOB_MAX_ATTEMPTS go to the dead-letter store instead.
+        """
+        now = now or time()
+        conn = self.conn()
+        expired = "status='running' AND lease_expires_at < ?"
+        if conn.execute(f"SELECT 1 FROM jobs WHERE {expired} LIMIT 1", (now,)).fetchone() is None:
+            return 0
+        error = _dumps({"type": "LeaseExpired", "message": "worker lease expired"})
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                f"""
+                INSERT OR REPLACE INTO dead_letters(job_id, workflow, reason, error_class, attempts, last_error, failed_at)
+                SELECT id, workflow, 'lease_expired', 'LeaseExpired', attempts, ?, ?
+                FROM jobs WHERE {expired} AND attempts >= ?
+                """,
+                (error, now, now, JOB_MAX_ATTEMPTS)
+            )
+            dead = conn.execute(
+                f"""
+                UPDATE jobs SET status='failed', error=?, lease_owner=NULL, lease_expires_at=NULL, updated_at=?
+                WHERE {expired} AND attempts >= ?
+                """,
+                (error, now, now, JOB_MAX_ATTEMPTS)
+            ).rowcount
+            requeued = conn.execute(
+                f"""
+                UPDATE jobs SET status='queued', lease_owner=NULL, lease_expires_at=NULL, updated_at=?
+                WHERE {expired}
+                """,
+                (now, now)
+            ).rowcount
+        if requeued or dead:
+            log.warning(f"Expired leases: {requeued} re-queued, {dead} dead-lettered")
+        return requeued + dead
+
+    def complete(self, job_id: str, result: Any, worker_id: str = None) -> bool:
+        """
+        Mark a job succeeded. With `worker_id`, only the current lease holder
+        may complete it. Returns False if the job (or lease) does not exist.
+        """
+        where = "id=?"
+        params = [_dumps(result), time(), job_id]
+        if worker_id is not None:
+            where += " AND status='running' AND lease_owner=?"
+            params.append(worker_id)
+        conn = self.conn()
+        with conn:
+            cur = conn.execute(
+                f"""
+                UPDATE jobs SET status='succeeded', result=?, updated_at=?,
+                                lease_owner=NULL, lease_expires_at=NULL
+                WHERE {where}
+                """,
+                params
+            )
+        return cur.rowcount > 0
+
+    def fail(self, job_id: str, error: Any, worker_id: str = None, error_class: str = None,
+             retry: bool = True) -> Optional[str]:
+        """
+        Record a failed attempt (same lease rules as complete()).
+
+        The job is re-queued while it has attempts left; otherwise it is marked
+        failed and moved to the dead-letter store. Returns the resulting status
+        ('queued' or 'failed'), or None if the job (or lease) does not exist.
+        """
+        if error_class is None:
+            error_class = error.get("type") if isinstance(error, dict) else None
+        now = time()
+        conn = self.conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            where = "id=?"
+            params = [job_id]
+            if worker_id is not None:
+                where += " AND status='running' AND lease_owner=?"
+                params.append(worker_id)
+            row = conn.execute(f"SELECT workflow, attempts FROM jobs WHERE {where}", params).fetchone()
+            if row is None:
+                return None
+            workflow, attempts = row
+            status = "queued" if retry and attempts < JOB_MAX_ATTEMPTS else "failed"
+            conn.execute(
+                """
+                UPDATE jobs SET status=?, error=?, updated_at=?, lease_owner=NULL, lease_expires_at=NULL
+                WHERE id=?
+                """,
+                (status, _dumps(error), now, job_id)
+            )
+            if status == "failed":
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO dead_letters(job_id, workflow, reason, error_class, attempts, last_error, failed_at)
+                    VALUES (?,?,?,?,?,?,?)
+                    """,
+                    (job_id, workflow, "max_attempts" if retry else "failed", error_class or "Error",
+                     attempts, _dumps(error), now)
+                )
+        return status
+
+    def dead_letters(self, workflow: str = None, error_class: str = None, since: float = None,
+                     until: float = None, limit: int = 100) -> List[Dict[str, Any]]:
+        where, params = self._dead_letter_filter(workflow, error_class, since, until)
+        cur = self.conn().execute(
+            f"""
+            SELECT job_id, workflow, reason, error_class, attempts, last_error, failed_at
+            FROM dead_letters WHERE {where} ORDER BY failed_at DESC LIMIT ?
+            """,
+            params + [limit]
+        )
+        cols = ("job_id", "workflow", "reason", "error_class", "attempts", "last_error", "failed_at")
+        rows = [dict(zip(cols, r)) for r in cur.fetchall()]
+        for r in rows:
+            r["last_error"] = _loads(r["last_error"])
+        return rows
+
+    def dead_letter_count(self, workflow: str = None, error_class: str = None,
+                          since: float = None, until: float = None) -> int:
+        where, params = self._dead_letter_filter(workflow, error_class, since, until)
+        return self.conn().execute(f"SELECT COUNT(*) FROM dead_letters WHERE {where}", params).fetchone()[0]
+
+    def replay_dead_letters(self, workflow: str = None, error_class: str = None, since: float = None,
+                            until: float = None, chunk_size: int = 500, max_jobs: int = None) -> int:
+        """
+        Re-queue dead-lettered jobs matching the filters with a fresh attempt
+        budget, one chunk per transaction. Jobs archived since they failed get
+        their input back from jobs_archive first. Returns the number replayed.
+        """
+        where, params = self._dead_letter_filter(workflow, error_class, since, until)
+        total = 0
+        conn = self.conn()
+        while max_jobs is None or total < max_jobs:
+            limit = chunk_size if max_jobs is None else min(chunk_size, max_jobs - total)
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                ids = [r[0] for r in conn.execute(
+                    f"SELECT job_id FROM dead_letters WHERE {where} ORDER BY failed_at LIMIT ?",
+                    params + [limit]
+                )]
+                if not ids:
+                    break
+                marks = ",".join("?" * len(ids))
+                now = time()
+                self._unarchive(conn, ids)
+                conn.execute(
+                    f"""
+                    UPDATE jobs SET status='queued', attempts=0, error=NULL, lease_owner=NULL,
+                                    lease_expires_at=NULL, updated_at=?
+                    WHERE id IN ({marks}) AND +status='failed'
+                    """,
+                    [now, *ids]
+                )
+                conn.execute(f"DELETE FROM dead_letters WHERE job_id IN ({marks})", ids)
+            total += len(ids)
+            if len(ids) < limit:
+                break
+        if total:
+            log.info(f"Replayed {total} dead-lettered jobs")
+        return total
+
+    @staticmethod
+    def _unarchive(conn: sqlite3.Connection, job_ids: List[str]):
+        """
+        Move archived failed jobs among `job_ids` back to the live layout
+        (inputs in job_inputs, archived_at cleared) inside the caller's
+        transaction, so the replay's status change is seen by the change
+        feed and workers get the input. The input row is written before the
+        archive row is deleted, so a blob reference never drops to zero.
+        """
+        marks = ",".join("?" * len(job_ids))
+        rows = conn.execute(
+            f"""
+            SELECT a.id, a.input, a.payload_hash FROM jobs_archive AS a JOIN jobs AS j ON j.id = a.id
+            WHERE a.id IN ({marks}) AND j.archived_at IS NOT NULL AND +j.status = 'failed'
+            """,
+            job_ids
+        ).fetchall()
+        if not rows:
+            return
+        conn.executemany(
+            "INSERT OR REPLACE INTO job_inputs(job_id, body, payload_hash) VALUES (?,?,?)",
+            [(id_, "null" if input_ is None else zlib.decompress(input_).decode(), payload_hash)
+             for id_, input_, payload_hash in rows]
+        )
+        restored = [(row[0],) for row in rows]
+        conn.executemany("UPDATE jobs SET archived_at=NULL WHERE id=?", restored)
+        conn.executemany("DELETE FROM jobs_archive WHERE id=?", restored)
+
+    @staticmethod
+    def _dead_letter_filter(workflow, error_class, since, until):
+        clauses, params = ["1=1"], []
+        if workflow:
+            clauses.append("workflow = ?")
+            params.append(workflow)
+        if error_class:
+            clauses.append("error_class = ?")
+            params.append(error_class)
+        if since is not None:
+            clauses.append("failed_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("failed_at < ?")
+            params.append(until)
+        return " AND ".join(clauses), params
+
+    def count_by_status(self) -> Dict[str, int]:
+        """Trigger-maintained counts; reads one row per status"""
+        counts = {s: 0 for s in JOB_STATUSES}
+        cur = self.conn().execute("SELECT status, count FROM job_counters")
+        for status, count in cur.fetchall():
+            counts[status] = count
+        return counts
+
+    def queue_stats(self, now: float = None) -> Dict[str, Any]:
+        """
+        Counts, oldest queued age (since queued_at) and enqueue/dequeue rates.
+        Every read is a primary-key or index-edge lookup, independent of
+        table size.
+        """
+        now = now or time()
+        conn = self.conn()
+        # Pinned: the planner prefers idx_jobs_status_created, which would walk every queued job
+        oldest = conn.execute(
+            "SELECT MIN(queued_at) FROM jobs INDEXED BY idx_jobs_queued_at WHERE status='queued'"
+        ).fetchone()[0]
+
+        # Sliding 60s estimate: the previous minute weighted by the part of it
+        # still inside the window, plus everything so far this minute
+        minute = int(now // 60)
+        weight = 1.0 - (now % 60) / 60.0
+        rates = {minute - 1: (0, 0), minute: (0, 0)}
+        for m, enq, deq in conn.execute(
+            "SELECT minute, enqueued, dequeued FROM job_rates WHERE minute IN (?, ?)", (minute - 1, minute)
+        ):
+            rates[m] = (enq, deq)
+        return {
+            "counts": self.count_by_status(),
+            "oldest_queued_age_seconds": round(now - oldest, 3) if oldest else 0.0,
+            "enqueued_per_min": round(rates[minute - 1][0] * weight + rates[minute][0], 1),
+            "dequeued_per_min": round(rates[minute - 1][1] * weight + rates[minute][1], 1),
+        }
+
+    def prune_rates(self, keep_minutes: int = 1440) -> int:
+        conn = self.conn()
+        with conn:
+            cur = conn.execute("DELETE FROM job_rates WHERE minute < ?", (int(time() // 60) - keep_minutes,))
+        return cur.rowcount
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_job_store(db_path: str = None) -> JobStore:
+    """Singleton job store bound to SQLITE_PATH"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = JobStore(db_path or SQLITE_PATH)
+    return _store
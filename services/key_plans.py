@@ -0,0 +1,123 @@
+"""
+Per-API-key plans and request budgets.
+
+Every API key is on one of the plan tiers sold through Stripe
+(scripts/create_stripe_prices.py): Starter (£19/mo) or Pro (£49/mo). The plan
+sets the key's request budget per minute, which throttle() in run.py enforces
+as a bucket of its own, so customers behind one NAT no longer share the
+per-IP budget and a heavy key only throttles itself.
+
+Assignments are rows of api_key_plans (API_KEY_PLANS_SCHEMA in
+services/job_store.py), keyed by the same sha256 tag as the job owner, so raw
+keys are never stored. Keys without a row fall back to API_KEY_PLANS
+("key:plan,...") and then to API_KEY_PLAN_DEFAULT. Each process caches lookups
+for API_KEY_PLAN_CACHE_TTL seconds: a known key costs no database read, and a
+change made through another worker takes effect within that time.
+"""
+import os
+import hashlib
+import logging
+from time import time
+from typing import Dict, Any, List, Optional
+
+from services.cache import StripedLRUCache
+
+log = logging.getLogger("levqor.key_plans")
+
+# Requests per minute for each plan tier
+PLAN_RATE_LIMITS = {
+    "starter": int(os.environ.get("PLAN_RATE_STARTER", 60)),
+    "pro": int(os.environ.get("PLAN_RATE_PRO", 300)),
+}
+API_KEY_PLAN_DEFAULT = os.environ.get("API_KEY_PLAN_DEFAULT", "starter")
+API_KEY_PLAN_CACHE_TTL = float(os.environ.get("API_KEY_PLAN_CACHE_TTL", 30))
+
+if API_KEY_PLAN_DEFAULT not in PLAN_RATE_LIMITS:
+    log.warning(f"Unknown API_KEY_PLAN_DEFAULT={API_KEY_PLAN_DEFAULT}, using starter")
+    API_KEY_PLAN_DEFAULT = "starter"
+
+# Price ids printed by scripts/create_stripe_prices.py, monthly and yearly
+_PLAN_PRICE_ENV = {
+    "starter": ("STRIPE_PRICE_STARTER", "STRIPE_PRICE_STARTER_YEAR"),
+    "pro": ("STRIPE_PRICE_PRO", "STRIPE_PRICE_PRO_YEAR"),
+}
+
+
+def key_tag(key: str) -> str:
+    """Stable, non-reversible tag for an API key"""
+    return hashlib.sha256((key or "").encode()).hexdigest()[:16]
+
+
+def plan_for_price(price_id: str) -> Optional[str]:
+    """Plan sold under a Stripe price id, None if it is not one of ours"""
+    for plan, names in _PLAN_PRICE_ENV.items():
+        if price_id and price_id in (os.environ.get(name) for name in names):
+            return plan
+    return None
+
+
+def _configured_plans() -> Dict[str, str]:
+    plans = {}
+    for entry in (os.environ.get("API_KEY_PLANS") or "").split(","):
+        key, _, plan = entry.strip().rpartition(":")
+        if not key:
+            continue
+        if plan not in PLAN_RATE_LIMITS:
+            log.warning(f"Ignoring API_KEY_PLANS entry with unknown plan {plan!r}")
+            continue
+        plans[key_tag(key)] = plan
+    return plans
+
+
+class KeyPlans:
+    def __init__(self, store, ttl: float = API_KEY_PLAN_CACHE_TTL, maxsize: int = 10000):
+        self.store = store
+        self._cache = StripedLRUCache(maxsize, ttl)
+        self._configured = _configured_plans()
+
+    def plan(self, tag: str) -> str:
+        plan = self._cache.get(tag)
+        if plan is None:
+            row = self.store.conn().execute("SELECT plan FROM api_key_plans WHERE key_tag=?", (tag,)).fetchone()
+            plan = row[0] if row else self._configured.get(tag, API_KEY_PLAN_DEFAULT)
+            if plan not in PLAN_RATE_LIMITS:
+                # A tier that has since been dropped from the configuration
+                plan = API_KEY_PLAN_DEFAULT
+            self._cache.set(tag, plan)
+        return plan
+
+    def rate_limit(self, tag: str) -> int:
+        """Requests per minute allowed to the key with this tag"""
+        return PLAN_RATE_LIMITS[self.plan(tag)]
+
+    def all(self) -> List[Dict[str, Any]]:
+        rows = self.store.conn().execute(
+            "SELECT key_tag, plan, updated_at FROM api_key_plans ORDER BY key_tag"
+        ).fetchall()
+        return [{"key_tag": tag, "plan": plan, "rate_per_min": PLAN_RATE_LIMITS.get(plan),
+                 "updated_at": updated_at} for tag, plan, updated_at in rows]
+
+    def set_plan(self, tag: str, plan: str) -> Dict[str, Any]:
+        """Put a key on a plan"""
+        if plan not in PLAN_RATE_LIMITS:
+            raise ValueError(f"unknown plan {plan!r}")
+        now = time()
+        conn = self.store.conn()
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO api_key_plans(key_tag, plan, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(key_tag) DO UPDATE SET plan=excluded.plan, updated_at=excluded.updated_at
+                """,
+                (tag, plan, now)
+            )
+        self._cache.pop(tag)
+        log.info(f"API key {tag} is on the {plan} plan")
+        return {"key_tag": tag, "plan": plan, "rate_per_min": PLAN_RATE_LIMITS[plan], "updated_at": now}
+
+    def remove(self, tag: str) -> bool:
+        conn = self.store.conn()
+        with conn:
+            cur = conn.execute("DELETE FROM api_key_plans WHERE key_tag=?", (tag,))
+        self._cache.pop(tag)
+        return cur.rowcount > 0
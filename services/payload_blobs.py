@@ -0,0 +1,123 @@
+"""
+Content-addressed payload blobs.
+
+Large payloads are often byte-identical across jobs from one producer. A
+payload whose JSON text is PAYLOAD_BLOB_MIN_BYTES or more is stored once in
+payload_blobs, keyed by the SHA-256 of that text and compressed with zstd when
+the zstandard package is installed (zlib otherwise). The job's job_inputs row
+keeps the rest of the intake body plus the hash. Reference counts are kept by
+triggers on job_inputs and jobs_archive (PAYLOAD_BLOB_SCHEMA in
+services/job_store.py), so a blob goes away in the same transaction as its last
+reference, and archiving a job moves its reference instead of copying the payload.
+"""
+import os
+import json
+import zlib
+import hashlib
+import threading
+import logging
+from time import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+log = logging.getLogger("levqor.payload_blobs")
+
+PAYLOAD_BLOB_MIN_BYTES = int(os.environ.get("PAYLOAD_BLOB_MIN_BYTES", 1024))
+PAYLOAD_CODEC = os.environ.get("PAYLOAD_CODEC", "zstd" if zstandard else "zlib")
+
+if PAYLOAD_CODEC == "zstd" and zstandard is None:
+    log.warning("PAYLOAD_CODEC=zstd but zstandard is not installed, using zlib")
+    PAYLOAD_CODEC = "zlib"
+
+# SQLite host-parameter limit is 999 on older builds
+_MAX_PARAMS = 900
+
+# zstd (de)compressor objects are not thread-safe
+_local = threading.local()
+
+
+def _zstd(kind: str):
+    codec = getattr(_local, kind, None)
+    if codec is None:
+        codec = zstandard.ZstdCompressor(level=3) if kind == "compressor" else zstandard.ZstdDecompressor()
+        setattr(_local, kind, codec)
+    return codec
+
+
+def compress(raw: bytes) -> Tuple[str, bytes]:
+    if PAYLOAD_CODEC == "zstd":
+        return "zstd", _zstd("compressor").compress(raw)
+    return "zlib", zlib.compress(raw, 6)
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("payload blob is zstd-compressed but zstandard is not installed")
+        return _zstd("decompressor").decompress(data)
+    return zlib.decompress(data)
+
+
+def split_payload(data: Dict[str, Any], raw=None) -> Tuple[Dict[str, Any], Optional[str], Optional[bytes]]:
+    """
+    (body, hash, payload JSON) for an intake body. `raw` is the payload's
+    JSON as received, when the caller has it; otherwise it is serialised
+    here. Payloads under PAYLOAD_BLOB_MIN_BYTES stay inline: body is
+    `data`, hash and JSON are None.
+    """
+    if "payload" not in data:
+        return data, None, None
+    if raw is None:
+        raw = json.dumps(data["payload"], separators=(",", ":")).encode()
+    if len(raw) < PAYLOAD_BLOB_MIN_BYTES:
+        return data, None, None
+    body = {k: v for k, v in data.items() if k != "payload"}
+    return body, hashlib.sha256(raw).hexdigest(), raw
+
+
+def store_blobs(conn, blobs: Dict[str, bytes], now: float = None):
+    """
+    Make sure every (hash -> payload JSON) blob exists, compressing only the
+    new ones. Runs in the caller's transaction, before the rows referencing them.
+    """
+    if not blobs:
+        return
+    hashes = list(blobs)
+    existing = set()
+    for i in range(0, len(hashes), _MAX_PARAMS):
+        chunk = hashes[i:i + _MAX_PARAMS]
+        existing.update(r[0] for r in conn.execute(
+            f"SELECT hash FROM payload_blobs WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+        ))
+    now = now or time()
+    rows = []
+    for digest, raw in blobs.items():
+        if digest not in existing:
+            codec, data = compress(raw)
+            rows.append((digest, codec, len(raw), now, data))
+    conn.executemany(
+        "INSERT INTO payload_blobs(hash, codec, size, created_at, data) VALUES (?,?,?,?,?) "
+        "ON CONFLICT(hash) DO NOTHING",
+        rows
+    )
+
+
+def load_blobs(conn, hashes: Iterable[str]) -> Dict[str, bytes]:
+    """
+    Payload JSON by hash. Each distinct blob is decompressed once; callers
+    parse per job so jobs sharing a blob never share a mutable payload.
+    """
+    hashes = list(set(hashes))
+    payloads = {}
+    for i in range(0, len(hashes), _MAX_PARAMS):
+        chunk = hashes[i:i + _MAX_PARAMS]
+        cur = conn.execute(
+            f"SELECT hash, codec, data FROM payload_blobs WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+        )
+        for digest, codec, data in cur.fetchall():
+            payloads[digest] = decompress(codec, data)
+    return payloads
@@ -0,0 +1,260 @@
+"""
+Request rate limiting - GCRA (generic cell rate algorithm).
+
+A key (client IP, or the service as a whole) allows `limit` requests per
+`window` seconds as a burst and refills smoothly at limit/window. Its entire
+state is one float, the theoretical arrival time (TAT): a request of cost c is
+admitted when max(TAT, now) + c*T - now <= window, with T = window/limit, and
+moves TAT there. Each check is O(1); no per-hit timestamps are kept.
+
+A key whose TAT has passed is back at full capacity, so dropping it changes
+nothing. Keys are kept in last-use order and every call evicts a few idle keys
+from the cold end; evict_idle(), run every RATE_LIMIT_EVICT_SECONDS by the
+app's scheduler (monitors/scheduler.py), clears the rest. Memory follows the
+keys active within the last window rather than every X-Forwarded-For value
+ever seen.
+
+Keys are spread over RATE_LIMIT_STRIPES stripes by hash, each with its own
+lock, last-use order and pending consumption, so request threads checking
+different clients never wait on each other. Only the "global" key is common
+to every request, and its critical section is a few float operations.
+
+SharedGCRALimiter keeps the same in-process fast path but shares budgets
+between processes (gunicorn workers) through a rate_limits table in SQLite:
+a key's shared TAT is read when the process first sees it, and consumption
+is flushed in one batched transaction every RATE_LIMIT_SYNC_INTERVAL seconds,
+which also brings back what other processes spent. A process that spends
+RATE_LIMIT_SYNC_SHARE of a key's budget between flushes flushes at once, so
+it can overrun a shared budget by roughly that share, not by a whole burst.
+"""
+import os
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict, namedtuple
+from time import time
+from typing import Dict, Hashable, List
+
+from services.db import get_pool
+
+log = logging.getLogger("levqor.rate_limiter")
+
+RATE_LIMIT_SYNC_INTERVAL = float(os.environ.get("RATE_LIMIT_SYNC_INTERVAL", 0.25))
+RATE_LIMIT_SYNC_SHARE = float(os.environ.get("RATE_LIMIT_SYNC_SHARE", 0.1))
+RATE_LIMIT_STRIPES = int(os.environ.get("RATE_LIMIT_STRIPES", 64))
+# Idle rows are deleted from rate_limits every this many seconds
+RATE_LIMIT_PRUNE_INTERVAL = float(os.environ.get("RATE_LIMIT_PRUNE_INTERVAL", 60))
+
+RATE_LIMIT_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS rate_limits(
+      key TEXT PRIMARY KEY,
+      tat REAL NOT NULL
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_rate_limits_tat ON rate_limits(tat)",
+]
+
+RateDecision = namedtuple("RateDecision", "allowed limit remaining reset_at retry_after")
+
+# Idle keys dropped per call; each key is evicted at most once per insert
+_EVICT_PER_CALL = 8
+
+
+class _Stripe:
+    """One lock's share of the keys"""
+    __slots__ = ("lock", "tat", "pending")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tat: "OrderedDict[Hashable, float]" = OrderedDict()
+        # key -> [seconds consumed since the last flush, time of the first of those hits]
+        # (SharedGCRALimiter only)
+        self.pending: Dict[Hashable, List[float]] = {}
+
+
+class GCRALimiter:
+    def __init__(self, limit: int, window: float = 60, stripes: int = RATE_LIMIT_STRIPES):
+        self.limit = limit
+        self.window = window
+        self._stripes = [_Stripe() for _ in range(max(1, stripes))]
+
+    def _stripe(self, key: Hashable) -> _Stripe:
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def hit(self, key: Hashable, cost: int = 1, now: float = None, limit: int = None) -> RateDecision:
+        """
+        Admit `cost` requests for `key` if its budget allows, consuming them.
+        `limit` overrides the default limit for this key. A rejected hit
+        leaves the key's state untouched.
+        """
+        now = time() if now is None else now
+        limit = limit or self.limit
+        interval = self.window / limit
+        stripe = self._stripe(key)
+        with stripe.lock:
+            self._evict(stripe, now, _EVICT_PER_CALL)
+            tat = max(stripe.tat.get(key, now), now)
+            new_tat = tat + interval * cost
+            if new_tat - now > self.window:
+                remaining = int((self.window - (tat - now)) / interval)
+                return RateDecision(False, limit, remaining, tat, new_tat - self.window - now)
+            stripe.tat[key] = new_tat
+            stripe.tat.move_to_end(key)
+            self._consumed(stripe, key, interval * cost, now)
+        remaining = int((self.window - (new_tat - now)) / interval + 1e-9)
+        return RateDecision(True, limit, remaining, new_tat, 0.0)
+
+    def refund(self, key: Hashable, cost: int = 1, limit: int = None):
+        """Give back `cost` requests taken by hit(), e.g. when a second limit rejected the request"""
+        interval = self.window / (limit or self.limit)
+        stripe = self._stripe(key)
+        with stripe.lock:
+            if key in stripe.tat:
+                stripe.tat[key] -= interval * cost
+                self._consumed(stripe, key, -interval * cost, None)
+
+    def _consumed(self, stripe: _Stripe, key: Hashable, seconds: float, now: float):
+        """Called under the stripe's lock whenever a key's TAT moves by `seconds`"""
+
+    @staticmethod
+    def _evict(stripe: _Stripe, now: float, max_keys: int) -> int:
+        evicted = 0
+        while stripe.tat and evicted < max_keys:
+            key, tat = next(iter(stripe.tat.items()))
+            if tat > now:
+                break
+            stripe.tat.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def evict_idle(self, now: float = None) -> int:
+        """Drop every key that is back at full capacity"""
+        now = time() if now is None else now
+        evicted = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                idle = [key for key, tat in stripe.tat.items() if tat <= now]
+                for key in idle:
+                    del stripe.tat[key]
+            evicted += len(idle)
+        return evicted
+
+    def __len__(self) -> int:
+        return sum(len(stripe.tat) for stripe in self._stripes)
+
+
+class SharedGCRALimiter(GCRALimiter):
+    """GCRALimiter whose budgets are shared by every process using the same SQLite file"""
+
+    def __init__(self, db_path: str, limit: int, window: float = 60,
+                 sync_interval: float = RATE_LIMIT_SYNC_INTERVAL, stripes: int = RATE_LIMIT_STRIPES):
+        super().__init__(limit, window, stripes)
+        self.db_path = db_path
+        self.sync_interval = sync_interval
+        self._pool = get_pool(db_path)
+        self._schema_ready = False
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pruned_at = 0.0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = self._pool.conn()
+        if not self._schema_ready:
+            with conn:
+                for stmt in RATE_LIMIT_SCHEMA:
+                    conn.execute(stmt)
+            self._schema_ready = True
+        return conn
+
+    def hit(self, key: str, cost: int = 1, now: float = None, limit: int = None) -> RateDecision:
+        now = time() if now is None else now
+        if self._thread is None:
+            self._start()
+        if key not in self._stripe(key).tat:
+            self._load(key, now)
+        return super().hit(key, cost, now, limit)
+
+    def _load(self, key: str, now: float):
+        """Adopt the shared TAT of a key this process has not seen recently"""
+        try:
+            row = self._conn().execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            log.warning(f"Rate limit lookup failed, using local state: {e}")
+            return
+        if row and row[0] > now:
+            stripe = self._stripe(key)
+            with stripe.lock:
+                stripe.tat.setdefault(key, row[0])
+
+    def _consumed(self, stripe: _Stripe, key: str, seconds: float, now: float):
+        entry = stripe.pending.get(key)
+        if entry is None:
+            entry = stripe.pending[key] = [seconds, now if now is not None else time()]
+        else:
+            entry[0] += seconds
+        if entry[0] >= self.window * RATE_LIMIT_SYNC_SHARE:
+            self._wake.set()
+
+    def _start(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sync_loop, name="rate-limit-sync", daemon=True)
+                self._thread.start()
+
+    def _sync_loop(self):
+        while True:
+            self._wake.wait(self.sync_interval)
+            self._wake.clear()
+            try:
+                self.sync()
+            except Exception as e:
+                log.warning(f"Rate limit sync failed: {e}")
+
+    def sync(self, now: float = None) -> int:
+        """
+        Flush consumption since the last sync in one transaction and adopt
+        the merged TATs. Returns the number of keys flushed.
+        """
+        now = time() if now is None else now
+        pending = {}
+        for stripe in self._stripes:
+            with stripe.lock:
+                if stripe.pending:
+                    pending.update(stripe.pending)
+                    stripe.pending = {}
+        if not pending:
+            return 0
+        merged = {}
+        conn = self._conn()
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for key, (seconds, since) in pending.items():
+                    merged[key] = conn.execute(
+                        """
+                        INSERT INTO rate_limits(key, tat) VALUES (:key, :since + :seconds)
+                        ON CONFLICT(key) DO UPDATE SET tat = MAX(tat, :since) + :seconds
+                        RETURNING tat
+                        """,
+                        {"key": key, "since": since, "seconds": seconds}
+                    ).fetchone()[0]
+                if now - self._pruned_at >= RATE_LIMIT_PRUNE_INTERVAL:
+                    conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,))
+                    self._pruned_at = now
+        except sqlite3.Error:
+            # Keep the consumption for the next attempt
+            for key, (seconds, since) in pending.items():
+                stripe = self._stripe(key)
+                with stripe.lock:
+                    self._consumed(stripe, key, seconds, since)
+            raise
+        for key, tat in merged.items():
+            stripe = self._stripe(key)
+            with stripe.lock:
+                # Hits admitted since the snapshot are still pending on top of the shared value
+                extra = stripe.pending.get(key, (0.0,))[0]
+                if key in stripe.tat or tat > now:
+                    stripe.tat[key] = tat + extra
+        return len(pending)
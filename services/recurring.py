@@ -0,0 +1,168 @@
+"""
+Recurring job submissions - cron schedules kept in SQLite.
+
+APScheduler's CronTrigger does the cron arithmetic, but customer schedules
+are not registered as APScheduler jobs: its job store keeps every job in
+memory in every process, which doesn't hold up at hundreds of thousands of
+schedules. Each schedule is a job_schedules row carrying its next fire time.
+A ticker (run_job_schedules in monitors/scheduler.py) claims due rows via
+the partial next_run_at index. In one transaction it inserts their jobs and
+advances next_run_at, so each fire yields exactly one job even when several
+processes tick at once. Fires missed while the service was down coalesce
+into a single run.
+"""
+import os
+import json
+import threading
+import logging
+from datetime import datetime, timezone as dt_timezone
+from time import time
+from uuid import uuid4
+from typing import Dict, Any, List, Optional
+
+from apscheduler.triggers.cron import CronTrigger
+
+from services.cache import LRUCache
+from services.job_store import JobStore, get_job_store
+
+log = logging.getLogger("levqor.recurring")
+
+SCHEDULE_FIRE_BATCH = int(os.environ.get("SCHEDULE_FIRE_BATCH", 500))
+MAX_SCHEDULES_PER_OWNER = int(os.environ.get("MAX_SCHEDULES_PER_OWNER", 1000))
+
+# Intake fields that describe the schedule rather than the job it submits
+SCHEDULE_FIELDS = ("cron", "timezone", "run_at")
+
+_SCHEDULE_COLUMNS = ("id", "workflow", "cron", "timezone", "enabled", "next_run_at",
+                     "last_run_at", "last_job_id", "runs", "created_at")
+
+# Parsed triggers, shared by every schedule with the same expression
+_triggers = LRUCache(maxsize=4096)
+
+
+class ScheduleLimitExceeded(Exception):
+    """Owner already has MAX_SCHEDULES_PER_OWNER schedules"""
+
+
+def cron_trigger(expr: str, tz: str = "UTC") -> CronTrigger:
+    """Parse a 5-field crontab expression; raises ValueError if invalid"""
+    trigger = _triggers.get((expr, tz))
+    if trigger is None:
+        try:
+            trigger = CronTrigger.from_crontab(expr, timezone=tz)
+        except Exception as e:
+            raise ValueError(f"invalid cron expression or timezone: {e}") from e
+        _triggers.set((expr, tz), trigger)
+    return trigger
+
+
+def next_fire(expr: str, tz: str, after: float) -> Optional[float]:
+    """First fire time at or after `after` (unix seconds), None if it never fires"""
+    fire_at = cron_trigger(expr, tz).get_next_fire_time(None, datetime.fromtimestamp(after, dt_timezone.utc))
+    return fire_at.timestamp() if fire_at else None
+
+
+class RecurringSchedules:
+    def __init__(self, store: JobStore):
+        self.store = store
+
+    def create(self, owner: str, data: Dict[str, Any], now: float = None) -> Dict[str, Any]:
+        """
+        Store a schedule from a validated intake body with a `cron` field.
+        An optional run_at delays the first fire.
+        """
+        now = now or time()
+        tz = data.get("timezone", "UTC")
+        first = next_fire(data["cron"], tz, max(now, data.get("run_at") or now))
+        if first is None:
+            raise ValueError("cron expression never fires")
+        template = {k: v for k, v in data.items() if k not in SCHEDULE_FIELDS}
+        schedule_id = uuid4().hex
+
+        conn = self.store.conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            count = conn.execute("SELECT COUNT(*) FROM job_schedules WHERE owner IS ?", (owner,)).fetchone()[0]
+            if count >= MAX_SCHEDULES_PER_OWNER:
+                raise ScheduleLimitExceeded(owner)
+            conn.execute(
+                """
+                INSERT INTO job_schedules(id, owner, workflow, cron, timezone, template, next_run_at, created_at)
+                VALUES (?,?,?,?,?,?,?,?)
+                """,
+                (schedule_id, owner, data["workflow"], data["cron"], tz,
+                 json.dumps(template, separators=(",", ":")), first, now)
+            )
+        return {"schedule_id": schedule_id, "status": "scheduled", "cron": data["cron"],
+                "timezone": tz, "next_run_at": first}
+
+    def list(self, owner: str, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self.store.conn().execute(
+            f"SELECT {', '.join(_SCHEDULE_COLUMNS)} FROM job_schedules WHERE owner IS ? ORDER BY created_at LIMIT ?",
+            (owner, limit)
+        ).fetchall()
+        schedules = [dict(zip(_SCHEDULE_COLUMNS, r)) for r in rows]
+        for s in schedules:
+            s["enabled"] = bool(s["enabled"])
+        return schedules
+
+    def delete(self, owner: str, schedule_id: str) -> bool:
+        conn = self.store.conn()
+        with conn:
+            cur = conn.execute("DELETE FROM job_schedules WHERE id=? AND owner IS ?", (schedule_id, owner))
+        return cur.rowcount > 0
+
+    def fire_due(self, now: float = None, limit: int = SCHEDULE_FIRE_BATCH) -> int:
+        """Submit one job for each due schedule (up to `limit`) and advance it"""
+        now = now or time()
+        conn = self.store.conn()
+        due_clause = "enabled = 1 AND next_run_at <= ?"
+        if conn.execute(f"SELECT 1 FROM job_schedules WHERE {due_clause} LIMIT 1", (now,)).fetchone() is None:
+            return 0
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            due = conn.execute(
+                f"SELECT id, owner, cron, timezone, template FROM job_schedules WHERE {due_clause} "
+                "ORDER BY next_run_at LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            updates = []
+            for schedule_id, owner, cron, tz, template in due:
+                job_id = uuid4().hex
+                self.store.insert_jobs(conn, [(job_id, json.loads(template))], now, owner)
+                try:
+                    next_at = next_fire(cron, tz, now + 1)
+                except ValueError as e:
+                    log.warning(f"Disabling schedule {schedule_id}: {e}")
+                    next_at = None
+                updates.append((next_at, 1 if next_at else 0, now, job_id, schedule_id))
+            conn.executemany(
+                """
+                UPDATE job_schedules SET next_run_at=?, enabled=?, last_run_at=?, last_job_id=?, runs=runs+1
+                WHERE id=?
+                """,
+                updates
+            )
+        return len(due)
+
+    def stats(self) -> Dict[str, Any]:
+        """Trigger-maintained active count and the next fire time (an index-edge read)"""
+        conn = self.store.conn()
+        active = conn.execute("SELECT active FROM job_schedule_count WHERE id = 1").fetchone()[0]
+        next_run_at = conn.execute(
+            "SELECT MIN(next_run_at) FROM job_schedules INDEXED BY idx_schedules_due WHERE enabled = 1"
+        ).fetchone()[0]
+        return {"active": active, "next_run_at": next_run_at}
+
+
+_schedules = None
+_schedules_lock = threading.Lock()
+
+def get_recurring_schedules() -> RecurringSchedules:
+    """Singleton schedule store bound to the job store"""
+    global _schedules
+    if _schedules is None:
+        with _schedules_lock:
+            if _schedules is None:
+                _schedules = RecurringSchedules(get_job_store())
+    return _schedules
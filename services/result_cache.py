@@ -0,0 +1,127 @@
+"""
+Result memoization for deterministic workflows.
+
+Submissions with "memoize": true are keyed by a canonical hash of
+(API key owner, workflow, payload). When such a job succeeds, a jobs-table
+trigger (see RESULT_CACHE_SCHEMA in services/job_store.py) copies its result
+into result_cache in the same transaction; a later submission with the same
+key is created already succeeded, without touching the queue or a worker.
+
+Lookups go through a per-process LRU (RESULT_CACHE_SIZE entries) in front of
+the shared table, and a table read is a plain SELECT, so memoized intake
+never takes the write lock. Hits are remembered in memory and their used_at
+bumps written in one batch, by the archival job just before it trims the
+table (expired entries first, then least recently used ones beyond
+RESULT_CACHE_MAX_ENTRIES), or once RESULT_CACHE_USED_BATCH keys are pending.
+Keys include the owner so cached results never cross API keys.
+"""
+import os
+import json
+import hashlib
+import threading
+import logging
+from time import time
+from typing import Any, Dict, Optional, Tuple
+
+from services.cache import StripedLRUCache
+
+log = logging.getLogger("levqor.result_cache")
+
+RESULT_CACHE_TTL = int(os.environ.get("RESULT_CACHE_TTL", 3600))
+RESULT_CACHE_MAX_TTL = int(os.environ.get("RESULT_CACHE_MAX_TTL", 7 * 86400))
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", 10000))
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 100000))
+RESULT_CACHE_USED_BATCH = int(os.environ.get("RESULT_CACHE_USED_BATCH", 1000))
+
+_MISSING = object()
+
+
+def memo_key(owner: Optional[str], workflow: str, payload: Any) -> str:
+    """Canonical hash: key order and whitespace in the payload don't matter"""
+    canonical = json.dumps([owner or "", workflow, payload], sort_keys=True,
+                           separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def memo_ttl(data: Dict[str, Any]) -> float:
+    return min(data.get("memoize_ttl", RESULT_CACHE_TTL), RESULT_CACHE_MAX_TTL)
+
+
+class ResultCache:
+    def __init__(self, store, maxsize: int = RESULT_CACHE_SIZE):
+        self.store = store
+        self._memory = StripedLRUCache(maxsize)
+        self._lock = threading.Lock()
+        # key -> time of its latest hit not yet written to result_cache.used_at
+        self._used: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key: str) -> Tuple[bool, Any]:
+        """(True, result) for a live cached result, else (False, None)"""
+        now = time()
+        result = self._memory.get(key, _MISSING)
+        if result is _MISSING:
+            result = self._load(key, now)
+        with self._lock:
+            if result is _MISSING:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            self._used[key] = now
+            flush = len(self._used) >= RESULT_CACHE_USED_BATCH
+        if flush:
+            self.flush_used()
+        return True, result
+
+    def _load(self, key: str, now: float) -> Any:
+        row = self.store.conn().execute(
+            "SELECT result, expires_at FROM result_cache WHERE key=? AND expires_at > ?",
+            (key, now)
+        ).fetchone()
+        if row is None:
+            return _MISSING
+        result = json.loads(row[0]) if row[0] is not None else None
+        self._memory.set(key, result, ttl=row[1] - now)
+        return result
+
+    def flush_used(self) -> int:
+        """Write pending hit times to used_at in one transaction"""
+        with self._lock:
+            used, self._used = self._used, {}
+        if not used:
+            return 0
+        conn = self.store.conn()
+        with conn:
+            conn.executemany(
+                "UPDATE result_cache SET used_at=MAX(used_at, ?) WHERE key=?",
+                [(at, key) for key, at in used.items()]
+            )
+        return len(used)
+
+    def prune(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES) -> int:
+        """Drop expired entries, then the least recently used beyond max_entries"""
+        self.flush_used()
+        conn = self.store.conn()
+        with conn:
+            removed = conn.execute("DELETE FROM result_cache WHERE expires_at <= ?", (time(),)).rowcount
+            excess = conn.execute("SELECT COUNT(*) FROM result_cache").fetchone()[0] - max_entries
+            if excess > 0:
+                removed += conn.execute(
+                    "DELETE FROM result_cache WHERE key IN (SELECT key FROM result_cache ORDER BY used_at LIMIT ?)",
+                    (excess,)
+                ).rowcount
+        if removed:
+            log.info(f"Result cache: pruned {removed} entries")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "memory": self._memory.stats(),
+        }
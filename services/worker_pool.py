@@ -0,0 +1,187 @@
+"""
+In-process worker pool - drains the job store through lease-based claims.
+
+Pool size follows WORKER_COUNT in config/flags.json (written by the
+autoscaler), re-read every POOL_RESIZE_INTERVAL seconds. Only workflows with
+a registered handler are claimed; everything else is left for external
+workers using the /api/v1/worker/* API.
+
+Cancellation is cooperative: each job dict carries a threading.Event under
+"cancelled" that handlers should check between units of work. When a job is
+cancelled (seen within CANCEL_POLL_INTERVAL, or at once for cancels made in
+this process) the event is set and its slot is handed to a fresh thread
+straight away. The old thread exits once the handler returns, so a runaway
+handler stops holding pool capacity.
+"""
+import os
+import socket
+import threading
+import logging
+from time import time, sleep
+from typing import Callable, Dict, Any
+
+from services.job_store import JobStore, get_job_store
+
+log = logging.getLogger("levqor.workers")
+
+VISIBILITY_TIMEOUT = float(os.environ.get("JOB_VISIBILITY_TIMEOUT", 30))
+POLL_INTERVAL = float(os.environ.get("WORKER_POLL_INTERVAL", 1.0))
+POOL_RESIZE_INTERVAL = float(os.environ.get("POOL_RESIZE_INTERVAL", 30))
+CANCEL_POLL_INTERVAL = float(os.environ.get("CANCEL_POLL_INTERVAL", 1.0))
+
+HANDLERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+
+
+def register_handler(workflow: str):
+    """Decorator registering the function that executes `workflow` jobs"""
+    def decorator(fn):
+        HANDLERS[workflow] = fn
+        return fn
+    return decorator
+
+
+def configured_worker_count() -> int:
+    """Worker count chosen by the autoscaler (config/flags.json)"""
+    from monitors.autoscale import get_controller
+    return max(1, int(get_controller().get_current_worker_count()))
+
+
+class WorkerPool:
+    def __init__(self, store: JobStore):
+        self.store = store
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._slots: Dict[int, threading.Thread] = {}
+        self._generation = 0
+        # job_id -> (worker_id, slot, cancel event)
+        self._inflight: Dict[str, tuple] = {}
+        self._inflight_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._target = 0
+
+    def start(self):
+        if not HANDLERS:
+            log.info("No workflow handlers registered, worker pool not started")
+            return
+        threading.Thread(target=self._supervise, name="worker-supervisor", daemon=True).start()
+        threading.Thread(target=self._monitor_loop, name="worker-monitor", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _supervise(self):
+        """Grow or shrink the pool to match WORKER_COUNT"""
+        while not self._stop.is_set():
+            try:
+                target = configured_worker_count()
+            except Exception as e:
+                log.warning(f"Failed to read worker count: {e}")
+                target = self._target or 1
+            if target != self._target:
+                log.info(f"Resizing worker pool {self._target} -> {target}")
+                self._target = target
+            with self._inflight_lock:
+                for n in range(self._target):
+                    t = self._slots.get(n)
+                    if t is None or not t.is_alive():
+                        self._start_slot(n)
+            self._stop.wait(POOL_RESIZE_INTERVAL)
+
+    def _start_slot(self, slot: int):
+        """Start the thread serving `slot`; caller holds _inflight_lock"""
+        self._generation += 1
+        t = threading.Thread(target=self._run, args=(slot,), name=f"worker-{slot}.{self._generation}", daemon=True)
+        self._slots[slot] = t
+        t.start()
+
+    def _owns_slot(self, slot: int) -> bool:
+        return self._slots.get(slot) is threading.current_thread()
+
+    def _run(self, slot: int):
+        worker_id = f"{self.worker_prefix}:{slot}"
+        while not self._stop.is_set() and slot < self._target and self._owns_slot(slot):
+            try:
+                jobs = self.store.claim(worker_id, limit=1, visibility_timeout=VISIBILITY_TIMEOUT,
+                                        workflows=list(HANDLERS))
+            except Exception as e:
+                log.error(f"Claim failed: {e}")
+                jobs = []
+            if not jobs:
+                sleep(POLL_INTERVAL)
+                continue
+            for job in jobs:
+                self._execute(job, worker_id, slot)
+
+    def _execute(self, job: Dict[str, Any], worker_id: str, slot: int):
+        cancelled = threading.Event()
+        job["cancelled"] = cancelled
+        with self._inflight_lock:
+            self._inflight[job["id"]] = (worker_id, slot, cancelled)
+        try:
+            result = HANDLERS[job["workflow"]](job)
+            if not cancelled.is_set():
+                self.store.complete(job["id"], result, worker_id=worker_id)
+        except Exception as e:
+            if cancelled.is_set():
+                log.info(f"Job {job['id']} stopped after cancellation: {type(e).__name__}")
+            else:
+                log.exception(f"Job {job['id']} failed")
+                self.store.fail(job["id"], {"type": type(e).__name__, "message": str(e)}, worker_id=worker_id,
+                                error_class=type(e).__name__)
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(job["id"], None)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Signal a job running in this process to stop and give its slot to a
+        new thread. Returns False if the job isn't running here.
+        """
+        with self._inflight_lock:
+            entry = self._inflight.pop(job_id, None)
+            if entry is None:
+                return False
+            _, slot, cancelled = entry
+            cancelled.set()
+            if not self._stop.is_set() and slot < self._target:
+                self._start_slot(slot)
+        log.info(f"Cancelled job {job_id}, worker slot {slot} released")
+        return True
+
+    def _monitor_loop(self):
+        """
+        Watch in-flight jobs for cancellation every CANCEL_POLL_INTERVAL and
+        extend their leases well before they expire
+        """
+        next_heartbeat = time() + VISIBILITY_TIMEOUT / 3
+        while not self._stop.wait(CANCEL_POLL_INTERVAL):
+            with self._inflight_lock:
+                inflight = {job_id: entry[0] for job_id, entry in self._inflight.items()}
+            if not inflight:
+                continue
+            try:
+                for job in self.store.status_many(list(inflight)):
+                    if job["status"] == "cancelled":
+                        self.cancel(job["job_id"])
+                        inflight.pop(job["job_id"], None)
+            except Exception as e:
+                log.warning(f"Cancellation check failed: {e}")
+            if time() < next_heartbeat:
+                continue
+            next_heartbeat = time() + VISIBILITY_TIMEOUT / 3
+            for job_id, worker_id in inflight.items():
+                try:
+                    if not self.store.heartbeat(job_id, worker_id, VISIBILITY_TIMEOUT):
+                        log.warning(f"Lost lease on job {job_id}")
+                        self.cancel(job_id)
+                except Exception as e:
+                    log.warning(f"Heartbeat failed for {job_id}: {e}")
+
+
+_pool = None
+
+def get_worker_pool() -> WorkerPool:
+    """Singleton worker pool instance"""
+    global _pool
+    if _pool is None:
+        _pool = WorkerPool(get_job_store())
+    return _pool
@@ -0,0 +1,160 @@
+"""
+Per-workflow admission limits - concurrency caps and submission rates.
+
+Limits are rows of the workflow_limits table (see WORKFLOW_LIMITS_SCHEMA in
+services/job_store.py), so every process and restart sees the same
+configuration. Each process caches them in memory and reloads every
+WORKFLOW_LIMITS_REFRESH seconds; nothing touches the database per request.
+
+- max_concurrency: at most this many jobs of the workflow run at once; the
+  claim path skips workflows at their cap (JobStore._pick_ready)
+- rate_per_min / burst: token bucket checked at intake; an empty bucket
+  rejects the submission with 429 and a Retry-After hint, and a request
+  with more jobs of one workflow than its burst is refused outright, as no
+  amount of waiting would admit it
+
+Token buckets are per process, so with N gunicorn workers the effective
+submission rate is up to N x rate_per_min.
+"""
+import os
+import threading
+import logging
+from time import time
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+
+log = logging.getLogger("levqor.workflow_limits")
+
+LIMITS_REFRESH = float(os.environ.get("WORKFLOW_LIMITS_REFRESH", 5))
+
+_LIMIT_COLUMNS = ("workflow", "max_concurrency", "rate_per_min", "burst", "updated_at")
+
+
+class WorkflowBurstExceeded(Exception):
+    """One request holds more jobs of a workflow than its bucket can ever admit"""
+
+    def __init__(self, workflow: str, burst: int):
+        super().__init__(workflow, burst)
+        self.workflow = workflow
+        self.burst = burst
+
+
+class WorkflowLimits:
+    def __init__(self, store, refresh: float = LIMITS_REFRESH):
+        self.store = store
+        self.refresh = refresh
+        self._limits: Dict[str, Dict[str, Any]] = {}
+        self._loaded_at = 0.0
+        self._buckets: Dict[str, List[float]] = {}
+        self._rejected: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _current(self) -> Dict[str, Dict[str, Any]]:
+        if time() - self._loaded_at >= self.refresh:
+            self.reload()
+        return self._limits
+
+    def reload(self):
+        rows = self.store.conn().execute(
+            f"SELECT {', '.join(_LIMIT_COLUMNS)} FROM workflow_limits"
+        ).fetchall()
+        limits = {r[0]: dict(zip(_LIMIT_COLUMNS, r)) for r in rows}
+        with self._lock:
+            self._limits = limits
+            self._loaded_at = time()
+            # Drop buckets of workflows whose rate limit was removed
+            for workflow in list(self._buckets):
+                if not (limits.get(workflow) or {}).get("rate_per_min"):
+                    del self._buckets[workflow]
+
+    def all(self) -> List[Dict[str, Any]]:
+        return sorted(self._current().values(), key=lambda l: l["workflow"])
+
+    def set_limit(self, workflow: str, max_concurrency: Optional[int] = None,
+                  rate_per_min: Optional[float] = None, burst: Optional[int] = None) -> Dict[str, Any]:
+        """Create or replace the limits of one workflow"""
+        if rate_per_min and not burst:
+            burst = max(1, int(rate_per_min))
+        now = time()
+        conn = self.store.conn()
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO workflow_limits(workflow, max_concurrency, rate_per_min, burst, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(workflow) DO UPDATE SET
+                  max_concurrency=excluded.max_concurrency, rate_per_min=excluded.rate_per_min,
+                  burst=excluded.burst, updated_at=excluded.updated_at
+                """,
+                (workflow, max_concurrency, rate_per_min, burst, now)
+            )
+        with self._lock:
+            self._buckets.pop(workflow, None)
+        self.reload()
+        log.info(f"Workflow limits for {workflow}: concurrency={max_concurrency} rate={rate_per_min}/min burst={burst}")
+        return self._limits[workflow]
+
+    def remove(self, workflow: str) -> bool:
+        conn = self.store.conn()
+        with conn:
+            cur = conn.execute("DELETE FROM workflow_limits WHERE workflow=?", (workflow,))
+        self.reload()
+        return cur.rowcount > 0
+
+    def concurrency_caps(self) -> Dict[str, int]:
+        """{workflow: max running jobs} for every capped workflow"""
+        return {wf: l["max_concurrency"] for wf, l in self._current().items()
+                if l["max_concurrency"] is not None}
+
+    def admit(self, counts: Dict[str, int]) -> Optional[Tuple[str, float]]:
+        """
+        Take `counts[workflow]` tokens from each workflow's bucket, all or
+        nothing. Returns None when admitted, else (workflow, retry_after_seconds)
+        for the first workflow that is over its rate. Raises
+        WorkflowBurstExceeded, taking nothing, if a count is above its
+        workflow's burst.
+        """
+        limits = self._current()
+        rated = {wf: n for wf, n in counts.items() if (limits.get(wf) or {}).get("rate_per_min")}
+        if not rated:
+            return None
+        for workflow, n in rated.items():
+            if n > limits[workflow]["burst"]:
+                raise WorkflowBurstExceeded(workflow, limits[workflow]["burst"])
+        now = time()
+        with self._lock:
+            refilled = {}
+            for workflow, n in rated.items():
+                limit = limits[workflow]
+                rate = limit["rate_per_min"] / 60.0
+                burst = limit["burst"]
+                tokens, last = self._buckets.get(workflow, (burst, now))
+                tokens = min(burst, tokens + (now - last) * rate)
+                if tokens < n:
+                    self._rejected[workflow] += n
+                    return workflow, (n - tokens) / rate
+                refilled[workflow] = tokens
+            for workflow, n in rated.items():
+                self._buckets[workflow] = [refilled[workflow] - n, now]
+        return None
+
+    def snapshot(self, running: Dict[str, int]) -> List[Dict[str, Any]]:
+        """Configured limits with live running counts and bucket levels"""
+        limits = self._current()
+        now = time()
+        state = []
+        with self._lock:
+            for workflow, limit in sorted(limits.items()):
+                entry = {
+                    "workflow": workflow,
+                    "max_concurrency": limit["max_concurrency"],
+                    "running": running.get(workflow, 0),
+                    "rate_per_min": limit["rate_per_min"],
+                    "burst": limit["burst"],
+                    "rejected": self._rejected.get(workflow, 0),
+                }
+                if limit["rate_per_min"]:
+                    tokens, last = self._buckets.get(workflow, (limit["burst"], now))
+                    entry["tokens"] = round(min(limit["burst"], tokens + (now - last) * limit["rate_per_min"] / 60.0), 2)
+                state.append(entry)
+        return state
@@ -0,0 +1,61 @@
+"""
+Test configuration: run.py reads its settings at import time, so the
+environment is pointed at a throwaway database before anything imports it.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="levqor-tests-")
+
+os.environ.update({
+    "SQLITE_PATH": os.path.join(_TMP, "levqor.db"),
+    "INCIDENTS_LOG": os.path.join(_TMP, "incidents.log"),
+    "API_KEYS": "test-key,test-key-2",
+    "ADMIN_TOKEN": "test-admin",
+    "WORKER_TOKEN": "test-worker",
+    "CALLBACKS_ENABLED": "false",
+    # The stub receivers in tests/test_callbacks.py listen on loopback
+    "CALLBACK_ALLOWED_HOSTS": "127.0.0.1",
+    "WORKER_POOL_ENABLED": "false",
+    "RATE_LIMIT_SHARED": "false",
+    "RATE_BURST": "100000",
+    "RATE_GLOBAL": "1000000",
+    "PROTECTED_PATH_RATE": "100000",
+    "PLAN_RATE_STARTER": "100000",
+    "PLAN_RATE_PRO": "100000",
+})
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CUSTOMER = {"X-Api-Key": "test-key"}
+WORKER = {"X-Worker-Token": "test-worker"}
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import run
+    return run
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def store(tmp_path):
+    """A JobStore on its own database"""
+    from services.job_store import JobStore
+    return JobStore(str(tmp_path / "jobs.db"))
+
+
+@pytest.fixture
+def incidents_log(tmp_path, monkeypatch):
+    """Incident log of the app's responder, redirected to this test's directory"""
+    from monitors.incident_response import get_responder
+    path = tmp_path / "incidents.log"
+    monkeypatch.setattr(get_responder(), "incidents_log", str(path))
+    return path
@@ -0,0 +1,62 @@
+from time import time
+from uuid import uuid4
+
+import pytest
+
+from conftest import CUSTOMER
+from services import admission
+from services.admission import AdmissionController
+
+
+def _pin(monkeypatch, controller, queued, max_depth=100, oldest_age=0.0, dequeued_per_min=60):
+    """Freeze the controller's view of the queue"""
+    monkeypatch.setattr(admission, "SAMPLE_INTERVAL", 3600)
+    monkeypatch.setattr(admission, "LIMITS_REFRESH", 3600)
+    monkeypatch.setattr(controller, "_limits", {"queue_max_depth": max_depth, "queue_max_age_seconds": 600})
+    monkeypatch.setattr(controller, "_limits_at", time())
+    monkeypatch.setattr(controller, "_sample", {
+        "counts": {"queued": queued},
+        "oldest_queued_age_seconds": oldest_age,
+        "dequeued_per_min": dequeued_per_min,
+    })
+    monkeypatch.setattr(controller, "_sample_at", time())
+    monkeypatch.setattr(controller, "_admitted", 0)
+
+
+def test_low_priority_is_shed_first(store, monkeypatch):
+    controller = AdmissionController(store)
+    _pin(monkeypatch, controller, queued=70)
+    assert controller.check("low") == 1
+    assert controller.check("normal") is None
+    assert controller.check("high") is None
+    assert controller.state()["rejected"]["low"] == 1
+
+
+def test_count_is_weighed_against_the_level(store, monkeypatch):
+    controller = AdmissionController(store)
+    _pin(monkeypatch, controller, queued=80)
+    # 80 + 11 would pass 0.9; the retry waits for 1 job/s to drain 1
+    assert controller.check("normal", 11) == 1
+    assert controller.check("normal", 10) is None
+    # Admitted jobs count until the next sample
+    assert controller.check("normal") is not None
+    assert controller.check("high", 10) is None
+    assert controller.check("high") is not None
+
+
+def test_intake_sheds_low_with_retry_after_while_high_gets_in(client, app_module, monkeypatch):
+    _pin(monkeypatch, app_module.ADMISSION, queued=70)
+    body = {"workflow": f"wf-{uuid4().hex}", "payload": {}}
+    r = client.post("/api/v1/intake", json={**body, "priority": "low"}, headers=CUSTOMER)
+    assert r.status_code == 503
+    assert r.get_json()["error"] == "overloaded" and r.headers["Retry-After"] == "1"
+    r = client.post("/api/v1/intake", json={**body, "priority": "high"}, headers=CUSTOMER)
+    assert r.status_code == 202
+
+
+@pytest.mark.parametrize("size, status", [(20, 503), (19, 202)])
+def test_batch_is_admitted_only_if_it_fits(client, app_module, monkeypatch, size, status):
+    _pin(monkeypatch, app_module.ADMISSION, queued=71)
+    batch = [{"workflow": f"wf-{uuid4().hex}", "payload": {}} for _ in range(size)]
+    r = client.post("/api/v1/intake/batch", json=batch, headers=CUSTOMER)
+    assert r.status_code == status
@@ -0,0 +1,174 @@
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from uuid import uuid4
+
+import pytest
+
+from conftest import CUSTOMER
+from services import callbacks
+from services.callbacks import CallbackDispatcher
+
+
+class Receiver(ThreadingHTTPServer):
+    """Stub webhook endpoint answering with the queued status codes, then 200"""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _ReceiverHandler)
+        self.codes = []
+        self.received = []
+        self.hosts = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/hook"
+
+
+class _ReceiverHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.received.append((self.headers["X-Levqor-Delivery"], json.loads(body)))
+        self.server.hosts.append(self.headers["Host"])
+        code = self.server.codes.pop(0) if self.server.codes else 200
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def receiver():
+    server = Receiver()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def dispatcher(store):
+    d = CallbackDispatcher(store, workers=2)
+    yield d
+    d._executor.shutdown(wait=True)
+
+
+def _finish(store, url):
+    job_id = uuid4().hex
+    store.create(job_id, {"workflow": "hooks", "payload": {}, "callback_url": url})
+    assert [j["id"] for j in store.claim("w1", workflows=["hooks"])] == [job_id]
+    assert store.complete(job_id, {"ok": 1}, worker_id="w1")
+    return job_id
+
+
+def test_delivers_completion_to_receiver(store, dispatcher, receiver):
+    job_id = _finish(store, receiver.url)
+    assert dispatcher.run_once() == 1
+    [(delivery_id, payload)] = receiver.received
+    assert payload["job_id"] == job_id and payload["status"] == "succeeded"
+    assert payload["result"] == {"ok": 1}
+    [delivery] = dispatcher.deliveries()
+    assert str(delivery["id"]) == delivery_id
+    assert (delivery["status"], delivery["attempts"], delivery["last_status_code"]) == ("delivered", 1, 200)
+    assert dispatcher.run_once() == 0
+
+
+def test_failed_delivery_is_retried_after_backoff(store, dispatcher, receiver, monkeypatch):
+    receiver.codes = [500]
+    _finish(store, receiver.url)
+    assert dispatcher.run_once() == 1
+    [delivery] = dispatcher.deliveries()
+    assert (delivery["status"], delivery["attempts"], delivery["last_error"]) == ("pending", 1, "HTTP 500")
+    # Not due until the backoff has passed
+    assert dispatcher.run_once() == 0
+
+    monkeypatch.setattr(callbacks, "time", lambda: delivery["next_attempt_at"] + 1)
+    assert dispatcher.run_once() == 1
+    [delivery] = dispatcher.deliveries()
+    assert (delivery["status"], delivery["attempts"], delivery["last_status_code"]) == ("delivered", 2, 200)
+    assert len(receiver.received) == 2
+
+
+def test_delivery_dies_after_max_attempts(store, dispatcher, receiver, monkeypatch):
+    monkeypatch.setattr(callbacks, "CALLBACK_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(callbacks, "backoff_delay", lambda attempts: 0)
+    receiver.codes = [503, 503]
+    _finish(store, receiver.url)
+    assert dispatcher.run_once() == 1
+    assert dispatcher.run_once() == 1
+    [delivery] = dispatcher.deliveries()
+    assert (delivery["status"], delivery["attempts"]) == ("dead", 2)
+    assert dispatcher.replay_dead() == 1
+    assert dispatcher.run_once() == 1
+    assert dispatcher.deliveries()[0]["status"] == "delivered"
+
+
+def test_idle_poll_does_not_write(store, dispatcher):
+    statements = []
+    conn = store.conn()
+    conn.set_trace_callback(statements.append)
+    try:
+        assert dispatcher.run_once() == 0
+    finally:
+        conn.set_trace_callback(None)
+    assert statements and not [s for s in statements if not s.lstrip().upper().startswith("SELECT")]
+
+
+def test_private_callback_url_is_refused_at_intake(client):
+    for url in ("http://169.254.169.254/latest/meta-data", "http://10.0.0.5/hook", "http://[::1]:8080/hook"):
+        r = client.post("/api/v1/intake", json={"workflow": "hooks", "payload": {}, "callback_url": url},
+                        headers=CUSTOMER)
+        assert r.status_code == 400, url
+        assert r.get_json()["error"] == "callback_url not allowed"
+
+
+def test_delivery_to_private_address_is_refused(store, dispatcher, receiver, monkeypatch):
+    _finish(store, receiver.url)
+    monkeypatch.setattr(callbacks, "CALLBACK_ALLOWED_HOSTS", callbacks.parse_allowlist(""))
+    assert dispatcher.run_once() == 1
+    [delivery] = dispatcher.deliveries()
+    assert delivery["status"] == "dead" and delivery["last_error"].startswith("blocked:")
+    assert receiver.received == []
+
+
+def test_intake_does_no_dns_and_accepts_unresolvable_names(client, monkeypatch):
+    def no_dns(*args, **kwargs):
+        raise AssertionError("DNS lookup on the request thread")
+
+    monkeypatch.setattr(callbacks.socket, "getaddrinfo", no_dns)
+    items = [{"workflow": "hooks", "payload": {}, "callback_url": f"https://hook-{n}.example.invalid/cb"}
+             for n in range(3)]
+    r = client.post("/api/v1/intake/batch", json=items, headers=CUSTOMER)
+    assert r.status_code == 202 and r.get_json()["accepted"] == 3
+
+
+def test_delivery_connects_to_the_address_it_checked(store, dispatcher, receiver, monkeypatch):
+    port = receiver.server_address[1]
+    answers = [[(0, 0, 0, "", ("127.0.0.1", port))]]
+    real_getaddrinfo = socket.getaddrinfo
+
+    def rebinding(host, *args, **kwargs):
+        if host != "hooks.example.test":
+            return real_getaddrinfo(host, *args, **kwargs)
+        # A first answer that passes the check, then one that would not
+        return answers.pop(0) if answers else [(0, 0, 0, "", ("10.0.0.5", port))]
+
+    monkeypatch.setattr(callbacks.socket, "getaddrinfo", rebinding)
+    _finish(store, f"http://hooks.example.test:{port}/hook")
+    assert dispatcher.run_once() == 1
+    assert dispatcher.deliveries()[0]["status"] == "delivered"
+    assert receiver.hosts == [f"hooks.example.test:{port}"]
+
+
+def test_unresolvable_host_is_retried_not_dead(store, dispatcher, monkeypatch):
+    def unresolvable(*args, **kwargs):
+        raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+
+    monkeypatch.setattr(callbacks.socket, "getaddrinfo", unresolvable)
+    _finish(store, "https://gone.example.test/hook")
+    assert dispatcher.run_once() == 1
+    [delivery] = dispatcher.deliveries()
+    assert (delivery["status"], delivery["attempts"]) == ("pending", 1)
@@ -0,0 +1,47 @@
+from uuid import uuid4
+
+from conftest import CUSTOMER, WORKER
+
+
+def _enqueue(client, workflow):
+    r = client.post("/api/v1/intake", json={"workflow": workflow, "payload": {}}, headers=CUSTOMER)
+    assert r.status_code == 202
+    return r.get_json()["job_id"]
+
+
+def _cancel(client, job_id, headers=CUSTOMER):
+    return client.post(f"/api/v1/jobs/{job_id}/cancel", json={"reason": "no longer needed"}, headers=headers)
+
+
+def test_cancel_queued_job_then_again_is_409(client):
+    job_id = _enqueue(client, f"wf-{uuid4().hex}")
+    r = _cancel(client, job_id)
+    assert r.status_code == 200
+    assert r.get_json() == {"job_id": job_id, "status": "cancelled", "previous_status": "queued"}
+    assert client.get(f"/api/v1/status/{job_id}", headers=CUSTOMER).get_json()["status"] == "cancelled"
+
+    r = _cancel(client, job_id)
+    assert r.status_code == 409
+    assert r.get_json()["status"] == "cancelled"
+
+
+def test_cancel_unknown_or_foreign_job_is_404(client):
+    assert _cancel(client, uuid4().hex).status_code == 404
+    job_id = _enqueue(client, f"wf-{uuid4().hex}")
+    assert _cancel(client, job_id, headers={"X-Api-Key": "test-key-2"}).status_code == 404
+    assert client.get(f"/api/v1/status/{job_id}", headers=CUSTOMER).get_json()["status"] == "queued"
+
+
+def test_running_job_learns_of_cancel_on_heartbeat(client):
+    workflow = f"wf-{uuid4().hex}"
+    job_id = _enqueue(client, workflow)
+    body = {"worker_id": "w1", "workflows": [workflow]}
+    assert client.post("/api/v1/worker/claim", json=body, headers=WORKER).status_code == 200
+
+    assert _cancel(client, job_id).get_json()["previous_status"] == "running"
+    r = client.post(f"/api/v1/worker/heartbeat/{job_id}", json=body, headers=WORKER)
+    assert (r.status_code, r.get_json()["error"]) == (409, "cancelled")
+    # A late completion from the stopped worker does not resurrect the job
+    r = client.post(f"/api/v1/worker/complete/{job_id}", json={"worker_id": "w1", "result": {}}, headers=WORKER)
+    assert r.status_code == 409
+    assert client.get(f"/api/v1/status/{job_id}", headers=CUSTOMER).get_json()["status"] == "cancelled"
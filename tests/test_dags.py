@@ -0,0 +1,58 @@
+from uuid import uuid4
+
+from conftest import CUSTOMER, WORKER
+
+
+def _claim(client, workflow):
+    r = client.post("/api/v1/worker/claim", json={"worker_id": "w1", "workflows": [workflow]}, headers=WORKER)
+    assert r.status_code == 200
+    return r.get_json()["jobs"]
+
+
+def _complete(client, job_id, result):
+    r = client.post(f"/api/v1/worker/complete/{job_id}", json={"worker_id": "w1", "result": result},
+                    headers=WORKER)
+    assert r.status_code == 200
+
+
+def test_child_runs_after_parents_with_their_results(client):
+    extract, load = f"wf-{uuid4().hex}", f"wf-{uuid4().hex}"
+    r = client.post("/api/v1/intake", json={"steps": [
+        {"id": "left", "workflow": extract, "payload": {"part": 1}},
+        {"id": "right", "workflow": extract, "payload": {"part": 2}},
+        {"id": "join", "workflow": load, "payload": {}, "depends_on": ["left", "right"]},
+    ]}, headers=CUSTOMER)
+    assert r.status_code == 202
+    dag_id, jobs = r.get_json()["dag_id"], r.get_json()["jobs"]
+
+    assert _claim(client, load) == []
+    assert sorted(j["job_id"] for j in _claim(client, extract) + _claim(client, extract)) == \
+        sorted([jobs["left"], jobs["right"]])
+    _complete(client, jobs["left"], {"rows": 10})
+    assert _claim(client, load) == []
+    status = client.get(f"/api/v1/dags/{dag_id}", headers=CUSTOMER).get_json()
+    assert status["status"] == "running"
+    assert [s["status"] for s in status["steps"]] == ["succeeded", "running", "waiting"]
+
+    _complete(client, jobs["right"], {"rows": 5})
+    [child] = _claim(client, load)
+    assert child["job_id"] == jobs["join"]
+    assert child["input"]["parents"] == {"left": {"rows": 10}, "right": {"rows": 5}}
+    _complete(client, jobs["join"], {"rows": 15})
+    status = client.get(f"/api/v1/dags/{dag_id}", headers=CUSTOMER).get_json()
+    assert status["status"] == "succeeded"
+    assert status["steps"][-1]["result"] == {"rows": 15}
+
+
+def test_dag_is_private_to_its_key_and_cycles_are_refused(client):
+    workflow = f"wf-{uuid4().hex}"
+    r = client.post("/api/v1/intake", json={"steps": [{"id": "a", "workflow": workflow, "payload": {}}]},
+                    headers=CUSTOMER)
+    dag_id = r.get_json()["dag_id"]
+    assert client.get(f"/api/v1/dags/{dag_id}", headers={"X-Api-Key": "test-key-2"}).status_code == 404
+
+    r = client.post("/api/v1/intake", json={"steps": [
+        {"id": "a", "workflow": workflow, "payload": {}, "depends_on": ["b"]},
+        {"id": "b", "workflow": workflow, "payload": {}, "depends_on": ["a"]},
+    ]}, headers=CUSTOMER)
+    assert r.status_code == 400
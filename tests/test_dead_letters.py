@@ -0,0 +1,41 @@
+import json
+from uuid import uuid4
+
+from conftest import WORKER
+
+ADMIN = {"Authorization": "Bearer test-admin"}
+
+
+def _dead_letter(store, workflow):
+    job_id = uuid4().hex
+    store.create(job_id, {"workflow": workflow, "payload": {}})
+    assert [j["id"] for j in store.claim("w1", workflows=[workflow])] == [job_id]
+    assert store.fail(job_id, {"type": "Boom"}, worker_id="w1", retry=False) == "failed"
+    return job_id
+
+
+def test_admin_replay_filters_by_workflow(client, app_module):
+    store = app_module.JOB_STORE
+    workflow, other = f"wf-{uuid4().hex}", f"wf-{uuid4().hex}"
+    job_id = _dead_letter(store, workflow)
+    _dead_letter(store, other)
+
+    r = client.get(f"/api/admin/dlq?workflow={workflow}", headers=ADMIN)
+    assert r.get_json()["total"] == 1
+    assert r.get_json()["jobs"][0]["error_class"] == "Boom"
+    r = client.post("/api/admin/dlq/replay", json={"workflow": workflow}, headers=ADMIN)
+    assert r.status_code == 200
+    assert store.status_many([job_id])[0]["status"] == "queued"
+    assert store.dead_letter_count(workflow=other) == 1
+    r = client.post("/api/v1/worker/claim", json={"worker_id": "w2", "workflows": [workflow]}, headers=WORKER)
+    assert r.get_json()["jobs"][0]["attempts"] == 1
+
+
+def test_recover_flushes_dead_letters_and_logs_incident(client, app_module, incidents_log):
+    job_id = _dead_letter(app_module.JOB_STORE, f"wf-{uuid4().hex}")
+    r = client.post("/ops/recover", json={"recent_failures": 1}, headers=ADMIN)
+    assert r.status_code == 200
+    assert r.get_json()["dlq_flushed"] >= 1
+    assert app_module.JOB_STORE.status_many([job_id])[0]["status"] == "queued"
+    [incident] = [json.loads(line) for line in incidents_log.read_text().splitlines()]
+    assert incident["status"] == "recovered"
@@ -0,0 +1,48 @@
+from time import sleep, time
+from uuid import uuid4
+
+from conftest import CUSTOMER, WORKER
+from services.idempotency import IdempotencyIndex
+from services.key_plans import key_tag
+
+
+def _intake(client, body, idem_key):
+    return client.post("/api/v1/intake", json=body, headers={**CUSTOMER, "Idempotency-Key": idem_key})
+
+
+def test_replay_keeps_original_status_code(client, app_module):
+    workflow = f"wf-{uuid4().hex}"
+    body = {"workflow": workflow, "payload": {"n": 1}, "memoize": True}
+    r = client.post("/api/v1/intake", json=body, headers=CUSTOMER)
+    job_id = r.get_json()["job_id"]
+    r = client.post("/api/v1/worker/claim", json={"worker_id": "w1", "workflows": [workflow]}, headers=WORKER)
+    assert [j["job_id"] for j in r.get_json()["jobs"]] == [job_id]
+    r = client.post(f"/api/v1/worker/complete/{job_id}", json={"worker_id": "w1", "result": {"ok": 1}},
+                    headers=WORKER)
+    assert r.status_code == 200
+
+    idem_key = uuid4().hex
+    first = _intake(client, body, idem_key)
+    assert first.status_code == 200 and first.get_json()["cached"] is True
+    # Once from the in-process cache, once from the idempotency_keys table
+    for _ in range(2):
+        replay = _intake(client, body, idem_key)
+        assert replay.status_code == 200
+        assert replay.headers["Idempotent-Replayed"] == "true"
+        assert replay.get_json() == first.get_json()
+        app_module.IDEMPOTENCY.cache.pop((key_tag("test-key"), idem_key))
+
+    queued_key = uuid4().hex
+    first = _intake(client, {"workflow": workflow, "payload": {"n": 2}}, queued_key)
+    assert first.status_code == 202
+    assert _intake(client, {"workflow": workflow, "payload": {"n": 2}}, queued_key).status_code == 202
+
+
+def test_entry_loaded_from_store_expires_with_its_window(store):
+    index = IdempotencyIndex(store, ttl=1.0)
+    response = {"job_id": "j1", "status": "queued"}
+    store.create("j1", {"workflow": "w", "payload": {}}, now=time() - 0.8, owner="o",
+                 idempotency=("k", response, 202, index.ttl))
+    assert index.lookup("o", "k") == (response, 202)
+    sleep(0.4)
+    assert index.lookup("o", "k") is None
@@ -0,0 +1,22 @@
+from uuid import uuid4
+
+from services import key_plans
+
+
+def _batch(n, workflow=None):
+    workflow = workflow or f"wf-{uuid4().hex}"
+    return [{"workflow": workflow, "payload": {"i": i}} for i in range(n)]
+
+
+def test_batch_larger_than_plan_budget_is_refused_not_throttled(client, monkeypatch):
+    monkeypatch.setitem(key_plans.PLAN_RATE_LIMITS, "starter", 20)
+    headers = {"X-Api-Key": "test-key-2"}
+
+    r = client.post("/api/v1/intake/batch", json=_batch(21), headers=headers)
+    assert r.status_code == 400
+    assert r.get_json()["details"] == {"max_items": 20}
+    assert "Retry-After" not in r.headers
+
+    r = client.post("/api/v1/intake/batch", json=_batch(20), headers=headers)
+    assert r.status_code == 202
+    assert r.get_json()["accepted"] == 20
@@ -0,0 +1,47 @@
+import io
+import json
+
+import pytest
+
+from conftest import CUSTOMER
+from services.intake_body import BodyTooLarge, INTAKE_MAX_BYTES, parse_body, read_body
+
+
+class Unreadable:
+    def read(self, size):
+        raise AssertionError("body read despite an oversized Content-Length")
+
+
+def test_declared_oversize_body_is_refused_before_reading():
+    with pytest.raises(BodyTooLarge):
+        read_body(Unreadable(), 101, limit=100)
+
+
+def test_undeclared_body_is_cut_off_just_past_the_limit():
+    stream = io.BytesIO(b"x" * 10_000)
+    with pytest.raises(BodyTooLarge):
+        read_body(stream, None, limit=100)
+    assert stream.tell() == 101
+    assert read_body(io.BytesIO(b"x" * 100), None, limit=100) == b"x" * 100
+
+
+def test_payload_json_is_kept_as_sent():
+    raw = '{"workflow": "w",  "payload" : {"b": 1,   "a": "é"}, "priority":"high"}'.encode()
+    body = parse_body(bytearray(raw))
+    assert body.data == {"workflow": "w", "payload": {"b": 1, "a": "é"}, "priority": "high"}
+    assert bytes(body.value_json("payload")) == '{"b": 1,   "a": "é"}'.encode()
+    assert body.value_size("payload") == len('{"b": 1,   "a": "é"}'.encode())
+    assert body.value_json("callback_url") is None
+
+
+@pytest.mark.parametrize("raw", [b'{"a": 1,}', b'{"a": 1} x', b'\xff{}', b'{"a" 1}', b""])
+def test_invalid_bodies_parse_to_none(raw):
+    assert parse_body(bytearray(raw)) is None
+
+
+def test_oversized_intake_is_413(client):
+    payload = {"blob": "x" * INTAKE_MAX_BYTES}
+    r = client.post("/api/v1/intake", data=json.dumps({"workflow": "big", "payload": payload}),
+                    content_type="application/json", headers=CUSTOMER)
+    assert r.status_code == 413
+    assert r.get_json()["max_bytes"] == INTAKE_MAX_BYTES
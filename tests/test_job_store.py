@@ -0,0 +1,291 @@
+import json
+import sqlite3
+from collections import Counter
+from time import time
+from uuid import uuid4
+
+import pytest
+
+from conftest import CUSTOMER
+from services.job_scheduler import FairScheduler
+from services.job_store import JOB_MAX_ATTEMPTS, JobStore
+
+
+def fill(store: JobStore, depth: int, workflow: str = "bulk"):
+    now = time()
+    for start in range(0, depth, 1000):
+        store.create_many([(uuid4().hex, {"workflow": workflow, "payload": {"i": i}})
+                           for i in range(start, min(start + 1000, depth))], now)
+
+
+def add_dag(store: JobStore, parent_workflow: str, child_workflow: str):
+    parent, child = uuid4().hex, uuid4().hex
+    store.create_dag(uuid4().hex, [
+        (parent, "a", {"workflow": parent_workflow, "payload": {}}, []),
+        (child, "b", {"workflow": child_workflow, "payload": {}}, [parent]),
+    ])
+    return parent, child
+
+
+def vm_steps(store: JobStore, fn) -> int:
+    """SQLite VM instructions (in units of 100) spent by fn on this thread's connection"""
+    steps = [0]
+
+    def tick():
+        steps[0] += 1
+        return 0
+
+    conn = store.conn()
+    conn.set_progress_handler(tick, 100)
+    try:
+        fn()
+    finally:
+        conn.set_progress_handler(None, 100)
+    return steps[0]
+
+
+def test_claim_cost_does_not_grow_with_queue_depth(tmp_path):
+    costs = []
+    for depth in (500, 8000):
+        store = JobStore(str(tmp_path / f"claim{depth}.db"))
+        fill(store, depth)
+        costs.append(vm_steps(store, lambda: store.claim("w1", limit=10, visibility_timeout=300)))
+    assert costs[1] < costs[0] * 2, costs
+
+
+def test_dag_release_cost_does_not_grow_with_waiting_steps(tmp_path):
+    costs = []
+    for depth in (200, 4000):
+        store = JobStore(str(tmp_path / f"dag{depth}.db"))
+        for _ in range(depth):
+            add_dag(store, "idle-a", "idle-b")
+        parent, child = add_dag(store, "dag-a", "dag-b")
+        assert store.claim("w1", limit=1, workflows=["dag-a"])
+        costs.append(vm_steps(store, lambda: store.complete(parent, {"ok": True}, worker_id="w1")))
+        assert store.status_many([child])[0]["status"] == "queued"
+    assert costs[1] < costs[0] * 2, costs
+
+
+@pytest.mark.parametrize("payload", [{"n": 1}, {"blob": "x" * 4096}])
+def test_replay_restores_archived_dead_letter(store, payload):
+    job_id = uuid4().hex
+    store.create(job_id, {"workflow": "dlq", "payload": payload})
+    assert [j["id"] for j in store.claim("w1", workflows=["dlq"])] == [job_id]
+    assert store.fail(job_id, {"type": "Boom"}, worker_id="w1", retry=False) == "failed"
+    assert store.archive_expired(time() + 1) == 1
+    seq = store.current_seq()
+
+    assert store.replay_dead_letters() == 1
+    assert store.current_seq() > seq
+    assert store.status_many([job_id])[0]["seq"] > seq
+    [job] = store.claim("w1", workflows=["dlq"])
+    assert job["id"] == job_id
+    assert job["input"]["payload"] == payload
+    assert job["archived_at"] is None
+    assert store.complete(job_id, {"ok": 1}, worker_id="w1")
+    assert store.get(job_id)["result"] == {"ok": 1}
+    assert store.archive_expired(time() + 1) == 1
+
+
+def test_queue_age_counts_from_when_jobs_were_queued(store):
+    hour_ago = time() - 3600
+    delayed, failed = uuid4().hex, uuid4().hex
+    store.create(delayed, {"workflow": "late", "payload": {}, "run_at": time() - 1}, now=hour_ago)
+    store.create(failed, {"workflow": "dlq", "payload": {}}, now=hour_ago)
+    assert store.queue_stats()["oldest_queued_age_seconds"] >= 3600
+
+    # Claiming promotes the delayed job, due an hour after it was submitted
+    assert [j["id"] for j in store.claim("w1", workflows=["dlq"])] == [failed]
+    assert store.fail(failed, {"type": "Boom"}, worker_id="w1", retry=False) == "failed"
+    stats = store.queue_stats()
+    assert stats["counts"]["queued"] == 1
+    assert stats["oldest_queued_age_seconds"] < 60
+
+    # Replayed an hour after it was submitted
+    assert store.replay_dead_letters() == 1
+    stats = store.queue_stats()
+    assert stats["counts"]["queued"] == 2
+    assert stats["oldest_queued_age_seconds"] < 60
+
+
+def test_dag_child_age_counts_from_parent_completion(store):
+    parent, child = add_dag(store, "parent", "child")
+    conn = store.conn()
+    with conn:
+        conn.execute("UPDATE jobs SET created_at=created_at-3600, queued_at=queued_at-3600")
+    assert store.queue_stats()["oldest_queued_age_seconds"] >= 3600
+    assert [j["id"] for j in store.claim("w1", workflows=["parent"])] == [parent]
+    assert store.complete(parent, {"ok": 1}, worker_id="w1")
+    stats = store.queue_stats()
+    assert stats["counts"]["queued"] == 1
+    assert stats["oldest_queued_age_seconds"] < 60
+
+
+def test_claim_wait_counts_from_when_jobs_were_queued(store):
+    job_id = uuid4().hex
+    store.create(job_id, {"workflow": "retry", "payload": {}}, now=time() - 3600)
+    assert [j["id"] for j in store.claim("w1", workflows=["retry"])] == [job_id]
+    assert store.scheduler.wait_stats()["normal"]["p50_ms"] >= 3600 * 1000
+    assert store.fail(job_id, {"type": "Boom"}, worker_id="w1") == "queued"
+
+    store.scheduler = FairScheduler()
+    assert [j["id"] for j in store.claim("w1", workflows=["retry"])] == [job_id]
+    assert store.scheduler.wait_stats()["normal"]["p95_ms"] < 60 * 1000
+
+
+def test_jobs_are_shared_through_the_database_file(tmp_path):
+    path = str(tmp_path / "shared.db")
+    job_id = uuid4().hex
+    JobStore(path).create(job_id, {"workflow": "durable", "payload": {"n": 1}}, owner="k1")
+
+    # A separate connection (another worker process, or after a restart) sees the committed job
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT status FROM jobs WHERE id=?", (job_id,)).fetchone() == ("queued",)
+    other = JobStore(path)
+    assert other.get(job_id)["input"] == {"workflow": "durable", "payload": {"n": 1}}
+    assert [j["id"] for j in other.claim("w2", workflows=["durable"])] == [job_id]
+    assert JobStore(path).get(job_id)["status"] == "running"
+
+
+def test_archival_moves_only_expired_finished_jobs_and_keeps_them_readable(store):
+    old, recent, queued = uuid4().hex, uuid4().hex, uuid4().hex
+    for job_id in (old, recent, queued):
+        store.create(job_id, {"workflow": "archive", "payload": {"id": job_id}})
+    assert len(store.claim("w1", limit=2, workflows=["archive"])) == 2
+    assert store.complete(old, {"done": old}, worker_id="w1")
+    assert store.complete(recent, {"done": recent}, worker_id="w1")
+    conn = store.conn()
+    with conn:
+        conn.execute("UPDATE jobs SET updated_at=updated_at-3600 WHERE id=?", (old,))
+    seq = store.current_seq()
+
+    assert store.archive_expired(time() - 60) == 1
+    assert store.archive_expired(time() - 60) == 0
+    assert conn.execute("SELECT result FROM jobs WHERE id=? AND archived_at IS NOT NULL", (old,)).fetchone() == (None,)
+    assert conn.execute("SELECT COUNT(*) FROM job_inputs WHERE job_id=?", (old,)).fetchone() == (0,)
+    # Archival is not a status transition
+    assert store.current_seq() == seq
+
+    job = store.get(old)
+    assert (job["status"], job["input"]["payload"], job["result"]) == ("succeeded", {"id": old}, {"done": old})
+    assert store.status_many([old])[0]["result"] == {"done": old}
+    assert [j["archived_at"] is None for j in map(store.get, (recent, queued))] == [True, True]
+
+
+def test_queue_counters_track_every_transition(store):
+    jobs = [uuid4().hex for _ in range(4)]
+    for job_id in jobs:
+        store.create(job_id, {"workflow": "health", "payload": {}})
+    add_dag(store, "health-a", "health-b")
+    claimed = [j["id"] for j in store.claim("w1", limit=2, workflows=["health"])]
+    assert store.complete(claimed[0], {"ok": 1}, worker_id="w1")
+    assert store.fail(claimed[1], {"type": "Boom"}, worker_id="w1", retry=False) == "failed"
+    assert store.cancel(jobs[2]) == "queued"
+
+    expected = {s: 0 for s in ("scheduled", "waiting", "queued", "running", "succeeded", "failed", "cancelled")}
+    expected.update(store.conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+    stats = store.queue_stats()
+    assert stats["counts"] == expected
+    assert (expected["queued"], expected["waiting"], expected["succeeded"]) == (2, 1, 1)
+    assert stats["enqueued_per_min"] >= 5 and stats["dequeued_per_min"] >= 2
+
+
+def test_queue_health_endpoint_reflects_intake(client):
+    before = client.get("/ops/queue_health").get_json()["queue_stats"]
+    r = client.post("/api/v1/intake", json={"workflow": f"wf-{uuid4().hex}", "payload": {}},
+                    headers=CUSTOMER)
+    assert r.status_code == 202
+    after = client.get("/ops/queue_health").get_json()["queue_stats"]
+    assert (after["queued"], after["total"]) == (before["queued"] + 1, before["total"] + 1)
+
+
+def test_job_rows_stay_compact_and_legacy_inputs_move_out_of_line(tmp_path):
+    path = str(tmp_path / "compact.db")
+    store = JobStore(path)
+    job_id = uuid4().hex
+    body = {"workflow": "compact", "payload": {"text": "x" * 200}}
+    store.create(job_id, body)
+    conn = store.conn()
+    assert conn.execute("SELECT input FROM jobs WHERE id=?", (job_id,)).fetchone() == ("null",)
+    assert json.loads(conn.execute("SELECT body FROM job_inputs WHERE job_id=?", (job_id,)).fetchone()[0]) == body
+
+    # A database from before job_inputs kept the body in the jobs row
+    with conn:
+        conn.execute("UPDATE jobs SET input=(SELECT body FROM job_inputs WHERE job_id=jobs.id)")
+        conn.execute("DROP TABLE job_inputs")
+    reopened = JobStore(path)
+    [job] = reopened.claim("w1", workflows=["compact"])
+    assert job["input"] == body
+    assert reopened.conn().execute("SELECT input FROM jobs WHERE id=?", (job_id,)).fetchone() == ("null",)
+
+
+def test_identical_large_payloads_share_one_refcounted_blob(store):
+    payload = {"rows": ["same row"] * 500}
+    jobs = [uuid4().hex for _ in range(2)]
+    for job_id in jobs:
+        store.create(job_id, {"workflow": "blobs", "payload": payload})
+    conn = store.conn()
+    [(refs, size, stored)] = conn.execute("SELECT refs, size, length(data) FROM payload_blobs").fetchall()
+    assert refs == 2 and stored < size
+
+    # Archiving moves the reference rather than the payload
+    assert len(store.claim("w1", limit=2, workflows=["blobs"])) == 2
+    for job_id in jobs:
+        assert store.complete(job_id, {"ok": 1}, worker_id="w1")
+    assert store.archive_expired(time() + 1) == 2
+    assert conn.execute("SELECT refs FROM payload_blobs").fetchall() == [(2,)]
+    assert store.get(jobs[0])["input"]["payload"] == payload
+
+    with conn:
+        conn.execute("DELETE FROM jobs_archive WHERE id=?", (jobs[0],))
+    assert conn.execute("SELECT refs FROM payload_blobs").fetchall() == [(1,)]
+    with conn:
+        conn.execute("DELETE FROM jobs_archive WHERE id=?", (jobs[1],))
+    assert conn.execute("SELECT COUNT(*) FROM payload_blobs").fetchone() == (0,)
+
+
+def test_claims_follow_priority_weights_and_rotate_workflows(store):
+    for priority in ("high", "normal", "low"):
+        for workflow in (f"{priority}-a", f"{priority}-b"):
+            store.create_many([(uuid4().hex, {"workflow": workflow, "payload": {}, "priority": priority})
+                               for _ in range(40)])
+    served = [job["workflow"] for _ in range(48) for job in store.claim("w1")]
+
+    # Default weights high:normal:low = 8:3:1, so every 12 claims split 8/3/1
+    for start in range(0, 48, 12):
+        window = Counter(wf.split("-")[0] for wf in served[start:start + 12])
+        assert window == {"high": 8, "normal": 3, "low": 1}, window
+    for priority in ("high", "normal", "low"):
+        sequence = [wf for wf in served if wf.startswith(priority)]
+        assert sequence == [f"{priority}-a", f"{priority}-b"] * (len(sequence) // 2)
+
+    # Multi-job claims are split the same way
+    batch = Counter(job["workflow"].split("-")[0] for job in store.claim("w1", limit=12))
+    assert batch == {"high": 8, "normal": 3, "low": 1}
+
+
+def test_expired_leases_requeue_until_max_attempts_then_dead_letter(store):
+    job_id = uuid4().hex
+    store.create(job_id, {"workflow": "lease", "payload": {}})
+    [job] = store.claim("w1", workflows=["lease"], visibility_timeout=5)
+    assert job["attempts"] == 1
+    assert store.requeue_expired(time() + 1) == 0
+
+    # A heartbeat from the lease holder extends it; anyone else's is refused
+    assert not store.heartbeat(job_id, "w2", visibility_timeout=60)
+    assert store.heartbeat(job_id, "w1", visibility_timeout=60)
+    assert store.requeue_expired(time() + 30) == 0
+    assert store.requeue_expired(time() + 61) == 1
+    assert store.get(job_id)["status"] == "queued"
+    # The stale worker can no longer finish the job
+    assert not store.complete(job_id, {"late": True}, worker_id="w1")
+
+    for attempt in range(2, JOB_MAX_ATTEMPTS + 1):
+        [job] = store.claim("w2", workflows=["lease"], visibility_timeout=5)
+        assert job["attempts"] == attempt
+        assert store.requeue_expired(time() + 6) == 1
+    job = store.get(job_id)
+    assert (job["status"], job["error"]["type"]) == ("failed", "LeaseExpired")
+    [dead] = store.dead_letters(workflow="lease")
+    assert (dead["job_id"], dead["reason"], dead["attempts"]) == (job_id, "lease_expired", JOB_MAX_ATTEMPTS)
+    assert store.claim("w2", workflows=["lease"]) == []
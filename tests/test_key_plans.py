@@ -0,0 +1,47 @@
+from uuid import uuid4
+
+import pytest
+
+from conftest import CUSTOMER
+from services import key_plans
+from services.key_plans import KeyPlans, key_tag
+from services.rate_limiter import GCRALimiter
+
+OTHER = {"X-Api-Key": "test-key-2"}
+
+
+@pytest.fixture
+def plans(app_module, monkeypatch):
+    monkeypatch.setitem(key_plans.PLAN_RATE_LIMITS, "starter", 3)
+    monkeypatch.setitem(key_plans.PLAN_RATE_LIMITS, "pro", 6)
+    monkeypatch.setattr(app_module, "RATE_LIMITER", GCRALimiter(app_module.RATE_BURST, app_module.WINDOW))
+    yield app_module.JOB_STORE.key_plans
+    app_module.JOB_STORE.key_plans.remove(key_tag(CUSTOMER["X-Api-Key"]))
+
+
+def _intake(client, headers):
+    return client.post("/api/v1/intake", json={"workflow": f"wf-{uuid4().hex}", "payload": {}}, headers=headers)
+
+
+def test_each_key_spends_its_own_plan_budget(client, plans):
+    plans.set_plan(key_tag(CUSTOMER["X-Api-Key"]), "pro")
+
+    statuses = [_intake(client, OTHER).status_code for _ in range(4)]
+    assert statuses == [202, 202, 202, 429]
+    r = _intake(client, CUSTOMER)
+    assert r.status_code == 202
+    assert r.headers["X-RateLimit-Limit"] == "6"
+    assert [_intake(client, CUSTOMER).status_code for _ in range(6)] == [202] * 5 + [429]
+
+
+def test_plan_resolution_order(store, monkeypatch):
+    monkeypatch.setenv("API_KEY_PLANS", "configured-key:pro,bad-key:platinum")
+    plans = KeyPlans(store)
+    assert plans.plan(key_tag("configured-key")) == "pro"
+    assert plans.plan(key_tag("bad-key")) == key_plans.API_KEY_PLAN_DEFAULT
+    assert plans.plan(key_tag("unknown-key")) == key_plans.API_KEY_PLAN_DEFAULT
+
+    plans.set_plan(key_tag("configured-key"), "starter")
+    assert plans.plan(key_tag("configured-key")) == "starter"
+    with pytest.raises(ValueError):
+        plans.set_plan(key_tag("configured-key"), "platinum")
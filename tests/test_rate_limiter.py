@@ -0,0 +1,115 @@
+import threading
+from collections import Counter
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from monitors.scheduler import schedule_rate_limiter_eviction
+from services.cache import StripedLRUCache
+from services.rate_limiter import GCRALimiter, SharedGCRALimiter
+
+
+def test_burst_then_refill_one_slot_per_interval():
+    limiter = GCRALimiter(limit=5, window=10, stripes=4)
+    decisions = [limiter.hit("ip", now=100.0) for _ in range(6)]
+    assert [d.allowed for d in decisions] == [True] * 5 + [False]
+    assert decisions[4].remaining == 0
+    assert decisions[5].retry_after == 2.0
+    assert not limiter.hit("ip", now=101.9).allowed
+    assert limiter.hit("ip", now=102.0).allowed
+
+
+def test_refund_returns_the_slot():
+    limiter = GCRALimiter(limit=2, window=10)
+    limiter.hit("ip", now=0.0)
+    limiter.hit("ip", now=0.0)
+    assert not limiter.hit("ip", now=0.0).allowed
+    limiter.refund("ip")
+    assert limiter.hit("ip", now=0.0).allowed
+
+
+def test_evict_idle_drops_only_keys_back_at_full_capacity():
+    limiter = GCRALimiter(limit=10, window=10, stripes=4)
+    for n in range(50):
+        limiter.hit(f"ip-{n}", now=0.0)
+    limiter.hit("busy", cost=10, now=0.0)
+    assert limiter.evict_idle(now=5.0) == 50
+    assert len(limiter) == 1
+    assert not limiter.hit("busy", cost=6, now=5.0).allowed
+
+
+def test_eviction_runs_on_the_app_scheduler():
+    scheduler = BackgroundScheduler()
+    limiter = GCRALimiter(limit=10, window=10)
+    schedule_rate_limiter_eviction(scheduler, limiter)
+    job = scheduler.get_job("rate_limit_eviction")
+    assert job.args == (limiter,)
+    limiter.hit("ip", now=0.0)
+    job.func(*job.args)
+    assert len(limiter) == 0
+
+
+def test_processes_share_budgets_through_sqlite(tmp_path, monkeypatch):
+    # Sync explicitly instead of from the background thread
+    monkeypatch.setattr(SharedGCRALimiter, "_start", lambda self: None)
+    path = str(tmp_path / "limits.db")
+    first, second = SharedGCRALimiter(path, 10, 10), SharedGCRALimiter(path, 10, 10)
+
+    assert all(first.hit("ip", now=100.0).allowed for _ in range(6))
+    assert first.sync(now=100.0) == 1
+    # The other process adopts the shared state the first time it sees the key
+    assert [second.hit("ip", now=100.0).allowed for _ in range(5)] == [True] * 4 + [False]
+
+    # Consumption made on both sides between syncs is merged, not overwritten
+    assert first.hit("other", cost=6, now=100.0).allowed
+    assert second.hit("other", cost=3, now=100.0).allowed
+    first.sync(now=100.0)
+    second.sync(now=100.0)
+    assert not second.hit("other", cost=2, now=100.0).allowed
+    assert second.hit("other", now=100.0).allowed
+
+
+def _hammer(fn, threads=8, calls=500):
+    """Run fn(thread_index, call_index) from many threads at once"""
+    barrier = threading.Barrier(threads)
+
+    def run(t):
+        barrier.wait()
+        for n in range(calls):
+            fn(t, n)
+
+    workers = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+
+def test_concurrent_hits_never_overspend_a_budget():
+    limiter = GCRALimiter(limit=1000, window=3600, stripes=8)
+    admitted = Counter()
+    lock = threading.Lock()
+
+    def hit(t, n):
+        key = "shared" if n % 2 else f"key-{n % 20}"
+        if limiter.hit(key, now=0.0).allowed:
+            with lock:
+                admitted[key] += 1
+
+    _hammer(hit)
+    # 2000 hits on "shared" against a budget of 1000; 200 on each of ten other keys
+    assert admitted.pop("shared") == 1000
+    assert len(admitted) == 10 and set(admitted.values()) == {200}
+
+
+def test_striped_cache_stays_consistent_under_concurrency():
+    cache = StripedLRUCache(maxsize=400, stripes=8)
+
+    def use(t, n):
+        key = (t, n % 100)
+        cache.set(key, key)
+        assert cache.get(key) in (key, None)
+
+    _hammer(use)
+    assert len(cache) <= 400
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == 8 * 500
@@ -0,0 +1,92 @@
+import json
+from time import time
+from uuid import uuid4
+
+import pytest
+
+from conftest import CUSTOMER
+from services.recurring import RecurringSchedules
+
+
+def test_invalid_cron_and_stray_timezone_are_rejected(client):
+    body = {"workflow": "nightly", "payload": {}}
+    r = client.post("/api/v1/intake", json={**body, "cron": "61 * * * * *"}, headers=CUSTOMER)
+    assert r.status_code == 400 and r.get_json()["error"] == "Invalid cron expression"
+    r = client.post("/api/v1/intake", json={**body, "cron": "0 3 * * *", "timezone": "Mars/Olympus"},
+                    headers=CUSTOMER)
+    assert r.status_code == 400
+    r = client.post("/api/v1/intake", json={**body, "timezone": "UTC"}, headers=CUSTOMER)
+    assert r.status_code == 400 and r.get_json()["error"] == "timezone is only valid with cron"
+    r = client.post("/api/v1/intake/batch", json=[{**body, "cron": "0 3 * * *"}], headers=CUSTOMER)
+    assert r.get_json()["results"][0]["error"] == "cron schedules must be created through /api/v1/intake"
+
+
+def test_run_at_job_waits_until_due(client, app_module):
+    workflow = f"wf-{uuid4().hex}"
+    r = client.post("/api/v1/intake", json={"workflow": workflow, "payload": {}, "run_at": time() + 3600},
+                    headers=CUSTOMER)
+    assert r.status_code == 202 and r.get_json()["status"] == "scheduled"
+    job_id = r.get_json()["job_id"]
+    store = app_module.JOB_STORE
+    assert store.claim("w1", workflows=[workflow]) == []
+    assert store.promote_due(time() + 3601) >= 1
+    assert [j["id"] for j in store.claim("w1", workflows=[workflow])] == [job_id]
+
+
+@pytest.mark.parametrize("run_at", ["1e400", "NaN", "Infinity"])
+def test_non_finite_run_at_is_rejected(client, run_at):
+    body = f'{{"workflow": "late", "payload": {{}}, "run_at": {run_at}}}'
+    r = client.post("/api/v1/intake", data=body, content_type="application/json", headers=CUSTOMER)
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "run_at must be a finite Unix timestamp"
+
+    def reject(constant):
+        raise ValueError(constant)
+
+    # /ops/queue_health stays strict JSON
+    json.loads(client.get("/ops/queue_health").get_data(as_text=True), parse_constant=reject)
+
+
+def test_run_at_beyond_the_horizon_is_rejected(client, app_module):
+    body = {"workflow": "late", "payload": {}, "run_at": time() + (app_module.RUN_AT_MAX_DAYS + 1) * 86400}
+    r = client.post("/api/v1/intake", json=body, headers=CUSTOMER)
+    assert r.status_code == 400
+    assert r.get_json()["details"] == {"max_days_ahead": app_module.RUN_AT_MAX_DAYS}
+    r = client.post("/api/v1/intake/batch", json=[body], headers=CUSTOMER)
+    assert r.get_json()["results"][0]["error"] == "run_at is too far in the future"
+
+
+def test_schedule_fires_once_per_due_time(store):
+    schedules = RecurringSchedules(store)
+    now = time()
+    created = schedules.create("o", {"workflow": "tick", "payload": {"n": 1}, "cron": "* * * * *"}, now=now)
+    assert created["next_run_at"] > now
+    assert schedules.fire_due(now) == 0
+
+    due = created["next_run_at"] + 600
+    assert schedules.fire_due(due) == 1
+    assert schedules.fire_due(due) == 0
+    [schedule] = schedules.list("o")
+    assert schedule["runs"] == 1 and schedule["next_run_at"] > due
+    job = store.get(schedule["last_job_id"])
+    assert (job["workflow"], job["input"]["payload"]) == ("tick", {"n": 1})
+
+
+def test_stats_read_maintained_count(store):
+    schedules = RecurringSchedules(store)
+    ids = [schedules.create("o", {"workflow": "tick", "payload": {}, "cron": "0 * * * *"})["schedule_id"]
+           for _ in range(3)]
+    assert schedules.delete("o", ids[0])
+    conn = store.conn()
+    with conn:
+        conn.execute("UPDATE job_schedules SET enabled = 0 WHERE id = ?", (ids[1],))
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        stats = schedules.stats()
+    finally:
+        conn.set_trace_callback(None)
+    assert stats["active"] == 1
+    assert stats["next_run_at"] == schedules.list("o")[1]["next_run_at"]
+    assert statements and not [s for s in statements if "COUNT(" in s.upper()]
@@ -0,0 +1,59 @@
+from time import time
+from uuid import uuid4
+
+from conftest import CUSTOMER, WORKER
+from services.result_cache import memo_key
+
+
+def _memoized(store, payload, workflow="pure"):
+    job_id = uuid4().hex
+    store.create(job_id, {"workflow": workflow, "payload": payload, "memoize": True}, owner="o")
+    assert [j["id"] for j in store.claim("w1", workflows=[workflow])] == [job_id]
+    assert store.complete(job_id, {"echo": payload}, worker_id="w1")
+    return memo_key("o", workflow, payload)
+
+
+def test_memoized_intake_is_served_from_cache(client):
+    workflow = f"wf-{uuid4().hex}"
+    body = {"workflow": workflow, "payload": {"b": 2, "a": 1}, "memoize": True}
+    first = client.post("/api/v1/intake", json=body, headers=CUSTOMER)
+    assert first.status_code == 202
+    job_id = first.get_json()["job_id"]
+    client.post("/api/v1/worker/claim", json={"worker_id": "w1", "workflows": [workflow]}, headers=WORKER)
+    client.post(f"/api/v1/worker/complete/{job_id}", json={"worker_id": "w1", "result": {"sum": 3}}, headers=WORKER)
+
+    # Same payload with its keys in another order
+    r = client.post("/api/v1/intake", json={**body, "payload": {"a": 1, "b": 2}}, headers=CUSTOMER)
+    assert r.status_code == 200 and r.get_json()["cached"] is True
+    status = client.get(f"/api/v1/status/{r.get_json()['job_id']}", headers=CUSTOMER).get_json()
+    assert (status["status"], status["result"]) == ("succeeded", {"sum": 3})
+    # Other API keys never see it
+    r = client.post("/api/v1/intake", json=body, headers={"X-Api-Key": "test-key-2"})
+    assert r.status_code == 202
+
+
+def test_lookups_never_write(store):
+    key = _memoized(store, {"n": 1})
+    statements = []
+    conn = store.conn()
+    conn.set_trace_callback(statements.append)
+    try:
+        assert store.results.lookup(key) == (True, {"echo": {"n": 1}})
+        assert store.results.lookup(key) == (True, {"echo": {"n": 1}})
+        assert store.results.lookup(memo_key("o", "pure", {"n": 2})) == (False, None)
+    finally:
+        conn.set_trace_callback(None)
+    assert statements and not [s for s in statements if not s.lstrip().upper().startswith("SELECT")]
+
+
+def test_prune_keeps_recently_hit_entries(store):
+    hit = _memoized(store, {"n": 1})
+    idle = _memoized(store, {"n": 2})
+    conn = store.conn()
+    with conn:
+        conn.execute("UPDATE result_cache SET used_at = ?", (time() - 60,))
+    assert store.results.lookup(hit)[0]
+
+    assert store.results.prune(max_entries=1) == 1
+    assert [r[0] for r in conn.execute("SELECT key FROM result_cache")] == [hit]
+    assert store.results.lookup(idle) == (False, None)
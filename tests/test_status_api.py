@@ -0,0 +1,56 @@
+from uuid import uuid4
+
+from conftest import CUSTOMER, WORKER
+
+
+def _enqueue(client, workflow, headers=CUSTOMER):
+    r = client.post("/api/v1/intake", json={"workflow": workflow, "payload": {}}, headers=headers)
+    assert r.status_code == 202
+    return r.get_json()["job_id"]
+
+
+def _bulk(client, job_ids, cursor=None):
+    body = {"job_ids": job_ids}
+    if cursor is not None:
+        body["cursor"] = cursor
+    r = client.post("/api/v1/status/bulk", json=body, headers=CUSTOMER)
+    assert r.status_code == 200
+    return r.get_json()
+
+
+def test_bulk_status_reports_missing_and_only_changes_after_cursor(client, app_module):
+    workflow = f"wf-{uuid4().hex}"
+    first, second = _enqueue(client, workflow), _enqueue(client, workflow)
+    unknown = uuid4().hex
+
+    polled = _bulk(client, [first, second, unknown, first])
+    assert sorted(j["job_id"] for j in polled["jobs"]) == sorted([first, second])
+    assert polled["missing"] == [unknown]
+
+    assert app_module.JOB_STORE.complete(first, {"ok": 1})
+    delta = _bulk(client, [first, second], polled["cursor"])
+    assert [(j["job_id"], j["status"], j["result"]) for j in delta["jobs"]] == [(first, "succeeded", {"ok": 1})]
+    assert "missing" not in delta
+    assert _bulk(client, [first, second], delta["cursor"])["jobs"] == []
+
+
+def test_changes_feed_pages_through_own_jobs(client):
+    start = _bulk(client, [])["cursor"]
+    workflow = f"wf-{uuid4().hex}"
+    mine = [_enqueue(client, workflow) for _ in range(3)]
+    _enqueue(client, workflow, headers={"X-Api-Key": "test-key-2"})
+
+    seen, cursor = [], start
+    while True:
+        r = client.get("/api/v1/status/changes", query_string={"cursor": cursor, "limit": 2}, headers=CUSTOMER)
+        page = r.get_json()
+        seen += [j["job_id"] for j in page["jobs"]]
+        cursor = page["cursor"]
+        if not page["has_more"]:
+            break
+    assert seen == mine
+
+    claimed = client.post("/api/v1/worker/claim", json={"worker_id": "w1", "workflows": [workflow], "limit": 1},
+                          headers=WORKER).get_json()["jobs"]
+    page = client.get("/api/v1/status/changes", query_string={"cursor": cursor}, headers=CUSTOMER).get_json()
+    assert [(j["job_id"], j["status"]) for j in page["jobs"]] == [(claimed[0]["job_id"], "running")]
@@ -0,0 +1,133 @@
+import threading
+from uuid import uuid4
+
+from conftest import CUSTOMER
+from services import job_events
+
+
+def _enqueue(client, workflow):
+    r = client.post("/api/v1/intake", json={"workflow": workflow, "payload": {}}, headers=CUSTOMER)
+    assert r.status_code == 202
+    return r.get_json()["job_id"]
+
+
+def _finish(store, workflow, job_id):
+    assert [j["id"] for j in store.claim("w1", workflows=[workflow])] == [job_id]
+    assert store.complete(job_id, {"ok": 1}, worker_id="w1")
+
+
+def _stream(client, url, headers, timeout=10):
+    """(status, body) of a stream that must end by itself within `timeout` seconds"""
+    out = {}
+
+    def read():
+        # Requested and read on one thread: the streamed request context lives in its context variables
+        resp = client.get(url, headers=headers, buffered=False)
+        out["status"], out["body"] = resp.status_code, b"".join(resp.response)
+        resp.close()
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    reader.join(timeout)
+    assert not reader.is_alive(), f"stream still open after {timeout}s"
+    return out["status"], out["body"]
+
+
+def test_transition_between_subscribe_and_snapshot_is_delivered(client, app_module, monkeypatch):
+    store = app_module.JOB_STORE
+    workflow = f"wf-{uuid4().hex}"
+    job_id = _enqueue(client, workflow)
+    status_many = store.status_many
+
+    def snapshot_then_finish(job_ids):
+        # The job completes right after the stream read its state as queued
+        snapshot = status_many(job_ids)
+        _finish(store, workflow, job_id)
+        return snapshot
+
+    monkeypatch.setattr(store, "status_many", snapshot_then_finish)
+    status, body = _stream(client, f"/api/v1/status/stream?job_ids={job_id}", CUSTOMER)
+    assert status == 200
+    assert b'"status":"queued"' in body
+    assert b'"status":"succeeded"' in body
+
+
+def test_reconnect_after_last_event_ends_stream(client, app_module):
+    store = app_module.JOB_STORE
+    workflow = f"wf-{uuid4().hex}"
+    job_id = _enqueue(client, workflow)
+    _finish(store, workflow, job_id)
+    seq = store.status_many([job_id])[0]["seq"]
+
+    status, body = _stream(client, f"/api/v1/status/stream?job_ids={job_id}",
+                           {**CUSTOMER, "Last-Event-ID": str(seq)})
+    assert status == 200
+    assert body == b"retry: 3000\n\n"
+
+
+def test_streams_over_the_cap_get_503(client, app_module, monkeypatch):
+    broker = app_module.get_status_broker()
+    monkeypatch.setattr(broker, "max_streams", 1)
+    first = client.get("/api/v1/status/stream", headers=CUSTOMER, buffered=False)
+    assert first.status_code == 200
+    try:
+        second = client.get("/api/v1/status/stream", headers=CUSTOMER)
+        assert second.status_code == 503
+        assert second.get_json()["error"] == "too_many_streams"
+        assert second.headers["Retry-After"]
+    finally:
+        # Closed before its first frame: the slot must still be released
+        first.close()
+    again = client.get("/api/v1/status/stream", headers=CUSTOMER, buffered=False)
+    assert again.status_code == 200
+    again.close()
+
+
+def test_default_cap_leaves_threads_for_other_requests(client, app_module):
+    assert job_events.stream_cap(4) == 2 and job_events.stream_cap(1) == 1
+    broker = app_module.get_status_broker()
+    assert broker.max_streams == job_events.stream_cap(job_events.GUNICORN_THREADS)
+
+    job_id = client.post("/api/v1/intake", json={"workflow": "cap", "payload": {}},
+                         headers=CUSTOMER).get_json()["job_id"]
+    streams = [client.get("/api/v1/status/stream", headers=CUSTOMER, buffered=False)
+               for _ in range(broker.max_streams)]
+    try:
+        assert [s.status_code for s in streams] == [200] * broker.max_streams
+        assert client.get("/api/v1/status/stream", headers=CUSTOMER).status_code == 503
+        assert client.get(f"/api/v1/status/{job_id}", headers=CUSTOMER).status_code == 200
+        assert client.get("/ops/queue_health").status_code == 200
+    finally:
+        # stream_with_context contexts nest on this thread: close the newest first
+        for stream in reversed(streams):
+            stream.close()
+
+
+def test_backlog_larger_than_buffer_is_paged_not_overflowed(store, monkeypatch):
+    monkeypatch.setattr(job_events, "SUBSCRIBER_BUFFER", 2)
+    broker = job_events.StatusBroker(store)
+    cursor = store.current_seq()
+    job_ids = [uuid4().hex for _ in range(5)]
+    store.create_many([(job_id, {"workflow": "wf", "payload": {}}) for job_id in job_ids], owner="o",
+                      results={job_id: {"ok": 1} for job_id in job_ids})
+    backlog = list(broker.changes_since("o", cursor))
+    assert [j["job_id"] for j in backlog] == job_ids
+
+    sub = job_events.Subscription("o", set(job_ids))
+    sub.settle(backlog)
+    frames = list(broker.stream(sub, backlog))
+    assert len(frames) == 6 and not sub.overflowed
+
+
+def test_overflow_sends_resume_cursor_before_closing(store, monkeypatch):
+    monkeypatch.setattr(job_events, "SUBSCRIBER_BUFFER", 2)
+    broker = job_events.StatusBroker(store)
+    sub = job_events.Subscription("o", cursor=7)
+    for seq in (8, 9, 10, 11):
+        job = {"job_id": f"j{seq}", "status": "queued", "created_at": 0, "result": None, "error": None, "seq": seq}
+        sub.push(job_events.encode_event(job), job["job_id"], job["status"], seq)
+    assert sub.overflowed and sub.cursor == 9
+
+    frames = list(broker.stream(sub))
+    assert [f.split(b"\n")[0] for f in frames[1:3]] == [b"id: 8", b"id: 9"]
+    assert frames[-1] == b'id: 9\nevent: overflow\ndata: {"error":"overflow","cursor":9}\n\n'
@@ -0,0 +1,44 @@
+from uuid import uuid4
+
+from conftest import CUSTOMER, WORKER
+
+
+def _enqueue(client, workflow):
+    r = client.post("/api/v1/intake", json={"workflow": workflow, "payload": {"secret": "tenant-a"}},
+                    headers=CUSTOMER)
+    assert r.status_code == 202
+    return r.get_json()["job_id"]
+
+
+def test_customer_key_cannot_use_worker_endpoints(client):
+    workflow = f"wf-{uuid4().hex}"
+    job_id = _enqueue(client, workflow)
+    body = {"worker_id": "w1", "workflows": [workflow]}
+    for path in ("/api/v1/worker/claim", f"/api/v1/worker/heartbeat/{job_id}",
+                 f"/api/v1/worker/complete/{job_id}", f"/api/v1/worker/fail/{job_id}"):
+        assert client.post(path, json=body, headers=CUSTOMER).status_code == 403
+        assert client.post(path, json=body, headers={"X-Worker-Token": "wrong"}).status_code == 403
+    assert client.get(f"/api/v1/status/{job_id}", headers=CUSTOMER).get_json()["status"] == "queued"
+
+
+def test_worker_token_leases_and_completes(client):
+    workflow = f"wf-{uuid4().hex}"
+    job_id = _enqueue(client, workflow)
+    r = client.post("/api/v1/worker/claim", json={"worker_id": "w1", "workflows": [workflow]}, headers=WORKER)
+    assert r.status_code == 200
+    assert [j["job_id"] for j in r.get_json()["jobs"]] == [job_id]
+    r = client.post(f"/api/v1/worker/complete/{job_id}", json={"worker_id": "w1", "result": {"ok": 1}},
+                    headers=WORKER)
+    assert r.status_code == 200
+    assert client.get(f"/api/v1/status/{job_id}", headers=CUSTOMER).get_json()["status"] == "succeeded"
+
+
+def test_malformed_worker_fields_are_400(client):
+    for body in ({"worker_id": "w1", "limit": "abc"}, {"worker_id": "w1", "visibility_timeout": "soon"},
+                 {"worker_id": "w1", "workflows": "wf"}):
+        r = client.post("/api/v1/worker/claim", json=body, headers=WORKER)
+        assert r.status_code == 400
+        assert r.get_json()["error"] == "Invalid request body"
+    r = client.post(f"/api/v1/worker/heartbeat/{uuid4().hex}",
+                    json={"worker_id": "w1", "visibility_timeout": [1]}, headers=WORKER)
+    assert r.status_code == 400
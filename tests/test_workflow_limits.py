@@ -0,0 +1,95 @@
+from uuid import uuid4
+
+import pytest
+
+from conftest import CUSTOMER
+from services.workflow_limits import WorkflowBurstExceeded
+
+
+def _workflow(app_module, **limit):
+    workflow = f"wf-{uuid4().hex}"
+    if limit:
+        app_module.JOB_STORE.limits.set_limit(workflow, **limit)
+    return workflow
+
+
+def _batch(client, *workflows):
+    return client.post("/api/v1/intake/batch", json=[{"workflow": wf, "payload": {}} for wf in workflows],
+                       headers=CUSTOMER)
+
+
+def test_admit_refuses_more_than_burst_without_taking_tokens(store):
+    store.limits.set_limit("wf", rate_per_min=60, burst=5)
+    with pytest.raises(WorkflowBurstExceeded) as e:
+        store.limits.admit({"wf": 6})
+    assert (e.value.workflow, e.value.burst) == ("wf", 5)
+    assert store.limits.admit({"wf": 5}) is None
+    workflow, retry_after = store.limits.admit({"wf": 1})
+    assert workflow == "wf" and 0 < retry_after <= 1
+
+
+def test_batch_rejects_only_items_of_limited_workflows(client, app_module):
+    small = _workflow(app_module, rate_per_min=60, burst=2)
+    drained = _workflow(app_module, rate_per_min=1, burst=1)
+    free = _workflow(app_module)
+    assert _batch(client, drained).get_json()["accepted"] == 1
+
+    r = _batch(client, small, free, small, drained, small, free)
+    assert r.status_code == 202
+    body = r.get_json()
+    assert (body["accepted"], body["rejected"]) == (2, 4)
+    errors = [item.get("error") for item in body["results"]]
+    assert errors == ["workflow_batch_too_large", None, "workflow_batch_too_large",
+                      "workflow_rate_limited", "workflow_batch_too_large", None]
+    assert body["results"][0]["burst"] == 2
+    assert body["results"][3]["retry_after"] > 0
+    for item in (body["results"][1], body["results"][5]):
+        assert client.get(f"/api/v1/status/{item['job_id']}", headers=CUSTOMER).get_json()["status"] == "queued"
+
+
+def test_batch_of_only_rate_limited_items_is_429(client, app_module):
+    drained = _workflow(app_module, rate_per_min=1, burst=1)
+    assert _batch(client, drained).status_code == 202
+    r = _batch(client, drained)
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) >= 1
+    assert r.get_json()["results"][0]["error"] == "workflow_rate_limited"
+
+
+def test_dag_larger_than_burst_is_refused(client, app_module):
+    workflow = _workflow(app_module, rate_per_min=60, burst=1)
+    steps = [{"id": "a", "workflow": workflow, "payload": {}},
+             {"id": "b", "workflow": workflow, "payload": {}, "depends_on": ["a"]}]
+    r = client.post("/api/v1/intake", json={"steps": steps}, headers=CUSTOMER)
+    assert r.status_code == 400
+    assert r.get_json()["details"] == {"workflow": workflow, "burst": 1}
+
+
+def test_concurrency_cap_uses_maintained_running_counts(store):
+    store.limits.set_limit("capped", max_concurrency=2)
+    ids = [uuid4().hex for _ in range(3)]
+    store.create_many([(job_id, {"workflow": "capped", "payload": {}}) for job_id in ids])
+    claimed = [j["id"] for j in store.claim("w1", limit=3)]
+    assert len(claimed) == 2
+    assert store.limit_state()[0]["running"] == 2
+    assert store.claim("w1") == []
+
+    assert store.complete(claimed[0], {"ok": 1}, worker_id="w1")
+    assert store.cancel(claimed[1]) == "running"
+    assert store.limit_state()[0]["running"] == 0
+    assert [j["id"] for j in store.claim("w1")] == [j for j in ids if j not in claimed]
+    assert store.limit_state()[0]["running"] == 1
+
+
+def test_limit_state_reads_no_job_rows(store):
+    store.limits.set_limit("capped", max_concurrency=10000)
+    store.create_many([(uuid4().hex, {"workflow": "capped", "payload": {}}) for _ in range(500)])
+    store.claim("w1", limit=100)
+    statements = []
+    conn = store.conn()
+    conn.set_trace_callback(statements.append)
+    try:
+        assert store.limit_state()[0]["running"] == 100
+    finally:
+        conn.set_trace_callback(None)
+    assert statements and not [s for s in statements if "jobs" in s]